@@ -6,6 +6,21 @@ from dotenv import load_dotenv
 # Load .env (project root must contain .env)
 load_dotenv()
 
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _float_env(name, default):
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # SECURITY
@@ -57,13 +72,34 @@ TEMPLATES = [
 WSGI_APPLICATION = "core.wsgi.application"
 
 # Database — simple SQLite for development
+SQLITE_BUSY_TIMEOUT_MS = _int_env("SQLITE_BUSY_TIMEOUT_MS", 20000)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # seconds sqlite3 waits on a locked database before raising
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            # Take the write lock when a transaction starts. Read-then-write
+            # transactions (rollups, the review writer) would otherwise fail
+            # with "database is locked" when upgrading to a write under WAL,
+            # since SQLite does not wait on a lock upgrade. Needs Django 5.1+.
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Applied to every new SQLite connection (reviews/apps.py). WAL lets the web
+# process read while the worker writes; synchronous=NORMAL is safe with WAL
+# and avoids an fsync per commit; cache_size < 0 is in KiB (64 MB here).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -_int_env("SQLITE_CACHE_KB", 64000),
+    "temp_store": "MEMORY",
+}
+
 # Password validation (keep default empty for dev)
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -77,6 +113,10 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Uploaded ZIP projects are kept here until the worker extracts them
+MEDIA_URL = "/media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -95,13 +135,123 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 ANTHROPIC_API_URL = os.getenv("ANTHROPIC_API_URL", "https://api.anthropic.com/v1/messages")
 ANTHROPIC_DEFAULT_MODEL = os.getenv("ANTHROPIC_DEFAULT_MODEL", "claude-3-sonnet-20240229")
 
+# Per-provider client limits, shared by all threads of a process.
+# Requests-per-minute of 0 means "no limit".
+LLM_MAX_CONCURRENCY = {
+    "openai": _int_env("OPENAI_MAX_CONCURRENCY", 8),
+    "anthropic": _int_env("ANTHROPIC_MAX_CONCURRENCY", 4),
+}
+LLM_REQUESTS_PER_MINUTE = {
+    "openai": _int_env("OPENAI_REQUESTS_PER_MINUTE", 0),
+    "anthropic": _int_env("ANTHROPIC_REQUESTS_PER_MINUTE", 50),
+}
+
+# HTTP client: pooled keep-alive connections per provider + retries
+LLM_HTTP_POOL_SIZE = _int_env("LLM_HTTP_POOL_SIZE", 16)
+LLM_CONNECT_TIMEOUT = _float_env("LLM_CONNECT_TIMEOUT", 5)
+LLM_READ_TIMEOUT = _float_env("LLM_READ_TIMEOUT", 120)
+LLM_MAX_RETRIES = _int_env("LLM_MAX_RETRIES", 3)
+LLM_RETRY_BACKOFF = _float_env("LLM_RETRY_BACKOFF", 1.0)  # seconds, doubled per attempt
+LLM_RETRY_MAX_DELAY = _float_env("LLM_RETRY_MAX_DELAY", 60)
+
+# Provider routing (reviews/router.py). LLM_PROVIDER is tried first, the
+# rest of LLM_PROVIDERS (those with an API key) take over when it is slow or
+# failing. One deadline bounds all LLM calls for a file, retries included.
+LLM_PROVIDERS = [
+    p.strip()
+    for p in os.getenv("LLM_PROVIDERS", "openai,anthropic").lower().split(",")
+    if p.strip()
+]
+LLM_FILE_DEADLINE_SECONDS = _float_env("LLM_FILE_DEADLINE_SECONDS", 300)
+# A call slower than this percentile of its provider's recent latencies gets
+# a hedged copy on the next provider; 0 disables hedging.
+LLM_HEDGE_PERCENTILE = _float_env("LLM_HEDGE_PERCENTILE", 95)
+LLM_HEDGE_MIN_DELAY = _float_env("LLM_HEDGE_MIN_DELAY", 2.0)
+# Health = the last LLM_HEALTH_WINDOW calls per provider; scores and hedge
+# delays are only trusted after LLM_HEALTH_MIN_SAMPLES of them. A provider
+# whose error rate passes LLM_HEALTH_MAX_ERROR_RATE is skipped for
+# LLM_HEALTH_COOLDOWN seconds.
+LLM_HEALTH_WINDOW = _int_env("LLM_HEALTH_WINDOW", 100)
+LLM_HEALTH_MIN_SAMPLES = _int_env("LLM_HEALTH_MIN_SAMPLES", 20)
+LLM_HEALTH_MAX_ERROR_RATE = _float_env("LLM_HEALTH_MAX_ERROR_RATE", 0.5)
+LLM_HEALTH_COOLDOWN = _float_env("LLM_HEALTH_COOLDOWN", 30)
+LLM_ROUTER_THREADS = _int_env("LLM_ROUTER_THREADS", 32)
+
+# Serve the submit, stream and status views as async views (reviews/urls.py).
+# Turn on when running under ASGI (uvicorn core.asgi:application); WSGI
+# deployments keep the sync views.
+REVIEW_ASYNC_VIEWS = os.getenv("REVIEW_ASYNC_VIEWS", "False") == "True"
+
+# Submissions per history page
+HISTORY_PAGE_SIZE = _int_env("HISTORY_PAGE_SIZE", 50)
+
+# Issues per page of the issue list / API
+ISSUES_PAGE_SIZE = _int_env("ISSUES_PAGE_SIZE", 100)
+
+# Results per page of review search
+SEARCH_PAGE_SIZE = _int_env("SEARCH_PAGE_SIZE", 20)
+
+# Reviews read per query and written per output piece by exports
+EXPORT_CHUNK_SIZE = _int_env("EXPORT_CHUNK_SIZE", 2000)
+
+# Entries per request of the project file-tree endpoint
+TREE_PAGE_SIZE = _int_env("TREE_PAGE_SIZE", 200)
+
 # Limits
-try:
-    MAX_CODE_CHARS = int(os.getenv("MAX_CODE_CHARS", "20000"))
-except ValueError:
-    MAX_CODE_CHARS = 20000
-
-try:
-    MAX_FILE_UPLOAD_MB = int(os.getenv("MAX_FILE_UPLOAD_MB", "5"))
-except ValueError:
-    MAX_FILE_UPLOAD_MB = 5
+MAX_CODE_CHARS = _int_env("MAX_CODE_CHARS", 20000)
+MAX_FILE_UPLOAD_MB = _int_env("MAX_FILE_UPLOAD_MB", 5)
+# Files longer than one prompt (MAX_CODE_CHARS) are split into chunks of at
+# most REVIEW_CHUNK_CHARS and reviewed in parallel; anything beyond
+# REVIEW_MAX_FILE_CHARS is truncated.
+REVIEW_MAX_FILE_CHARS = _int_env("REVIEW_MAX_FILE_CHARS", 200000)
+REVIEW_CHUNK_CHARS = _int_env("REVIEW_CHUNK_CHARS", 12000)
+REVIEW_CHUNK_THREADS = _int_env("REVIEW_CHUNK_THREADS", 4)
+# ZIP bomb guards for uploaded / downloaded projects
+ZIP_MAX_UNCOMPRESSED_MB = _int_env("ZIP_MAX_UNCOMPRESSED_MB", 100)
+ZIP_MAX_COMPRESSION_RATIO = _int_env("ZIP_MAX_COMPRESSION_RATIO", 100)
+# Downloads larger than this are spooled to a temp file instead of memory
+DOWNLOAD_SPOOL_MB = _int_env("DOWNLOAD_SPOOL_MB", 1)
+# Repo archives are fetched from here (point it at a mirror or a local stand-in)
+GITHUB_URL = os.getenv("GITHUB_URL", "https://github.com")
+GITHUB_PROBE_TIMEOUT = _float_env("GITHUB_PROBE_TIMEOUT", 10.0)
+# Downloaded archives are kept on disk and revalidated by ETag; least
+# recently used ones are evicted past GITHUB_ARCHIVE_CACHE_MB (0 disables)
+GITHUB_ARCHIVE_CACHE_DIR = os.getenv("GITHUB_ARCHIVE_CACHE_DIR") or str(
+    BASE_DIR / "cache" / "github"
+)
+GITHUB_ARCHIVE_CACHE_MB = _int_env("GITHUB_ARCHIVE_CACHE_MB", 500)
+
+# -------------------------
+# Background review worker (python manage.py run_review_worker)
+# -------------------------
+REVIEW_WORKER_POLL_SECONDS = _int_env("REVIEW_WORKER_POLL_SECONDS", 2)
+# Files reviewed in parallel by one worker process (still capped per provider above)
+REVIEW_WORKER_THREADS = _int_env("REVIEW_WORKER_THREADS", 8)
+# A running job older than this is assumed to belong to a dead worker
+REVIEW_JOB_STALE_SECONDS = _int_env("REVIEW_JOB_STALE_SECONDS", 600)
+REVIEW_JOB_MAX_ATTEMPTS = _int_env("REVIEW_JOB_MAX_ATTEMPTS", 3)
+
+# Pack small project files into one prompt (reviews/pipeline.py:review_batch).
+# Budgets are in characters (~4 characters per token).
+REVIEW_BATCH_ENABLED = os.getenv("REVIEW_BATCH_ENABLED", "True") == "True"
+REVIEW_BATCH_FILE_MAX_CHARS = _int_env("REVIEW_BATCH_FILE_MAX_CHARS", 1500)
+REVIEW_BATCH_MAX_CHARS = _int_env("REVIEW_BATCH_MAX_CHARS", 12000)
+REVIEW_BATCH_MAX_FILES = _int_env("REVIEW_BATCH_MAX_FILES", 10)
+
+# Finished reviews are written in batches (reviews/writer.py)
+REVIEW_WRITE_BATCH = _int_env("REVIEW_WRITE_BATCH", 50)
+REVIEW_WRITE_INTERVAL_SECONDS = _float_env("REVIEW_WRITE_INTERVAL_SECONDS", 2)
+
+# Decoded source files kept in memory per process (reviews/blobs.py)
+SOURCE_CACHE_MAX_CHARS = _int_env("SOURCE_CACHE_MAX_CHARS", 20_000_000)
+# Server-side syntax highlighting: longer code is shown uncoloured, and
+# rendered HTML is kept in an in-process LRU of this many characters
+HIGHLIGHT_MAX_CHARS = _int_env("HIGHLIGHT_MAX_CHARS", 200000)
+HIGHLIGHT_CACHE_MAX_CHARS = _int_env("HIGHLIGHT_CACHE_MAX_CHARS", 50_000_000)
+# Suggestion diffs memoized per process (reviews/diffs.py), in characters
+DIFF_CACHE_MAX_CHARS = _int_env("DIFF_CACHE_MAX_CHARS", 20_000_000)
+
+# Content-addressed review cache (reviews/review_cache.py)
+REVIEW_CACHE_ENABLED = os.getenv("REVIEW_CACHE_ENABLED", "True") == "True"
+REVIEW_CACHE_TTL_SECONDS = _int_env("REVIEW_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+REVIEW_CACHE_MAX_ENTRIES = _int_env("REVIEW_CACHE_MAX_ENTRIES", 50000)
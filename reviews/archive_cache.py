@@ -0,0 +1,126 @@
+# reviews/archive_cache.py
+"""
+Size-bounded disk cache of downloaded GitHub archives.
+
+One entry per repo and branch: `<key>.zip` and `<key>.json`, which holds
+the ETag the archive was served with. The ETag is sent back as
+If-None-Match, so an unchanged repo costs a 304 instead of a download.
+Opening an entry bumps its mtime. When the cache grows past
+GITHUB_ARCHIVE_CACHE_MB, the least recently used entries are deleted.
+Files are written under a temporary name and renamed into place, so
+concurrent workers never read a partial archive.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+
+from .metrics import GITHUB_ARCHIVES
+
+Entry = namedtuple("Entry", "path etag")
+
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return settings.GITHUB_ARCHIVE_CACHE_MB > 0
+
+
+def _directory() -> Path:
+    path = Path(settings.GITHUB_ARCHIVE_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _key(repo: str, branch: str) -> str:
+    return hashlib.sha256(f"{repo.lower()}@{branch}".encode("utf-8")).hexdigest()
+
+
+def lookup(repo: str, branch: str):
+    """The cached Entry of repo@branch, or None."""
+    if not enabled():
+        return None
+    base = _directory() / _key(repo, branch)
+    try:
+        meta = json.loads((base.with_suffix(".json")).read_text())
+    except (OSError, ValueError):
+        return None
+    path = base.with_suffix(".zip")
+    if not meta.get("etag") or not path.exists():
+        return None
+    return Entry(path, meta["etag"])
+
+
+def open_entry(entry: Entry):
+    """Open a cached archive; FileNotFoundError if it was evicted meanwhile."""
+    archive = open(entry.path, "rb")
+    try:
+        os.utime(entry.path)
+    except OSError:
+        pass
+    return archive
+
+
+def _replace(path: Path, write):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            write(out)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def store(repo: str, branch: str, archive, etag):
+    """
+    Copy a downloaded archive (seekable, rewound afterwards) into the
+    cache. Archives without an ETag cannot be revalidated and are not
+    kept. Write errors are ignored: the cache only saves downloads.
+    """
+    if not enabled() or not etag:
+        return
+    base = _directory() / _key(repo, branch)
+    meta = {"repo": repo, "branch": branch, "etag": etag}
+    try:
+        archive.seek(0)
+        _replace(base.with_suffix(".zip"), lambda out: shutil.copyfileobj(archive, out))
+        _replace(
+            base.with_suffix(".json"), lambda out: out.write(json.dumps(meta).encode("utf-8"))
+        )
+    except OSError:
+        pass
+    finally:
+        archive.seek(0)
+    evict()
+
+
+def evict():
+    """Delete least recently used archives until the cache fits its size cap."""
+    limit = settings.GITHUB_ARCHIVE_CACHE_MB * 1024 * 1024
+    with _lock:
+        entries = []
+        for path in _directory().glob("*.zip"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            # Workers that already opened the archive keep reading it
+            for victim in (path, path.with_suffix(".json")):
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+            GITHUB_ARCHIVES.inc("evicted")
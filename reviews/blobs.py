@@ -0,0 +1,152 @@
+# reviews/blobs.py
+"""
+Content-addressed store for reviewed source files.
+
+Each file of a ZIP / GitHub submission, and pasted code, is stored once
+as a zlib-compressed SourceBlob keyed by the sha256 of its exact text.
+The same file in any number of submissions takes the space of one row.
+Reviews and jobs point at their blob. Blobs never change, so decoded
+texts are kept in a process-wide LRU (SOURCE_CACHE_MAX_CHARS) and served
+with the digest as an immutable ETag. `python manage.py
+prune_source_blobs` deletes blobs that nothing refers to any more.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Review, ReviewJob, SourceBlob
+
+COMPRESS_LEVEL = 6
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESS_LEVEL)
+
+
+def decode(data) -> str:
+    return zlib.decompress(bytes(data)).decode("utf-8")
+
+
+class TextCache:
+    """
+    Thread-safe LRU of strings, bounded by their total length as given by
+    the `limit_setting` setting (read on every store, so overrides apply).
+    """
+
+    def __init__(self, limit_setting: str):
+        self.limit_setting = limit_setting
+        self._items = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._items.get(key)
+            if text is not None:
+                self._items.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        limit = getattr(settings, self.limit_setting)
+        if len(text) > limit:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = text
+            self._chars += len(text)
+            while self._chars > limit:
+                _, old = self._items.popitem(last=False)
+                self._chars -= len(old)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+
+
+_cache = TextCache("SOURCE_CACHE_MAX_CHARS")
+
+
+def put_many(texts) -> list[str]:
+    """Store texts that are not stored yet; returns their digests in order."""
+    texts = list(texts)
+    digests = [digest(text) for text in texts]
+    new = dict(zip(digests, texts))
+    existing = set(
+        SourceBlob.objects.filter(digest__in=list(new)).values_list("digest", flat=True)
+    )
+    # ignore_conflicts: another worker may store the same file concurrently
+    SourceBlob.objects.bulk_create(
+        [
+            SourceBlob(digest=key, data=encode(text), size=len(text.encode("utf-8")))
+            for key, text in new.items()
+            if key not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    def remember():
+        for key, text in new.items():
+            _cache.put(key, text)
+
+    # Rows of a transaction that rolls back never existed: cache on commit
+    transaction.on_commit(remember)
+    return digests
+
+
+def put(text: str) -> str:
+    return put_many([text])[0]
+
+
+def read(key: str) -> str:
+    """Text of a stored blob; raises SourceBlob.DoesNotExist for unknown digests."""
+    text = _cache.get(key)
+    if text is None:
+        data = SourceBlob.objects.filter(digest=key).values_list("data", flat=True).first()
+        if data is None:
+            raise SourceBlob.DoesNotExist(key)
+        text = decode(data)
+        transaction.on_commit(lambda: _cache.put(key, text))
+    return text
+
+
+def read_many(keys) -> dict:
+    """
+    {digest: text} for existing blobs, in one query for the ones not
+    cached. Bulk reads (exports) do not fill the cache.
+    """
+    texts, missing = {}, []
+    for key in set(keys):
+        text = _cache.get(key)
+        if text is None:
+            missing.append(key)
+        else:
+            texts[key] = text
+    for key, data in SourceBlob.objects.filter(digest__in=missing).values_list(
+        "digest", "data"
+    ):
+        texts[key] = decode(data)
+    return texts
+
+
+def prune() -> int:
+    """Delete blobs no review or job refers to; returns how many."""
+    used_by_reviews = Review.objects.filter(source__isnull=False).values("source_id")
+    used_by_jobs = ReviewJob.objects.filter(source__isnull=False).values("source_id")
+    deleted, _ = (
+        SourceBlob.objects.exclude(digest__in=used_by_reviews)
+        .exclude(digest__in=used_by_jobs)
+        .delete()
+    )
+    if deleted:
+        transaction.on_commit(_cache.clear)
+    return deleted
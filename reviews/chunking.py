@@ -0,0 +1,142 @@
+# reviews/chunking.py
+"""
+Split large source files into reviewable chunks on structural boundaries.
+
+Python is split on top-level statements (and class members when a class
+is too big on its own) using the AST. Other languages, and Python that
+does not parse, fall back to a small lexer that tracks brace depth and
+skips strings and comments. Chunks never split a line; a boundary is only
+ignored when a single unit is larger than the chunk budget.
+"""
+import ast
+from dataclasses import dataclass
+
+EXTENSION_LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".java": "java",
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "cpp",
+    ".cc": "cpp",
+    ".hpp": "cpp",
+}
+
+
+@dataclass
+class Chunk:
+    start_line: int  # 1-based, inclusive
+    end_line: int  # 1-based, inclusive
+    text: str
+
+
+def language_for_path(file_path: str, default: str) -> str:
+    """Language used for splitting, from the file extension when known."""
+    lower = (file_path or "").lower()
+    for ext, language in EXTENSION_LANGUAGES.items():
+        if lower.endswith(ext):
+            return language
+    return default
+
+
+def _python_break_levels(code: str):
+    """
+    {line index: level} for lines where a chunk may start. Level 0 is a
+    top-level statement, level 1 a member of a top-level class. Returns
+    None when the code does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+    def first_line(node):
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [d.lineno for d in decorators]) - 1
+
+    levels = {}
+    for node in tree.body:
+        levels.setdefault(first_line(node), 0)
+        if isinstance(node, ast.ClassDef):
+            for member in node.body[1:]:
+                levels.setdefault(first_line(member), 1)
+    return levels
+
+
+def _brace_break_levels(lines):
+    """
+    {line index: brace depth} for every line that starts outside a string
+    or block comment. Works for the C-family languages in LANG_CHOICES and
+    degrades to "any line" for brace-less text.
+    """
+    levels = {}
+    depth = 0
+    in_block_comment = False
+    quote = None
+    for index, line in enumerate(lines):
+        if not in_block_comment and quote is None:
+            levels[index] = depth
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            nxt = line[i + 1] if i + 1 < len(line) else ""
+            if in_block_comment:
+                if ch == "*" and nxt == "/":
+                    in_block_comment = False
+                    i += 1
+            elif quote:
+                if ch == "\\":
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif ch == "/" and nxt == "/":
+                break
+            elif ch == "/" and nxt == "*":
+                in_block_comment = True
+                i += 1
+            elif ch in "\"'`":
+                quote = ch
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth = max(0, depth - 1)
+            i += 1
+        # Only template literals span lines; plain quotes end with the line
+        if quote and quote != "`":
+            quote = None
+    return levels
+
+
+def _pack(lines, levels, max_chars):
+    """
+    Greedily grow each chunk up to `max_chars`, then cut at the shallowest
+    (and among those the latest) allowed boundary inside it.
+    """
+    chunks = []
+    start = 0
+    n = len(lines)
+    while start < n:
+        size = 0
+        end = start
+        best = None  # (level, line index)
+        while end < n and (end == start or size + len(lines[end]) <= max_chars):
+            size += len(lines[end])
+            end += 1
+            if end < n and end in levels and (best is None or levels[end] <= best[0]):
+                best = (levels[end], end)
+        if end < n and best is not None:
+            end = best[1]
+        chunks.append(Chunk(start + 1, end, "".join(lines[start:end])))
+        start = end
+    return chunks
+
+
+def split_code(code: str, language: str, max_chars: int):
+    """Split `code` into Chunks of at most ~`max_chars` characters."""
+    lines = code.splitlines(keepends=True)
+    if len(code) <= max_chars or len(lines) <= 1:
+        return [Chunk(1, max(1, len(lines)), code)]
+    levels = _python_break_levels(code) if language == "python" else None
+    if levels is None:
+        levels = _brace_break_levels(lines)
+    return _pack(lines, levels, max_chars)
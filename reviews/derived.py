@@ -0,0 +1,21 @@
+# reviews/derived.py
+"""
+Data derived from Review rows when they are stored.
+
+Every code path that creates reviews calls record_reviews() with the new
+rows inside its transaction, so rollups, the file tree, the extracted
+issues and the search index never drift from the reviews themselves. The
+compressed raw responses (raw_store) are written from here too.
+"""
+from . import findings, raw_store, rollups, search
+from .metrics import REVIEWS_STORED
+
+
+def record_reviews(reviews):
+    reviews = list(reviews)
+    for review in reviews:
+        REVIEWS_STORED.inc("processed" if review.processed else "failed")
+    rollups.record(reviews)
+    findings.extract(reviews)
+    search.index(reviews)
+    raw_store.store(reviews)
@@ -0,0 +1,228 @@
+# reviews/diffs.py
+"""
+Diffs of review suggestions against the reviewed source.
+
+A suggestion's "patch" is either a unified diff, whose hunks are placed
+by their content (LLM line numbers are only a hint), or replacement code
+for the suggestion's "lines" range. The patched file is compared with
+the source line by line (reviews.utils.line_diff) and only changed
+line pairs get a character-level diff, so files of thousands of lines
+stay fast. Results are memoized per (source blob, suggestion) in an
+in-process LRU (DIFF_CACHE_MAX_CHARS).
+"""
+import hashlib
+import json
+import re
+
+from .blobs import TextCache, read
+from .metrics import SUGGESTION_DIFFS
+from .utils import (
+    DELETE,
+    INSERT,
+    diff_hunks,
+    format_unified,
+    hunk_header,
+    line_diff,
+    refine_line,
+)
+
+CONTEXT_LINES = 3
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+_LINES_RE = re.compile(r"(\d+)(?:\s*(?:-|–|to|:)\s*L?(\d+))?")
+
+_cache = TextCache("DIFF_CACHE_MAX_CHARS")
+
+
+class PatchError(ValueError):
+    """The suggestion cannot be placed in the source."""
+
+
+def _is_unified_diff(patch: str) -> bool:
+    return bool(re.search(r"^@@ .* @@", patch, re.M)) or (
+        re.search(r"^--- ", patch, re.M) is not None
+        and re.search(r"^\+\+\+ ", patch, re.M) is not None
+    )
+
+
+def _parse_hunks(patch: str):
+    """[(old line hint or None, old lines, new lines)] of a unified diff."""
+    hunks, current = [], None
+    for line in patch.splitlines():
+        match = _HUNK_RE.match(line)
+        if match:
+            current = (int(match.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if line.startswith(("--- ", "+++ ", "\\")):
+            continue
+        if current is None and (not line or line.startswith(("diff ", "index "))):
+            continue
+        if current is None:
+            # Hunk lines without an @@ header
+            current = (None, [], [])
+            hunks.append(current)
+        tag, text = (line[0], line[1:]) if line else (" ", "")
+        if tag not in " -+":
+            # Models often drop the leading space of context lines
+            tag, text = " ", line
+        if tag != "+":
+            current[1].append(text)
+        if tag != "-":
+            current[2].append(text)
+    return [hunk for hunk in hunks if hunk[1] or hunk[2]]
+
+
+def _find(lines, block, start, hint):
+    """Index of `block` in lines[start:] closest to `hint`; None if absent."""
+    wanted = [line.rstrip() for line in block]
+    first = wanted[0]
+    matches = [
+        i
+        for i in range(start, len(lines) - len(wanted) + 1)
+        if lines[i].rstrip() == first
+        and [line.rstrip() for line in lines[i:i + len(wanted)]] == wanted
+    ]
+    if not matches:
+        return None
+    if hint is None:
+        return matches[0]
+    return min(matches, key=lambda i: abs(i - hint))
+
+
+def apply_unified(source: str, patch: str) -> str:
+    lines = source.splitlines()
+    hunks = _parse_hunks(patch)
+    if not hunks:
+        raise PatchError("The patch has no hunks.")
+    cursor = 0
+    for hint, old, new in hunks:
+        hint = hint - 1 if hint else None
+        if old:
+            at = _find(lines, old, cursor, hint)
+            if at is None:
+                raise PatchError("The patch does not match the source.")
+        else:
+            at = min(max(hint or 0, cursor), len(lines))
+        lines[at:at + len(old)] = new
+        cursor = at + len(new)
+    return "\n".join(lines)
+
+
+def apply_to_lines(source: str, code: str, line_range) -> str:
+    match = _LINES_RE.search(str(line_range or ""))
+    if not match:
+        raise PatchError("The suggestion names no line range.")
+    lines = source.splitlines()
+    start = int(match.group(1))
+    end = int(match.group(2) or start)
+    if not 1 <= start <= end or start > len(lines) + 1:
+        raise PatchError(f"Line range {start}-{end} is outside the source.")
+    lines[start - 1:end] = code.splitlines()
+    return "\n".join(lines)
+
+
+def apply_suggestion(source: str, suggestion: dict) -> str:
+    """The source with the suggestion applied; PatchError if it cannot be placed."""
+    patch = str(suggestion.get("patch") or "")
+    if not patch.strip():
+        raise PatchError("The suggestion has no patch.")
+    if _is_unified_diff(patch):
+        return apply_unified(source, patch)
+    return apply_to_lines(source, patch, suggestion.get("lines"))
+
+
+def _rows(hunk):
+    """Side-by-side rows of one hunk; changed line pairs are refined per character."""
+    rows, deleted, inserted = [], [], []
+
+    def flush():
+        for i in range(max(len(deleted), len(inserted))):
+            old = deleted[i] if i < len(deleted) else None
+            new = inserted[i] if i < len(inserted) else None
+            if old and new:
+                old_parts, new_parts = refine_line(old[3], new[3])
+                kind = "change"
+            else:
+                old_parts = [(False, old[3])] if old else []
+                new_parts = [(False, new[3])] if new else []
+                kind = "delete" if old else "insert"
+            rows.append(
+                {
+                    "kind": kind,
+                    "old_no": old[1] if old else None,
+                    "new_no": new[2] if new else None,
+                    "old": old_parts,
+                    "new": new_parts,
+                }
+            )
+        deleted.clear()
+        inserted.clear()
+
+    for line in hunk["lines"]:
+        op = line[0]
+        if op == DELETE:
+            if inserted:
+                flush()
+            deleted.append(line)
+        elif op == INSERT:
+            inserted.append(line)
+        else:
+            flush()
+            rows.append(
+                {
+                    "kind": "equal",
+                    "old_no": line[1],
+                    "new_no": line[2],
+                    "old": [(False, line[3])],
+                    "new": [(False, line[3])],
+                }
+            )
+    flush()
+    return rows
+
+
+def build_diff(source: str, suggestion: dict, file_path: str = "") -> dict:
+    """
+    {"applied", "error", "unified", "hunks": [{"header", "rows"}],
+    "added", "removed"} for one suggestion.
+    """
+    try:
+        patched = apply_suggestion(source, suggestion)
+    except PatchError as e:
+        return {
+            "applied": False,
+            "error": str(e),
+            "unified": "",
+            "hunks": [],
+            "added": 0,
+            "removed": 0,
+        }
+
+    ops = line_diff(source.splitlines(), patched.splitlines())
+    hunks = diff_hunks(ops, CONTEXT_LINES)
+    return {
+        "applied": True,
+        "error": "",
+        "unified": format_unified(hunks, file_path or "code"),
+        "hunks": [{"header": hunk_header(hunk), "rows": _rows(hunk)} for hunk in hunks],
+        "added": sum(len(lines) for op, lines in ops if op == INSERT),
+        "removed": sum(len(lines) for op, lines in ops if op == DELETE),
+    }
+
+
+def suggestion_diff(source_id: str, suggestion: dict, file_path: str = "") -> dict:
+    """build_diff() for a stored source, memoized per (source, suggestion)."""
+    key = hashlib.sha256(
+        "\0".join(
+            (source_id, file_path, json.dumps(suggestion, sort_keys=True, default=str))
+        ).encode("utf-8")
+    ).hexdigest()
+    cached = _cache.get(key)
+    if cached is not None:
+        SUGGESTION_DIFFS.inc("hit")
+        return json.loads(cached)
+    SUGGESTION_DIFFS.inc("miss")
+    diff = build_diff(read(source_id), suggestion, file_path)
+    _cache.put(key, json.dumps(diff))
+    return diff
@@ -0,0 +1,170 @@
+# reviews/export.py
+"""
+Streaming export of reviews as NDJSON or CSV.
+
+Used by the api/reviews/export/ view and `python manage.py
+export_reviews`. Rows are read with values_list() and a chunked
+.iterator(), so no model instances are built and memory stays flat
+however many reviews match. Each chunk of EXPORT_CHUNK_SIZE rows becomes
+one piece of output. The heavy raw_response and code columns are left
+out unless asked for. When they are asked for, they are fetched in one
+query per chunk.
+"""
+import csv
+import io
+import json
+from datetime import datetime, time
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import blobs, raw_store
+from .models import Review
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Export column -> Review field read with values_list()
+FIELD_COLUMNS = {
+    "id": "id",
+    "submission": "submission_id",
+    "file_path": "file_path",
+    "created_at": "created_at",
+    "processed": "processed",
+    "processing_error": "processing_error",
+    "quality_score": "quality_score",
+    "summary": "summary",
+    "issues": "issues",
+    "suggestions": "suggestions",
+    "tests_suggestions": "tests_suggestions",
+    "llm_provider": "llm_provider",
+    "llm_model": "llm_model",
+    "input_tokens": "input_tokens",
+    "output_tokens": "output_tokens",
+    "llm_latency_ms": "llm_latency_ms",
+    "llm_calls": "llm_calls",
+    "stage_timings": "stage_timings",
+    "content_hash": "content_hash",
+    "source": "source_id",
+    "reused_from": "reused_from_id",
+}
+# Columns stored outside the reviews table, loaded per chunk
+HEAVY_COLUMNS = ("raw_response", "code")
+COLUMNS = tuple(FIELD_COLUMNS) + HEAVY_COLUMNS
+DEFAULT_COLUMNS = tuple(FIELD_COLUMNS)
+# Written as JSON text in CSV cells
+JSON_COLUMNS = {"issues", "suggestions", "stage_timings", "raw_response"}
+
+
+def parse_columns(text) -> tuple:
+    """Column names from "a,b,c"; the defaults when empty. ValueError on unknown names."""
+    names = [name.strip() for name in (text or "").split(",") if name.strip()]
+    if not names:
+        return DEFAULT_COLUMNS
+    unknown = [name for name in names if name not in COLUMNS]
+    if unknown:
+        raise ValueError(
+            f"Unknown column(s): {', '.join(unknown)}. Available: {', '.join(COLUMNS)}."
+        )
+    return tuple(dict.fromkeys(names))
+
+
+def parse_moment(text, end_of_day=False):
+    """Aware datetime from an ISO date or datetime; None when empty."""
+    if not text:
+        return None
+    moment = parse_datetime(text)
+    if moment is None:
+        day = parse_date(text)
+        if day is None:
+            raise ValueError(f"Not an ISO date or datetime: {text!r}.")
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def reviews_for_export(submission=None, since=None, until=None):
+    """Reviews of a submission and/or created in [since, until], oldest first."""
+    reviews = Review.objects.all()
+    if submission is not None:
+        reviews = reviews.filter(submission_id=submission)
+    if since is not None:
+        reviews = reviews.filter(created_at__gte=since)
+    if until is not None:
+        reviews = reviews.filter(created_at__lte=until)
+    return reviews.order_by("id")
+
+
+def _chunks(reviews, columns):
+    """Lists of {column: value} dicts, EXPORT_CHUNK_SIZE rows at a time."""
+    size = max(1, settings.EXPORT_CHUNK_SIZE)
+    fields = ["id"] + [FIELD_COLUMNS[c] for c in columns if c in FIELD_COLUMNS]
+    if "code" in columns:
+        fields.append("source_id")
+    fields = list(dict.fromkeys(fields))
+    rows = reviews.values_list(*fields).iterator(chunk_size=size)
+    while True:
+        chunk = [dict(zip(fields, row)) for row in islice(rows, size)]
+        if not chunk:
+            return
+        raw = raw_store.load_many(r["id"] for r in chunk) if "raw_response" in columns else {}
+        code = (
+            blobs.read_many(r["source_id"] for r in chunk if r["source_id"])
+            if "code" in columns
+            else {}
+        )
+        out = []
+        for row in chunk:
+            values = {}
+            for column in columns:
+                if column == "raw_response":
+                    values[column] = raw.get(row["id"])
+                elif column == "code":
+                    values[column] = code.get(row["source_id"])
+                else:
+                    values[column] = row[FIELD_COLUMNS[column]]
+            out.append(values)
+        yield out
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_cell(column, value):
+    if value is None:
+        return ""
+    if column in JSON_COLUMNS:
+        return json.dumps(value, separators=(",", ":"))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream(reviews, columns=DEFAULT_COLUMNS, fmt="ndjson"):
+    """Yield the export as text pieces, one per chunk of rows (CSV starts with a header)."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        for chunk in _chunks(reviews, columns):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_cell(c, row[c]) for c in columns] for row in chunk)
+            yield buffer.getvalue()
+    elif fmt == "ndjson":
+        for chunk in _chunks(reviews, columns):
+            yield "".join(
+                json.dumps(row, default=_json_default, ensure_ascii=False) + "\n"
+                for row in chunk
+            )
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; use {' or '.join(FORMATS)}.")
@@ -0,0 +1,104 @@
+# reviews/findings.py
+"""
+Issue and Suggestion rows extracted from the review JSON.
+
+extract() runs in the same transaction that stores the reviews, so the
+tables match Review.issues / Review.suggestions; backfill_findings covers
+reviews stored before the tables existed. Severity and type are
+normalized to lower case, line references to the first line number.
+"""
+import re
+
+from django.db import transaction
+
+from .models import Issue, Review, Suggestion
+
+# Review columns extraction needs
+FINDING_FIELDS = (
+    "submission_id",
+    "file_path",
+    "created_at",
+    "issues",
+    "suggestions",
+)
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def normalize_label(value, max_length=50) -> str:
+    """Lower-cased severity / type label, "unknown" when missing."""
+    return (str(value or "").strip().lower() or "unknown")[:max_length]
+
+
+def parse_lines(value):
+    """(first, last) line numbers from 12, "12" or "12-14"; (None, None) if absent."""
+    text = "" if value is None else str(value)
+    numbers = [int(n) for n in _NUMBER_RE.findall(text)]
+    if not numbers:
+        return None, None
+    return numbers[0], numbers[-1]
+
+
+def json_entries(value):
+    """The dict entries of an issues / suggestions JSON list."""
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict)]
+
+
+def _rows(review):
+    common = {
+        "review_id": review.id,
+        "submission_id": review.submission_id,
+        "file_path": review.file_path or "",
+        "created_at": review.created_at,
+    }
+    issues = [
+        Issue(
+            **common,
+            position=position,
+            line=parse_lines(item.get("line"))[0],
+            severity=normalize_label(item.get("severity"), 20),
+            type=normalize_label(item.get("type")),
+            message=str(item.get("message") or ""),
+        )
+        for position, item in enumerate(json_entries(review.issues))
+    ]
+    suggestions = []
+    for position, item in enumerate(json_entries(review.suggestions)):
+        start, end = parse_lines(item.get("lines"))
+        suggestions.append(
+            Suggestion(
+                **common,
+                position=position,
+                line_start=start,
+                line_end=end,
+                description=str(item.get("description") or ""),
+                patch=str(item.get("patch") or ""),
+            )
+        )
+    return issues, suggestions
+
+
+def extract(reviews):
+    """Create Issue and Suggestion rows for freshly stored reviews."""
+    issues, suggestions = [], []
+    for review in reviews:
+        review_issues, review_suggestions = _rows(review)
+        issues.extend(review_issues)
+        suggestions.extend(review_suggestions)
+    Issue.objects.bulk_create(issues, batch_size=500)
+    Suggestion.objects.bulk_create(suggestions, batch_size=500)
+
+
+def reextract(reviews):
+    """Replace the extracted rows of already stored reviews."""
+    ids = [review.id for review in reviews]
+    with transaction.atomic():
+        Issue.objects.filter(review_id__in=ids).delete()
+        Suggestion.objects.filter(review_id__in=ids).delete()
+        extract(reviews)
+
+
+def reviews_for_extraction():
+    return Review.objects.only(*FINDING_FIELDS).order_by("id")
@@ -0,0 +1,228 @@
+# reviews/ingest.py
+import io
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+
+from . import archive_cache
+from .metrics import GITHUB_ARCHIVES
+
+ALLOWED_CODE_EXT = (".py", ".js", ".java", ".txt", ".md")
+
+# Bytes pulled from the network per read while streaming a download
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def iter_zip_files(zip_file, per_file_limit: int):
+    """
+    Yield (file_path, text) for each code file inside a ZIP archive.
+    `zip_file` may be raw bytes or a seekable binary file object.
+    Only includes ALLOWED_CODE_EXT extensions.
+
+    Members are decompressed lazily, one at a time, and never beyond what
+    is needed for `per_file_limit` characters. Members whose compression
+    ratio exceeds ZIP_MAX_COMPRESSION_RATIO are skipped, and ValueError is
+    raised once more than ZIP_MAX_UNCOMPRESSED_MB has been decompressed,
+    or before the first file when the sizes the archive declares already
+    add up to more.
+    """
+    if isinstance(zip_file, (bytes, bytearray)):
+        zip_file = io.BytesIO(zip_file)
+    max_total = settings.ZIP_MAX_UNCOMPRESSED_MB * 1024 * 1024
+    max_ratio = settings.ZIP_MAX_COMPRESSION_RATIO
+    # UTF-8 needs at most 4 bytes per character
+    max_member_bytes = per_file_limit * 4
+    too_large = ValueError(
+        f"Project is too large once unpacked (max {settings.ZIP_MAX_UNCOMPRESSED_MB} MB)."
+    )
+
+    zf = zipfile.ZipFile(zip_file)
+    members = [
+        info
+        for info in zf.infolist()
+        if not info.is_dir()
+        and any(info.filename.lower().endswith(ext) for ext in ALLOWED_CODE_EXT)
+        and not (info.compress_size and info.file_size / info.compress_size > max_ratio)
+    ]
+    # Declared sizes can lie, so what is actually read is counted below too
+    if sum(min(info.file_size, max_member_bytes) for info in members) > max_total:
+        raise too_large
+    total = 0
+    for info in members:
+        name = info.filename
+        try:
+            with zf.open(info) as member:
+                file_bytes = member.read(max_member_bytes)
+        except Exception:
+            continue
+        if info.compress_size and len(file_bytes) / info.compress_size > max_ratio:
+            continue
+        total += len(file_bytes)
+        if total > max_total:
+            raise too_large
+        text = file_bytes.decode("utf-8", errors="ignore")
+        text = text.strip()
+        if not text:
+            continue
+        if len(text) > per_file_limit:
+            text = text[:per_file_limit]
+        yield name, text
+
+
+def _stream_to_tempfile(resp, max_bytes: int):
+    """
+    Copy a streamed response body into a spooled temp file, aborting as
+    soon as it grows past `max_bytes`. Small archives never touch disk.
+    """
+    declared = resp.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ValueError(
+            f"Downloaded repo ZIP is too large (max {settings.MAX_FILE_UPLOAD_MB} MB)."
+        )
+    spool = tempfile.SpooledTemporaryFile(
+        max_size=settings.DOWNLOAD_SPOOL_MB * 1024 * 1024
+    )
+    size = 0
+    try:
+        for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(
+                    f"Downloaded repo ZIP is too large (max {settings.MAX_FILE_UPLOAD_MB} MB)."
+                )
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def parse_github_url(repo_url: str):
+    """
+    Split a GitHub repo URL into (base_url, branch).
+    Supports:
+      - https://github.com/user/repo
+      - https://github.com/user/repo/
+      - https://github.com/user/repo.git
+      - https://github.com/user/repo/tree/branch
+    Raises ValueError for anything that is not a github.com URL.
+    """
+    url = repo_url.strip()
+    if not url.startswith("http"):
+        raise ValueError("Please enter a full GitHub URL starting with https://")
+    if "github.com" not in url:
+        raise ValueError("Only GitHub URLs from github.com are supported.")
+
+    # strip .git if present
+    if url.endswith(".git"):
+        url = url[:-4]
+
+    branch = "main"
+    if "/tree/" in url:
+        base, _, branch_part = url.partition("/tree/")
+        base_url = base
+        branch = branch_part.strip("/").split("/")[0] or "main"
+    else:
+        base_url = url
+    return base_url.rstrip("/"), branch
+
+
+def _archive_url(base_url: str, branch: str) -> str:
+    """Archive URL of a branch, served from GITHUB_URL (github.com or a mirror)."""
+    repo_path = urlparse(base_url).path.strip("/")
+    return f"{settings.GITHUB_URL.rstrip('/')}/{repo_path}/archive/refs/heads/{branch}.zip"
+
+
+def _conditional(entry) -> dict:
+    return {"If-None-Match": entry.etag} if entry else {}
+
+
+def _probe(http, url: str, entry):
+    """Status of a HEAD request for an archive; None if the probe failed."""
+    try:
+        resp = http.head(
+            url,
+            headers=_conditional(entry),
+            timeout=settings.GITHUB_PROBE_TIMEOUT,
+            allow_redirects=True,
+        )
+    except requests.RequestException:
+        return None
+    return resp.status_code
+
+
+def _fetch(http, url: str, repo: str, branch: str, entry, max_bytes: int):
+    """
+    Conditional GET of one archive. Returns (status, file), where file is
+    the cached archive on a 304 and the fresh download on a 200, else None.
+    """
+    with http.get(url, headers=_conditional(entry), timeout=60, stream=True) as resp:
+        if resp.status_code == 200:
+            archive = _stream_to_tempfile(resp, max_bytes)
+            archive_cache.store(repo, branch, archive, resp.headers.get("ETag"))
+            GITHUB_ARCHIVES.inc("downloaded")
+            return 200, archive
+        if resp.status_code != 304 or entry is None:
+            return resp.status_code, None
+    try:
+        archive = archive_cache.open_entry(entry)
+    except FileNotFoundError:
+        # Evicted since the lookup: fetch it again without the ETag
+        return _fetch(http, url, repo, branch, None, max_bytes)
+    GITHUB_ARCHIVES.inc("revalidated")
+    return 304, archive
+
+
+def download_github_repo_zip(repo_url: str):
+    """
+    Given a GitHub repo URL, download its ZIP (main/master or specific branch).
+    Returns a seekable file; the caller is responsible for closing it.
+
+    The candidate branches are probed concurrently with HEAD requests and
+    only the first one that exists is downloaded. Archives are kept in
+    reviews.archive_cache and revalidated with their ETag, so resubmitting
+    an unchanged repo downloads nothing.
+    """
+    base_url, branch = parse_github_url(repo_url)
+    repo = urlparse(base_url).path.strip("/").lower()
+    max_bytes = settings.MAX_FILE_UPLOAD_MB * 1024 * 1024
+    candidates = list(dict.fromkeys([branch, "main", "master"]))
+    cached = {br: archive_cache.lookup(repo, br) for br in candidates}
+    last_status = None
+
+    with requests.Session() as http:
+        with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+            statuses = list(
+                pool.map(
+                    lambda br: _probe(http, _archive_url(base_url, br), cached[br]),
+                    candidates,
+                )
+            )
+        for br, probed in zip(candidates, statuses):
+            if probed == 404:
+                last_status = probed
+                continue
+            entry = cached[br]
+            if probed == 304 and entry is not None:
+                try:
+                    archive = archive_cache.open_entry(entry)
+                except FileNotFoundError:
+                    pass
+                else:
+                    GITHUB_ARCHIVES.inc("revalidated")
+                    return archive
+            # Exists, or the probe was inconclusive (HEAD refused, network error)
+            last_status, archive = _fetch(
+                http, _archive_url(base_url, br), repo, br, entry, max_bytes
+            )
+            if archive is not None:
+                return archive
+
+    raise ValueError(
+        f"Could not download ZIP from GitHub. Last HTTP status: {last_status}."
+    )
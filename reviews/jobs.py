@@ -0,0 +1,549 @@
+# reviews/jobs.py
+"""
+Database-backed job queue for ZIP / GitHub project reviews.
+
+The web request only creates a queued Submission. A worker
+(`python manage.py run_review_worker`) then:
+  1. claims a queued submission, extracts its files and creates one
+     ReviewJob per file (status "expanding" -> "running");
+  2. claims pending ReviewJobs and runs their LLM reviews on a thread
+     pool (per-provider limits live in reviews.llm_client), answering
+     repeated file contents from the review cache and packing small
+     files several to a prompt;
+  3. marks the submission "done" once no job is pending or running.
+
+Re-submitting a GitHub repo only reviews added or modified files; see
+expand_submission().
+
+Claims are compare-and-set UPDATEs on the status column, so several
+workers can share the same database without extra locking services.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .ingest import download_github_repo_zip, iter_zip_files
+from .models import Review, ReviewJob, Submission
+from . import blobs, raw_store, review_cache
+from .derived import record_reviews
+from .metrics import timer
+from .review_cache import CACHED_FIELDS, content_hash
+from .writer import ReviewWriter, finish_submission_if_complete
+from .pipeline import (
+    cached_review_fields,
+    failed_review_fields,
+    file_cache_key,
+    file_cache_keys,
+    is_batchable,
+    review_batch,
+    review_file,
+)
+
+CLAIM_BATCH = 10
+# Jobs inserted per bulk_create (and per transaction) while extracting an archive
+EXPAND_BATCH = 100
+
+
+def _discard_upload(submission):
+    """
+    Delete the uploaded ZIP once it has been extracted: its files now live
+    in the source blob store.
+    """
+    if submission.uploaded_file:
+        submission.uploaded_file.delete(save=False)
+
+
+def _fail_submission(submission, error: str):
+    _discard_upload(submission)
+    submission.status = Submission.STATUS_FAILED
+    submission.error = error
+    submission.save(update_fields=["status", "error", "uploaded_file"])
+    # Jobs of batches committed before extraction failed
+    submission.jobs.filter(status=ReviewJob.STATUS_PENDING).update(
+        status=ReviewJob.STATUS_FAILED, error=error, finished_at=timezone.now()
+    )
+
+
+def claim_submission(submission_id=None):
+    """
+    Atomically move one queued submission (`submission_id` only, when
+    given) to "expanding" and return it.
+    """
+    queued = Submission.objects.filter(status=Submission.STATUS_QUEUED)
+    if submission_id is not None:
+        queued = queued.filter(id=submission_id)
+    candidates = (
+        queued.order_by("created_at").values_list("id", flat=True)[:CLAIM_BATCH]
+    )
+    for sub_id in candidates:
+        claimed = Submission.objects.filter(
+            id=sub_id, status=Submission.STATUS_QUEUED
+        ).update(
+            status=Submission.STATUS_EXPANDING,
+            claimed_at=timezone.now(),
+            expand_attempts=F("expand_attempts") + 1,
+        )
+        if claimed:
+            return Submission.objects.get(id=sub_id)
+    return None
+
+
+def find_previous_submission(submission):
+    """
+    Latest finished run of the same repo/branch with the same language and
+    notes, whose unchanged file reviews can be carried over.
+    """
+    if not submission.repo_key:
+        return None
+    return (
+        Submission.objects.filter(
+            repo_key=submission.repo_key,
+            status=Submission.STATUS_DONE,
+            language=submission.language,
+            code=submission.code,
+            created_at__lt=submission.created_at,
+        )
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def _store_sources(items):
+    """Point each (unsaved ReviewJob, file text) at its stored SourceBlob."""
+    digests = blobs.put_many(code for _, code in items)
+    for (job, _), digest in zip(items, digests):
+        job.source_id = digest
+
+
+def _create_jobs(items):
+    """Create pending jobs from (unsaved ReviewJob, file text) pairs."""
+    _store_sources(items)
+    ReviewJob.objects.bulk_create([job for job, _ in items])
+
+
+def _carry_over_reviews(submission, items):
+    """
+    Copy earlier reviews of unchanged files into `submission`. `items` is
+    a list of (unsaved ReviewJob, previous Review id, file text).
+    """
+    _store_sources([(job, code) for job, _, code in items])
+    originals = Review.objects.in_bulk([review_id for _, review_id, _ in items])
+    reviews = []
+    for job, review_id, _ in items:
+        original = originals[review_id]
+        reviews.append(
+            Review(
+                submission=submission,
+                file_path=job.file_path,
+                llm_provider=original.llm_provider,
+                llm_model=original.llm_model,
+                content_hash=job.content_hash,
+                source_id=job.source_id,
+                reused_from_id=original.reused_from_id or original.id,
+                processed=True,
+                **{
+                    name: getattr(original, name)
+                    for name in CACHED_FIELDS
+                    if name != "raw_response"
+                },
+            )
+        )
+    Review.objects.bulk_create(reviews)
+    raw_store.copy(
+        (review, review_id) for review, (_, review_id, _) in zip(reviews, items)
+    )
+    record_reviews(reviews)
+
+    now = timezone.now()
+    done_jobs = []
+    for (job, _, _), review in zip(items, reviews):
+        job.review = review
+        job.status = ReviewJob.STATUS_DONE
+        job.finished_at = now
+        done_jobs.append(job)
+    ReviewJob.objects.bulk_create(done_jobs)
+
+
+def expand_submission(submission):
+    """
+    Extract the submission's archive and create one pending job per file.
+    Files are streamed out of the archive and written in batches of
+    EXPAND_BATCH, each in its own short transaction, so memory use does
+    not grow with the size of the project and the SQLite write lock is
+    never held for the whole archive. Jobs of committed batches may be
+    claimed while extraction goes on. A retry after a dead worker skips
+    the files an earlier attempt already queued.
+
+    When the same repo/branch was reviewed before, files whose content hash
+    is unchanged get the earlier review copied over (marked via
+    Review.reused_from) instead of a new job, and files that disappeared
+    are listed in Submission.deleted_files.
+    """
+    previous = find_previous_submission(submission)
+    previous_files = {}
+    if previous is not None:
+        for file_path, digest, review_id, processed in previous.reviews.values_list(
+            "file_path", "content_hash", "id", "processed"
+        ):
+            previous_files[file_path] = (digest, review_id) if processed else None
+
+    # Files queued by an earlier attempt that died part way
+    done = set(submission.jobs.values_list("file_path", flat=True))
+    created = len(done)
+    seen = set()
+
+    def write(batch, reused):
+        if not batch and not reused:
+            return 0
+        with transaction.atomic():
+            _create_jobs(batch)
+            _carry_over_reviews(submission, reused)
+        return len(batch) + len(reused)
+
+    try:
+        if submission.repo_url:
+            with timer("download"):
+                zip_source = download_github_repo_zip(submission.repo_url)
+        elif submission.uploaded_file:
+            zip_source = submission.uploaded_file.open("rb")
+        else:
+            raise ValueError("Submission has neither a ZIP upload nor a repo URL.")
+
+        with zip_source, timer("unzip"):
+            batch, reused = [], []
+            for file_path, file_code in iter_zip_files(
+                zip_source, per_file_limit=settings.REVIEW_MAX_FILE_CHARS
+            ):
+                seen.add(file_path)
+                if file_path in done:
+                    continue
+                digest = content_hash(file_code)
+                earlier = previous_files.get(file_path)
+                job = ReviewJob(
+                    submission=submission, file_path=file_path, content_hash=digest
+                )
+                if earlier and earlier[0] == digest:
+                    reused.append((job, earlier[1], file_code))
+                else:
+                    batch.append((job, file_code))
+                if len(batch) + len(reused) >= EXPAND_BATCH:
+                    created += write(batch, reused)
+                    batch, reused = [], []
+            created += write(batch, reused)
+    except Exception as e:
+        _fail_submission(submission, str(e))
+        return 0
+
+    if not created:
+        _fail_submission(
+            submission, "No readable .py/.js/.java/.txt/.md files found in the project."
+        )
+        return 0
+
+    _discard_upload(submission)
+    submission.previous_submission = previous
+    submission.deleted_files = sorted(set(previous_files) - seen)
+    submission.status = Submission.STATUS_RUNNING
+    submission.save(
+        update_fields=["previous_submission", "deleted_files", "status", "uploaded_file"]
+    )
+    # Everything may have been carried over already
+    finish_submission_if_complete(submission.id)
+    return created
+
+
+def claim_job(submission_id=None):
+    """
+    Atomically move one pending job (of `submission_id` only, when given)
+    to "running" and return it.
+    """
+    pending = ReviewJob.objects.filter(status=ReviewJob.STATUS_PENDING)
+    if submission_id is not None:
+        pending = pending.filter(submission_id=submission_id)
+    candidates = pending.order_by("id").values_list("id", flat=True)[:CLAIM_BATCH]
+    for job_id in candidates:
+        claimed = ReviewJob.objects.filter(
+            id=job_id, status=ReviewJob.STATUS_PENDING
+        ).update(
+            status=ReviewJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return ReviewJob.objects.select_related("submission").get(id=job_id)
+    return None
+
+
+def complete_job(job, review):
+    """Attach the stored review to its job and close the job."""
+    job.review = review
+    job.status = ReviewJob.STATUS_DONE if review.processed else ReviewJob.STATUS_FAILED
+    job.error = review.processing_error
+    job.finished_at = timezone.now()
+    job.save(update_fields=["review", "status", "error", "finished_at"])
+    finish_submission_if_complete(job.submission_id)
+
+
+def store_job_result(job, fields):
+    with transaction.atomic():
+        review = Review.objects.create(
+            **fields, content_hash=job.content_hash, source_id=job.source_id
+        )
+        record_reviews([review])
+    complete_job(job, review)
+    return review
+
+
+def run_job(job):
+    """Review one claimed file and store the result as a Review row."""
+    return store_job_result(job, review_file(job.submission, job.file_path, job.code))
+
+
+def _requeue_stale_submissions(cutoff):
+    """
+    Put submissions whose worker died while extracting them back into the
+    queue. Extraction commits in batches; the next attempt keeps the jobs
+    already created and only queues the remaining files. Submissions that
+    already used up REVIEW_JOB_MAX_ATTEMPTS are failed instead.
+    """
+    stale = Submission.objects.filter(
+        status=Submission.STATUS_EXPANDING, claimed_at__lt=cutoff
+    )
+    for submission in stale.filter(
+        expand_attempts__gte=settings.REVIEW_JOB_MAX_ATTEMPTS
+    ):
+        _fail_submission(
+            submission, "Worker did not finish extracting the files in time."
+        )
+    return stale.update(status=Submission.STATUS_QUEUED)
+
+
+def requeue_stale_jobs():
+    """
+    Put jobs (and submissions being extracted) whose worker died back into
+    the queue. Jobs that already used up REVIEW_JOB_MAX_ATTEMPTS are failed
+    instead. Returns how many jobs and submissions were requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.REVIEW_JOB_STALE_SECONDS)
+    stale = ReviewJob.objects.filter(
+        status=ReviewJob.STATUS_RUNNING, started_at__lt=cutoff
+    )
+    exhausted = list(
+        stale.filter(attempts__gte=settings.REVIEW_JOB_MAX_ATTEMPTS).values_list(
+            "submission_id", flat=True
+        )
+    )
+    stale.filter(attempts__gte=settings.REVIEW_JOB_MAX_ATTEMPTS).update(
+        status=ReviewJob.STATUS_FAILED,
+        error="Worker did not finish this job in time.",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=ReviewJob.STATUS_PENDING)
+    for submission_id in set(exhausted):
+        finish_submission_if_complete(submission_id)
+    return requeued + _requeue_stale_submissions(cutoff)
+
+
+class _Drainer:
+    """
+    State for one drain() pass: futures in flight, jobs waiting on a shared
+    LLM answer, and small files collected for the next batched prompt.
+    """
+
+    def __init__(self, pool, max_workers, submission_id=None):
+        self.pool = pool
+        self.max_workers = max_workers
+        self.submission_id = submission_id
+        self.processed = 0
+        self.in_flight = {}  # future -> ("single" | "batch", [cache keys])
+        self.waiting = {}  # cache key -> jobs sharing that LLM answer
+        self.batch = []  # (cache key, job) not yet sent
+        self.batch_chars = 0
+        self.writer = ReviewWriter()
+        # Answers buffered in the writer but not yet in the review cache
+        self.unflushed = {}  # cache key -> Review kwargs
+
+    def run(self):
+        try:
+            while True:
+                self._fill()
+                if not self.in_flight:
+                    return self.processed
+                done, _ = wait(
+                    self.in_flight,
+                    timeout=self.writer.seconds_until_flush(),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    self._collect(future)
+                self.writer.maybe_flush()
+                if not len(self.writer):
+                    self.unflushed.clear()
+        finally:
+            self.writer.flush()
+
+    def _fill(self):
+        while len(self.in_flight) < self.max_workers:
+            submission = claim_submission(self.submission_id)
+            if submission is not None:
+                expand_submission(submission)
+                self.processed += 1
+                continue
+            job = claim_job(self.submission_id)
+            if job is None:
+                break
+            self._add(job)
+        self._flush_batch()
+
+    def _add(self, job):
+        # Keys per configured provider; the first one identifies the file
+        keys = file_cache_keys(job.submission, job.code)
+        key = keys[0]
+        if key in self.waiting:
+            self.waiting[key].append(job)
+            return
+        cached = next(
+            (self.unflushed[k] for k in keys if k in self.unflushed), None
+        ) or review_cache.lookup(keys)
+        if cached is not None:
+            self.writer.add(
+                job, cached_review_fields(job.submission, job.file_path, cached)
+            )
+            self.processed += 1
+            return
+
+        self.waiting[key] = [job]
+        if not is_batchable(job.code):
+            self._submit_single(key, job)
+            return
+        if self.batch and (
+            self.batch[0][1].submission_id != job.submission_id
+            or self.batch_chars + len(job.code) > settings.REVIEW_BATCH_MAX_CHARS
+        ):
+            self._flush_batch()
+        self.batch.append((key, job))
+        self.batch_chars += len(job.code)
+        if len(self.batch) >= settings.REVIEW_BATCH_MAX_FILES:
+            self._flush_batch()
+
+    def _submit_single(self, key, job):
+        future = self.pool.submit(review_file, job.submission, job.file_path, job.code)
+        self.in_flight[future] = ("single", [key])
+
+    def _flush_batch(self):
+        if not self.batch:
+            return
+        if len(self.batch) == 1:
+            self._submit_single(*self.batch[0])
+        else:
+            submission = self.batch[0][1].submission
+            files = [(job.file_path, job.code) for _, job in self.batch]
+            future = self.pool.submit(review_batch, submission, files)
+            self.in_flight[future] = ("batch", [key for key, _ in self.batch])
+        self.batch = []
+        self.batch_chars = 0
+
+    def _collect(self, future):
+        kind, keys = self.in_flight.pop(future)
+        if kind == "batch":
+            try:
+                results = future.result()
+            except Exception:
+                results = {}
+            for key in keys:
+                leader = self.waiting[key][0]
+                fields = results.get(leader.file_path)
+                if fields is None:
+                    # Could not be split out of the batch: review it alone
+                    self._submit_single(key, leader)
+                else:
+                    self._finish(key, fields)
+            return
+
+        key = keys[0]
+        leader = self.waiting[key][0]
+        try:
+            fields = future.result()
+        except Exception as e:
+            fields = failed_review_fields(leader.submission, leader.file_path, e)
+        self._finish(key, fields)
+
+    def _finish(self, key, fields):
+        leader, *followers = self.waiting.pop(key)
+        # Cached under the provider that answered, which after a failover
+        # or hedge is not necessarily the preferred one
+        store_key = None
+        if fields["processed"] and fields.get("llm_provider"):
+            store_key = file_cache_key(
+                leader.submission, leader.code, fields["llm_provider"]
+            )
+            self.unflushed[store_key] = fields
+        self.writer.add(leader, fields, cache_key=store_key)
+        self.processed += 1
+        for job in followers:
+            if fields["processed"]:
+                follower_fields = cached_review_fields(job.submission, job.file_path, fields)
+            else:
+                follower_fields = {
+                    **fields,
+                    "submission": job.submission,
+                    "file_path": job.file_path,
+                }
+            self.writer.add(job, follower_fields)
+            self.processed += 1
+
+
+def drain(max_workers=None, submission_id=None):
+    """
+    Process queued work until the queue is empty, or only the work of one
+    submission when `submission_id` is given.
+
+    LLM calls run on up to `max_workers` threads; claiming jobs, cache
+    lookups and writing Review rows stay on the calling thread so the
+    database only ever sees one writer per worker process, and finished
+    reviews are written in batches (see reviews/writer.py). Jobs whose
+    content is already cached are answered without an LLM call, jobs with
+    the same content as an in-flight call wait for that call instead of
+    making their own, and small files are packed into batched prompts.
+    Returns the number of work items done.
+    """
+    max_workers = max_workers or settings.REVIEW_WORKER_THREADS
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return _Drainer(pool, max_workers, submission_id).run()
+
+
+def _progress(submission, counts, reviews) -> dict:
+    return {
+        "id": submission.id,
+        "status": submission.status,
+        "status_display": submission.get_status_display(),
+        "error": submission.error,
+        "finished": submission.is_finished,
+        "jobs": {
+            "total": sum(counts.values()),
+            **{status: counts.get(status, 0) for status, _ in ReviewJob.STATUS_CHOICES},
+        },
+        "reviews": reviews,
+    }
+
+
+def submission_progress(submission) -> dict:
+    """Job counts and status for the project status endpoint."""
+    counts = {
+        row["status"]: row["n"]
+        for row in submission.jobs.values("status").annotate(n=Count("id"))
+    }
+    return _progress(submission, counts, submission.reviews.count())
+
+
+async def asubmission_progress(submission) -> dict:
+    """submission_progress on the async ORM."""
+    counts = {
+        row["status"]: row["n"]
+        async for row in submission.jobs.values("status").annotate(n=Count("id"))
+    }
+    return _progress(submission, counts, await submission.reviews.acount())
@@ -0,0 +1,282 @@
+# reviews/llm_async.py
+"""
+Async counterparts of reviews/llm_client.py on httpx, for the ASGI views.
+
+Requests, responses, retries and metrics are the same as in the sync
+client; only the transport differs. An awaiting review holds no thread,
+so one event loop can keep hundreds of reviews in flight, still capped by
+LLM_MAX_CONCURRENCY / LLM_REQUESTS_PER_MINUTE per provider. Clients and
+limiters belong to the event loop that created them. Their caps are
+separate from the thread limiters of the sync client.
+"""
+import asyncio
+import json
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+
+import httpx
+from django.conf import settings
+
+from .llm_client import (
+    RETRY_STATUSES,
+    DeadlineExceeded,
+    LLMResponse,
+    _anthropic_request,
+    _anthropic_response,
+    _anthropic_stream_text,
+    _backoff,
+    _finish_call,
+    _finish_stream,
+    _measured,
+    _openai_request,
+    _openai_response,
+    _openai_stream_text,
+    _retry_after,
+    _tokens,
+    remaining,
+)
+from .metrics import LLM_RETRIES
+
+
+class AsyncProviderLimiter:
+    """ProviderLimiter for coroutines: waits without blocking the loop."""
+
+    def __init__(self, concurrency: int, rpm: int = 0):
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self.rpm = max(0, rpm)
+        self._calls = deque()
+
+    async def _wait_for_rate(self):
+        if not self.rpm:
+            return
+        while True:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            if len(self._calls) < self.rpm:
+                self._calls.append(now)
+                return
+            await asyncio.sleep(60 - (now - self._calls[0]))
+
+    async def __aenter__(self):
+        await self._slots.acquire()
+        try:
+            await self._wait_for_rate()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+# event loop -> {"clients": {provider: AsyncClient}, "limiters": {provider: ...}}
+_loop_state = weakref.WeakKeyDictionary()
+
+
+def _state() -> dict:
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        state = _loop_state[loop] = {"clients": {}, "limiters": {}}
+    return state
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """Keep-alive client per provider for the running event loop."""
+    clients = _state()["clients"]
+    client = clients.get(provider)
+    if client is None:
+        client = clients[provider] = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=settings.LLM_HTTP_POOL_SIZE,
+            ),
+        )
+    return client
+
+
+def get_limiter(provider: str) -> AsyncProviderLimiter:
+    limiters = _state()["limiters"]
+    limiter = limiters.get(provider)
+    if limiter is None:
+        limiter = limiters[provider] = AsyncProviderLimiter(
+            settings.LLM_MAX_CONCURRENCY.get(provider, 4),
+            settings.LLM_REQUESTS_PER_MINUTE.get(provider, 0),
+        )
+    return limiter
+
+
+async def aclose_clients():
+    """Close the clients of the running event loop (shutdown, tests)."""
+    clients = _state()["clients"]
+    while clients:
+        _, client = clients.popitem()
+        await client.aclose()
+
+
+@asynccontextmanager
+async def _asend(provider: str, url: str, payload: dict, headers: dict, stream=False):
+    """
+    POST like llm_client._send: retried on transport errors and
+    RETRY_STATUSES, limiter slot held while the caller reads the response.
+    Without `stream` the body is read before it is handed over.
+    """
+    client = get_client(provider)
+    limiter = get_limiter(provider)
+    attempts = settings.LLM_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        last_try = attempt == attempts - 1
+        async with limiter:
+            request = client.build_request("POST", url, json=payload, headers=headers)
+            try:
+                r = await client.send(request, stream=True)
+            except httpx.TransportError as e:
+                if last_try:
+                    raise
+                LLM_RETRIES.inc(provider, type(e).__name__)
+                delay = _backoff(attempt)
+            else:
+                if r.status_code not in RETRY_STATUSES or last_try:
+                    try:
+                        r.raise_for_status()
+                        if not stream:
+                            await r.aread()
+                        yield r
+                    finally:
+                        await r.aclose()
+                    return
+                LLM_RETRIES.inc(provider, str(r.status_code))
+                delay = _retry_after(r)
+                if delay is None:
+                    delay = _backoff(attempt)
+                delay = min(delay, settings.LLM_RETRY_MAX_DELAY)
+                await r.aclose()
+        await asyncio.sleep(delay)
+
+
+async def _apost_json(provider: str, url: str, payload: dict, headers: dict) -> dict:
+    async with _asend(provider, url, payload, headers) as r:
+        return r.json()
+
+
+async def _aiter_sse_data(provider: str, url: str, payload: dict, headers: dict):
+    async with _asend(provider, url, payload, headers, stream=True) as r:
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            try:
+                yield json.loads(data)
+            except ValueError:
+                continue
+
+
+async def _within(provider, call, deadline):
+    """
+    Await `call`, cancelling it with DeadlineExceeded once `deadline`
+    passes. Used inside _measured(), so the call is counted as a timeout
+    rather than as cancelled.
+    """
+    if deadline is None:
+        return await call
+    try:
+        return await asyncio.wait_for(call, max(0.0, remaining(deadline)))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"{provider} call ran past the file deadline") from None
+
+
+async def acall_openai_chat(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, deadline=None
+):
+    model, url, headers, payload = _openai_request(prompt, model, max_tokens, temperature)
+    with _measured("openai", model) as started:
+        data = await _within(
+            "openai", _apost_json("openai", url, payload, headers), deadline
+        )
+    return _finish_call(_openai_response(data, model), model, started)
+
+
+async def acall_anthropic_messages(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, deadline=None
+):
+    model, url, headers, payload = _anthropic_request(prompt, model, max_tokens, temperature)
+    with _measured("anthropic", model) as started:
+        d = await _within(
+            "anthropic", _apost_json("anthropic", url, payload, headers), deadline
+        )
+    return _finish_call(_anthropic_response(d, model), model, started)
+
+
+async def astream_openai_chat(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, usage=None
+):
+    """Async stream_openai_chat."""
+    model, url, headers, payload = _openai_request(
+        prompt, model, max_tokens, temperature, stream=True
+    )
+    counts = {}
+    with _measured("openai", model) as started:
+        async for event in _aiter_sse_data("openai", url, payload, headers):
+            text = _openai_stream_text(event, counts)
+            if text:
+                yield text
+    _finish_stream(
+        "openai", model, started, usage,
+        _tokens(counts.get("prompt_tokens")), _tokens(counts.get("completion_tokens")),
+    )
+
+
+async def astream_anthropic_messages(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, usage=None
+):
+    """Async stream_anthropic_messages."""
+    model, url, headers, payload = _anthropic_request(
+        prompt, model, max_tokens, temperature, stream=True
+    )
+    counts = {}
+    with _measured("anthropic", model) as started:
+        async for event in _aiter_sse_data("anthropic", url, payload, headers):
+            text = _anthropic_stream_text(event, counts)
+            if text:
+                yield text
+    _finish_stream(
+        "anthropic", model, started, usage,
+        _tokens(counts.get("input_tokens")), _tokens(counts.get("output_tokens")),
+    )
+
+
+def astream_llm(prompt: str, provider=None, **kwargs):
+    """Async stream_llm."""
+    if provider is None:
+        from .router import ranked_providers
+
+        provider = ranked_providers()[0]
+    if provider == "anthropic":
+        return astream_anthropic_messages(prompt, **kwargs)
+    else:
+        return astream_openai_chat(prompt, **kwargs)
+
+
+async def acall_llm(prompt: str, provider=None, deadline=None, **kwargs) -> LLMResponse:
+    """
+    Async call_llm: routed across providers when `provider` is None
+    (router.aroute). A `deadline` cancels the request outright when it
+    passes, which the sync client cannot do.
+    """
+    if provider is None:
+        from .router import aroute
+
+        return await aroute(prompt, deadline=deadline, **kwargs)
+    if provider == "anthropic":
+        return await acall_anthropic_messages(prompt, deadline=deadline, **kwargs)
+    return await acall_openai_chat(prompt, deadline=deadline, **kwargs)
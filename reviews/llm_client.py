@@ -1,13 +1,284 @@
 # reviews/llm_client.py
+import asyncio
 import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.utils import timezone
+
+from .metrics import LLM_LATENCY, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS
+
+# Status codes worth another attempt: rate limited, overloaded, transient 5xx
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+@dataclass
+class LLMResponse:
+    """Text of one LLM call plus what the API reported about it."""
+
+    text: str
+    provider: str
+    model: str
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    latency: float = 0.0  # seconds, retries included
+
+
+class DeadlineExceeded(TimeoutError):
+    """The per-file deadline passed before the LLM answered."""
+
+
+class Cancelled(RuntimeError):
+    """The call was abandoned because another provider answered first."""
+
+
+def remaining(deadline) -> float | None:
+    """Seconds left until a time.monotonic() deadline (None: no deadline)."""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _check_deadline(provider, deadline, cancel):
+    if cancel is not None and cancel.is_set():
+        raise Cancelled(f"{provider} call cancelled")
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"{provider} call ran past the file deadline")
+
+
+class ProviderLimiter:
+    """
+    Caps in-flight requests and requests-per-minute for one provider.
+    Used as a context manager around each API call; blocks until a slot
+    is free and the sliding one-minute window has room.
+    """
+
+    def __init__(self, concurrency: int, rpm: int = 0):
+        self.concurrency = max(1, concurrency)
+        self.rpm = max(0, rpm)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._calls = deque()
+
+    def _wait_for_rate(self):
+        if not self.rpm:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= 60:
+                    self._calls.popleft()
+                if len(self._calls) < self.rpm:
+                    self._calls.append(now)
+                    return
+                wait = 60 - (now - self._calls[0])
+            time.sleep(wait)
+
+    def __enter__(self):
+        self._slots.acquire()
+        try:
+            self._wait_for_rate()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Process-wide limiter for a provider, built from settings on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = ProviderLimiter(
+                settings.LLM_MAX_CONCURRENCY.get(provider, 4),
+                settings.LLM_REQUESTS_PER_MINUTE.get(provider, 0),
+            )
+            _limiters[provider] = limiter
+        return limiter
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(provider: str) -> requests.Session:
+    """
+    Process-wide keep-alive session per provider, so concurrent calls reuse
+    pooled TCP/TLS connections instead of handshaking for every file.
+    """
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=settings.LLM_HTTP_POOL_SIZE,
+                max_retries=0,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+        return session
+
+
+def _retry_after(resp) -> float | None:
+    """Seconds the server asked us to wait, from a Retry-After header."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(
+        settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BACKOFF * (2 ** attempt)
+    )
+    return random.uniform(0, ceiling)
+
+
+@contextmanager
+def _send(
+    provider: str, url: str, payload: dict, headers: dict, stream=False,
+    deadline=None, cancel=None,
+):
+    """
+    POST to a provider through its pooled session and rate limiter.
+    Connection errors, timeouts and RETRY_STATUSES are retried up to
+    LLM_MAX_RETRIES times; the limiter slot is released while backing off
+    and held while the caller reads the (possibly streamed) response.
+
+    With a `deadline` (time.monotonic() value) the read timeout shrinks to
+    the time left and no retry is started that could not finish in time;
+    setting the `cancel` event stops the call at its next attempt.
+    """
+    session = get_session(provider)
+    limiter = get_limiter(provider)
+    attempts = settings.LLM_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        last_try = attempt == attempts - 1
+        with limiter:
+            _check_deadline(provider, deadline, cancel)
+            read_timeout = settings.LLM_READ_TIMEOUT
+            left = remaining(deadline)
+            if left is not None:
+                read_timeout = max(0.001, min(read_timeout, left))
+            timeout = (settings.LLM_CONNECT_TIMEOUT, read_timeout)
+            try:
+                r = session.post(
+                    url, json=payload, headers=headers, timeout=timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                _check_deadline(provider, deadline, cancel)
+                if last_try:
+                    raise
+                LLM_RETRIES.inc(provider, type(e).__name__)
+                delay = _backoff(attempt)
+            else:
+                if r.status_code not in RETRY_STATUSES or last_try:
+                    with r:
+                        r.raise_for_status()
+                        yield r
+                    return
+                LLM_RETRIES.inc(provider, str(r.status_code))
+                delay = _retry_after(r)
+                if delay is None:
+                    delay = _backoff(attempt)
+                delay = min(delay, settings.LLM_RETRY_MAX_DELAY)
+                r.close()
+        left = remaining(deadline)
+        if left is not None and delay >= left:
+            raise DeadlineExceeded(f"{provider} call ran past the file deadline")
+        if cancel is not None:
+            cancel.wait(delay)
+        else:
+            time.sleep(delay)
+
+
+def _post_json(
+    provider: str, url: str, payload: dict, headers: dict, deadline=None, cancel=None
+) -> dict:
+    with _send(provider, url, payload, headers, deadline=deadline, cancel=cancel) as r:
+        return r.json()
+
 
-def call_openai_chat(prompt: str, model=None, max_tokens=1200, temperature=0.0):
+def _iter_sse_data(provider: str, url: str, payload: dict, headers: dict):
+    """Yield the JSON payload of every `data:` line of a server-sent event stream."""
+    with _send(provider, url, payload, headers, stream=True) as r:
+        for line in r.iter_lines():
+            line = line.decode("utf-8", errors="replace")
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            try:
+                yield json.loads(data)
+            except ValueError:
+                continue
+
+
+def _tokens(value):
+    return value if isinstance(value, int) and value >= 0 else None
+
+
+def _record_call(provider, model, outcome, started, input_tokens=None, output_tokens=None):
+    """Count one finished LLM call in the metrics; returns its latency."""
+    latency = time.monotonic() - started
+    LLM_REQUESTS.inc(provider, model, outcome)
+    LLM_LATENCY.observe(latency, provider, model, outcome)
+    if input_tokens:
+        LLM_TOKENS.inc(provider, model, "input", amount=input_tokens)
+    if output_tokens:
+        LLM_TOKENS.inc(provider, model, "output", amount=output_tokens)
+    return latency
+
+
+@contextmanager
+def _measured(provider, model):
+    """Record an LLM call that raised as an error before re-raising."""
+    started = time.monotonic()
+    try:
+        yield started
+    except (Cancelled, asyncio.CancelledError):
+        _record_call(provider, model, "cancelled", started)
+        raise
+    except DeadlineExceeded:
+        _record_call(provider, model, "timeout", started)
+        raise
+    except Exception:
+        _record_call(provider, model, "error", started)
+        raise
+
+
+def _openai_request(prompt, model, max_tokens, temperature, stream=False):
+    """(model, url, headers, payload) of a chat-completions call."""
     api_key = settings.OPENAI_API_KEY
     if not api_key:
         raise RuntimeError("OpenAI API key not configured.")
-    url = settings.OPENAI_API_URL
     model = model or settings.OPENAI_DEFAULT_MODEL
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     payload = {
@@ -19,37 +290,193 @@ def call_openai_chat(prompt: str, model=None, max_tokens=1200, temperature=0.0):
         "max_tokens": max_tokens,
         "temperature": temperature,
     }
-    r = requests.post(url, json=payload, headers=headers, timeout=120)
-    r.raise_for_status()
-    data = r.json()
+    if stream:
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+    return model, settings.OPENAI_API_URL, headers, payload
+
+
+def _openai_response(data, model) -> LLMResponse:
+    text = json.dumps(data)
     if "choices" in data and data["choices"]:
         msg = data["choices"][0].get("message", {})
         if isinstance(msg, dict):
-            return msg.get("content") or ""
-    return json.dumps(data)
+            text = msg.get("content") or ""
+    usage = data.get("usage") if isinstance(data.get("usage"), dict) else {}
+    return LLMResponse(
+        text,
+        "openai",
+        data.get("model") or model,
+        _tokens(usage.get("prompt_tokens")),
+        _tokens(usage.get("completion_tokens")),
+    )
 
 
-def call_anthropic_messages(prompt: str, model=None, max_tokens=1200, temperature=0.0):
+def _openai_stream_text(event, counts) -> str:
+    """Text delta of one streamed chat-completions event; usage goes to `counts`."""
+    if isinstance(event.get("usage"), dict):
+        counts.update(event["usage"])
+    return "".join(
+        (choice.get("delta") or {}).get("content") or ""
+        for choice in event.get("choices") or []
+    )
+
+
+def _anthropic_request(prompt, model, max_tokens, temperature, stream=False):
+    """(model, url, headers, payload) of a messages call."""
     api_key = settings.ANTHROPIC_API_KEY
     if not api_key:
         raise RuntimeError("Anthropic API key not configured.")
-    url = settings.ANTHROPIC_API_URL
     model = model or settings.ANTHROPIC_DEFAULT_MODEL
     headers = {"x-api-key": api_key, "content-type": "application/json"}
     payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens, "temperature": temperature}
-    r = requests.post(url, json=payload, headers=headers, timeout=120)
-    r.raise_for_status()
-    d = r.json()
+    if stream:
+        payload["stream"] = True
+    return model, settings.ANTHROPIC_API_URL, headers, payload
+
+
+def _anthropic_response(d, model) -> LLMResponse:
+    text = json.dumps(d)
+    usage = {}
     if isinstance(d, dict):
         if "content" in d and isinstance(d["content"], list):
-            return "".join(item.get("text", "") for item in d["content"] if isinstance(item, dict))
-        if "completion" in d:
-            return d["completion"]
-    return json.dumps(d)
+            text = "".join(item.get("text", "") for item in d["content"] if isinstance(item, dict))
+        elif "completion" in d:
+            text = d["completion"]
+        usage = d.get("usage") if isinstance(d.get("usage"), dict) else {}
+    return LLMResponse(
+        text,
+        "anthropic",
+        (d.get("model") if isinstance(d, dict) else None) or model,
+        _tokens(usage.get("input_tokens")),
+        _tokens(usage.get("output_tokens")),
+    )
+
+
+def _anthropic_stream_text(event, counts) -> str:
+    """Text delta of one streamed messages event; usage goes to `counts`."""
+    kind = event.get("type")
+    if kind == "error":
+        raise RuntimeError((event.get("error") or {}).get("message", "Anthropic stream error"))
+    if kind == "message_start":
+        counts.update((event.get("message") or {}).get("usage") or {})
+    elif kind == "message_delta":
+        counts.update(event.get("usage") or {})
+    elif kind == "content_block_delta":
+        return (event.get("delta") or {}).get("text") or ""
+    return ""
+
+
+def _finish_call(response: LLMResponse, model, started) -> LLMResponse:
+    response.latency = _record_call(
+        response.provider, model, "ok", started, response.input_tokens, response.output_tokens
+    )
+    return response
+
 
+def call_openai_chat(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, deadline=None, cancel=None
+):
+    model, url, headers, payload = _openai_request(prompt, model, max_tokens, temperature)
+    with _measured("openai", model) as started:
+        data = _post_json("openai", url, payload, headers, deadline, cancel)
+    return _finish_call(_openai_response(data, model), model, started)
 
-def call_llm(prompt: str, provider=None, **kwargs):
+
+def call_anthropic_messages(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, deadline=None, cancel=None
+):
+    model, url, headers, payload = _anthropic_request(prompt, model, max_tokens, temperature)
+    with _measured("anthropic", model) as started:
+        d = _post_json("anthropic", url, payload, headers, deadline, cancel)
+    return _finish_call(_anthropic_response(d, model), model, started)
+
+
+def _finish_stream(provider, model, started, usage, input_tokens, output_tokens):
+    latency = _record_call(provider, model, "ok", started, input_tokens, output_tokens)
+    if usage is not None:
+        usage.update(
+            provider=provider,
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency=latency,
+        )
+
+
+def stream_openai_chat(prompt: str, model=None, max_tokens=1200, temperature=0.0, usage=None):
+    """
+    Yield text deltas of a streamed chat completion. When a `usage` dict is
+    passed it receives model, input_tokens, output_tokens and latency once
+    the stream is done.
+    """
+    model, url, headers, payload = _openai_request(
+        prompt, model, max_tokens, temperature, stream=True
+    )
+    counts = {}
+    with _measured("openai", model) as started:
+        for event in _iter_sse_data("openai", url, payload, headers):
+            text = _openai_stream_text(event, counts)
+            if text:
+                yield text
+    _finish_stream(
+        "openai", model, started, usage,
+        _tokens(counts.get("prompt_tokens")), _tokens(counts.get("completion_tokens")),
+    )
+
+
+def stream_anthropic_messages(
+    prompt: str, model=None, max_tokens=1200, temperature=0.0, usage=None
+):
+    """Yield text deltas of a streamed Anthropic message (see stream_openai_chat)."""
+    model, url, headers, payload = _anthropic_request(
+        prompt, model, max_tokens, temperature, stream=True
+    )
+    counts = {}
+    with _measured("anthropic", model) as started:
+        for event in _iter_sse_data("anthropic", url, payload, headers):
+            text = _anthropic_stream_text(event, counts)
+            if text:
+                yield text
+    _finish_stream(
+        "anthropic", model, started, usage,
+        _tokens(counts.get("input_tokens")), _tokens(counts.get("output_tokens")),
+    )
+
+
+def stream_llm(prompt: str, provider=None, **kwargs):
+    """
+    Like call_llm, but yields the answer as it is generated. Without an
+    explicit provider the healthiest one is used (no hedging or failover
+    once text has been sent).
+    """
+    if provider is None:
+        from .router import ranked_providers
+
+        provider = ranked_providers()[0]
+    if provider == "anthropic":
+        return stream_anthropic_messages(prompt, **kwargs)
+    else:
+        return stream_openai_chat(prompt, **kwargs)
+
+
+def default_model(provider=None) -> str:
     provider = provider or settings.LLM_PROVIDER
+    if provider == "anthropic":
+        return settings.ANTHROPIC_DEFAULT_MODEL
+    return settings.OPENAI_DEFAULT_MODEL
+
+
+def call_llm(prompt: str, provider=None, **kwargs) -> LLMResponse:
+    """
+    Call one provider, or let reviews/router.py pick, hedge and fail over
+    between the configured providers when `provider` is None. Accepts a
+    `deadline` (time.monotonic() value) bounding the whole call.
+    """
+    if provider is None:
+        from .router import route
+
+        return route(prompt, **kwargs)
     if provider == "anthropic":
         return call_anthropic_messages(prompt, **kwargs)
     else:
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from reviews.findings import reextract, reviews_for_extraction
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract Issue and Suggestion rows from the JSON of already stored "
+        "reviews. Safe to re-run: each review's rows are replaced, not added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--submission", type=int, action="append", dest="submissions",
+            help="Only reviews of this submission (repeatable).",
+        )
+        parser.add_argument("--batch", type=int, default=500)
+
+    def handle(self, *args, **options):
+        reviews = reviews_for_extraction()
+        if options["submissions"]:
+            reviews = reviews.filter(submission_id__in=options["submissions"])
+
+        batch, done = [], 0
+        for review in reviews.iterator(chunk_size=options["batch"]):
+            batch.append(review)
+            if len(batch) >= options["batch"]:
+                reextract(batch)
+                done += len(batch)
+                batch = []
+        if batch:
+            reextract(batch)
+            done += len(batch)
+        self.stdout.write(f"Extracted issues and suggestions of {done} review(s).")
@@ -0,0 +1,186 @@
+import io
+import json
+import resource
+import time
+import tracemalloc
+import uuid
+import zipfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve
+
+from reviews import jobs, metrics, router
+from reviews.models import Review, ReviewJob, Submission
+from reviews.stub_llm import StubConfig, StubLLMServer
+
+
+def percentile(values, pct):
+    """router.percentile(), None when there are no values."""
+    return router.percentile(values, pct) if values else None
+
+
+def synthetic_zip(files: int, file_chars: int, run_id: str) -> bytes:
+    """A ZIP of `files` distinct Python modules of about `file_chars` characters."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(files):
+            lines = [f"# benchmark {run_id} module {i}"]
+            n = 0
+            while sum(len(line) + 1 for line in lines) < file_chars:
+                lines.append(f"def function_{n}(value):\n    return value * {n} + {i}\n")
+                n += 1
+            archive.writestr(f"bench/pkg_{i // 50}/module_{i}.py", "\n".join(lines))
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end throughput benchmark: uploads a synthetic ZIP through the "
+        "normal submission view and drains it with the review worker against "
+        "the offline stub LLM (or a running one via --api-url). Reports "
+        "files/sec, p50/p99 latencies, peak memory and DB queries. Writes to "
+        "the configured database and deletes the submission afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=200)
+        parser.add_argument("--file-chars", type=int, default=800)
+        parser.add_argument("--threads", type=int, default=settings.REVIEW_WORKER_THREADS)
+        parser.add_argument("--latency", type=float, default=0.05)
+        parser.add_argument("--jitter", type=float, default=0.05)
+        parser.add_argument("--error-rate", type=float, default=0.0)
+        parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+        parser.add_argument(
+            "--api-url",
+            help="Use an already running endpoint instead of the in-process stub.",
+        )
+        parser.add_argument(
+            "--cache", action="store_true", help="Leave the review cache enabled."
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the submission.")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        stub = None
+        if options["api_url"]:
+            url = options["api_url"]
+        else:
+            stub = StubLLMServer(
+                config=StubConfig(
+                    latency=options["latency"],
+                    jitter=options["jitter"],
+                    error_rate=options["error_rate"],
+                )
+            ).start()
+            url = stub.anthropic_url if options["provider"] == "anthropic" else stub.openai_url
+
+        overrides = {
+            "LLM_PROVIDER": options["provider"],
+            "LLM_PROVIDERS": [options["provider"]],
+            "REVIEW_CACHE_ENABLED": options["cache"] and settings.REVIEW_CACHE_ENABLED,
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+            "MAX_FILE_UPLOAD_MB": max(settings.MAX_FILE_UPLOAD_MB, 1024),
+        }
+        if options["provider"] == "anthropic":
+            overrides["ANTHROPIC_API_URL"] = url
+            overrides["ANTHROPIC_API_KEY"] = settings.ANTHROPIC_API_KEY or "stub"
+        else:
+            overrides["OPENAI_API_URL"] = url
+            overrides["OPENAI_API_KEY"] = settings.OPENAI_API_KEY or "stub"
+
+        try:
+            with override_settings(**overrides):
+                report = self._run(options)
+        finally:
+            if stub is not None:
+                stub.stop()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for key, value in report.items():
+            self.stdout.write(f"{key:<28} {value}")
+
+    def _run(self, options):
+        archive = synthetic_zip(options["files"], options["file_chars"], uuid.uuid4().hex)
+        queries = {"count": 0}
+
+        def count_queries(execute, sql, params, many, context):
+            queries["count"] += 1
+            return execute(sql, params, many, context)
+
+        stages_before = metrics.STAGE_SECONDS.totals()
+        tracemalloc.start()
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = Client().post(
+                "/",
+                {
+                    "title": "pipeline benchmark",
+                    "language": "python",
+                    "code": "",
+                    "upload": SimpleUploadedFile("bench.zip", archive, "application/zip"),
+                },
+            )
+            if response.status_code != 302:
+                raise RuntimeError(f"Submission failed with HTTP {response.status_code}.")
+            # The view redirects to the page of the submission it created
+            submission = Submission.objects.get(
+                pk=resolve(response.url).kwargs["submission_id"]
+            )
+            submitted = time.perf_counter()
+            # Only this submission's work, even if other work is queued
+            while not Submission.objects.get(pk=submission.pk).is_finished:
+                done = jobs.drain(max_workers=options["threads"], submission_id=submission.pk)
+                if not done:
+                    time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        _, peak_python = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        submission.refresh_from_db()
+        reviews = Review.objects.filter(submission=submission)
+        llm_ms = [ms for ms in reviews.values_list("llm_latency_ms", flat=True) if ms is not None]
+        file_ms = [
+            (finished - created).total_seconds() * 1000
+            for created, finished in ReviewJob.objects.filter(
+                submission=submission, finished_at__isnull=False
+            ).values_list("created_at", "finished_at")
+        ]
+        stored = reviews.count()
+        failed = reviews.filter(processed=False).count()
+
+        stages = {}
+        for (stage,), (total, count) in metrics.STAGE_SECONDS.totals().items():
+            before_total, before_count = stages_before.get((stage,), (0, 0))
+            if count > before_count:
+                stages[stage] = round(total - before_total, 3)
+
+        report = {
+            "status": submission.status,
+            "files": options["files"],
+            "reviews_stored": stored,
+            "reviews_failed": failed,
+            "submit_seconds": round(submitted - started, 3),
+            "total_seconds": round(elapsed, 3),
+            "files_per_second": round(stored / elapsed, 1) if elapsed else None,
+            "file_latency_p50_ms": round(percentile(file_ms, 50) or 0),
+            "file_latency_p99_ms": round(percentile(file_ms, 99) or 0),
+            "llm_latency_p50_ms": percentile(llm_ms, 50),
+            "llm_latency_p99_ms": percentile(llm_ms, 99),
+            "db_queries": queries["count"],
+            "db_queries_per_file": round(queries["count"] / max(1, stored), 2),
+            "peak_python_memory_mb": round(peak_python / 1024 / 1024, 1),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "stage_seconds": stages,
+        }
+        if not options["keep"]:
+            if submission.uploaded_file:
+                submission.uploaded_file.delete(save=False)
+            submission.delete()
+        return report
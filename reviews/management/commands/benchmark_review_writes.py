@@ -0,0 +1,99 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reviews import blobs
+from reviews.models import Review, ReviewJob, Submission
+from reviews.writer import ReviewWriter
+
+SAMPLE_FIELDS = {
+    "summary": "Benchmark review.",
+    "issues": [{"line": 3, "severity": "low", "message": "Example", "type": "style"}],
+    "suggestions": [{"description": "Example", "patch": "x = 1", "lines": "3-3"}],
+    "tests_suggestions": "None.",
+    "quality_score": 7,
+    "raw_response": {"raw": "{}"},
+    "processed": True,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how fast finished file reviews are persisted: one autocommit "
+        "per review (the old path) versus the batched ReviewWriter. Creates and "
+        "deletes a throwaway submission; run it while no worker is active."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+
+    def _make_jobs(self, submission, rows):
+        source = blobs.put("x = 1")
+        ReviewJob.objects.bulk_create(
+            [
+                ReviewJob(
+                    submission=submission,
+                    file_path=f"bench/file_{i}.py",
+                    source_id=source,
+                    status=ReviewJob.STATUS_RUNNING,
+                )
+                for i in range(rows)
+            ]
+        )
+        return list(submission.jobs.order_by("id"))
+
+    def _set_pragmas(self, pragmas):
+        if connection.vendor != "sqlite":
+            return
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+    def _run(self, label, rows, write):
+        submission = Submission.objects.create(
+            title="write benchmark", code="", status=Submission.STATUS_RUNNING
+        )
+        try:
+            jobs = self._make_jobs(submission, rows)
+            started = time.perf_counter()
+            write(submission, jobs)
+            elapsed = time.perf_counter() - started
+        finally:
+            submission.delete()
+        self.stdout.write(
+            f"{label:<40} {rows / elapsed:>10.0f} reviews/s  ({elapsed:.2f}s)"
+        )
+
+    def _per_row(self, submission, jobs):
+        for job in jobs:
+            review = Review.objects.create(
+                submission=submission, file_path=job.file_path, **SAMPLE_FIELDS
+            )
+            job.review = review
+            job.status = ReviewJob.STATUS_DONE
+            job.save(update_fields=["review", "status"])
+
+    def _batched(self, submission, jobs):
+        writer = ReviewWriter()
+        for job in jobs:
+            writer.add(
+                job,
+                {"submission": submission, "file_path": job.file_path, **SAMPLE_FIELDS},
+            )
+        writer.flush()
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        tuned = getattr(settings, "SQLITE_PRAGMAS", {})
+        if connection.vendor == "sqlite":
+            self._set_pragmas({"journal_mode": "DELETE", "synchronous": "FULL"})
+            self._run("per-row autocommit, SQLite defaults", rows, self._per_row)
+            self._set_pragmas(tuned)
+        self._run("per-row autocommit, tuned", rows, self._per_row)
+        self._run(
+            f"ReviewWriter (batch {settings.REVIEW_WRITE_BATCH}), tuned",
+            rows,
+            self._batched,
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews import export
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream reviews as NDJSON or CSV: those of a submission and/or those "
+        "created in a time window. Memory use does not grow with the number "
+        "of rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--submission", type=int, help="Only reviews of this submission.")
+        parser.add_argument("--since", help="Created at or after (ISO date or datetime).")
+        parser.add_argument("--until", help="Created at or before (ISO date or datetime).")
+        parser.add_argument("--format", choices=sorted(export.FORMATS), default="ndjson")
+        parser.add_argument(
+            "--columns",
+            help=(
+                "Comma-separated columns (default: all but raw_response and code). "
+                f"Available: {', '.join(export.COLUMNS)}."
+            ),
+        )
+        parser.add_argument("--output", "-o", help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            columns = export.parse_columns(options["columns"])
+            since = export.parse_moment(options["since"])
+            until = export.parse_moment(options["until"], end_of_day=True)
+        except ValueError as e:
+            raise CommandError(str(e))
+        reviews = export.reviews_for_export(options["submission"], since, until)
+
+        pieces = export.stream(reviews, columns, options["format"])
+        if not options["output"]:
+            for piece in pieces:
+                self.stdout.write(piece, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as out:
+            for piece in pieces:
+                out.write(piece)
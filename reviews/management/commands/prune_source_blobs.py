@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reviews.blobs import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored source files that no review or review job refers to "
+        "any more (e.g. after submissions were deleted)."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune()
+        self.stdout.write(f"Deleted {deleted} unused source blob(s).")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from reviews.models import Submission
+from reviews.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-submission review rollups from the Review rows. "
+        "Rollups are normally kept up to date as reviews are written; use "
+        "this after importing data or editing reviews by hand, or with "
+        "--missing to fill in submissions stored before rollups existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("submission_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only submissions that have reviews but no rollup yet.",
+        )
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.only("id").order_by("id")
+        if options["submission_ids"]:
+            submissions = submissions.filter(id__in=options["submission_ids"])
+        if options["missing"]:
+            submissions = submissions.filter(
+                rollup__isnull=True, reviews__isnull=False
+            ).distinct()
+        count = 0
+        for submission in submissions.iterator():
+            rebuild(submission)
+            count += 1
+        self.stdout.write(f"Rebuilt {count} rollup(s).")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from reviews import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of all reviews (SQLite FTS5 only)."
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(
+                "No FTS5 index on this database; search uses plain LIKE queries."
+            )
+            return
+        self.stdout.write(f"Indexed {search.rebuild()} review(s).")
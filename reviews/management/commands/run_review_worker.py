@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reviews import jobs, metrics, review_cache
+
+
+class Command(BaseCommand):
+    help = "Drain the project review queue (ZIP uploads and GitHub repos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling for new work.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.REVIEW_WORKER_THREADS,
+            help="Files reviewed concurrently by this worker.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=settings.REVIEW_WORKER_POLL_SECONDS,
+            help="Seconds to sleep between polls when the queue is empty.",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=None,
+            help="Expose Prometheus metrics of this worker on the given port.",
+        )
+        parser.add_argument(
+            "--metrics-host",
+            default="127.0.0.1",
+            help="Interface the metrics port listens on (0.0.0.0 for all).",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        if options["metrics_port"]:
+            metrics.serve(options["metrics_port"], options["metrics_host"])
+            self.stdout.write(
+                f"Metrics on {options['metrics_host']}:{options['metrics_port']}/metrics"
+            )
+        self.stdout.write("Review worker started.")
+        try:
+            while True:
+                requeued = jobs.requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(
+                        f"Requeued {requeued} stale job(s) or submission(s)."
+                    )
+                done = jobs.drain(max_workers=options["threads"])
+                processed += done
+                if done:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+        except KeyboardInterrupt:
+            pass
+        cache = review_cache.stats()
+        self.stdout.write(
+            f"Review cache: {cache['hits']} hit(s), {cache['misses']} miss(es)."
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} work item(s)."))
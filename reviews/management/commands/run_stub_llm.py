@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from reviews.stub_llm import StubConfig, StubLLMServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run an offline stub of the OpenAI and Anthropic APIs for benchmarks "
+        "and local development. Point OPENAI_API_URL / ANTHROPIC_API_URL at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds per response.")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds.")
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0, help="Share of requests that fail (0-1)."
+        )
+        parser.add_argument("--error-status", type=int, default=500)
+        parser.add_argument("--issues", type=int, default=2, help="Issues per review.")
+        parser.add_argument("--summary-chars", type=int, default=80)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        config = StubConfig(
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            issues=options["issues"],
+            summary_chars=options["summary_chars"],
+            seed=options["seed"],
+        )
+        server = StubLLMServer(options["host"], options["port"], config)
+        self.stdout.write(f"Stub LLM listening on {server.base_url}")
+        self.stdout.write(f"  OPENAI_API_URL={server.openai_url}")
+        self.stdout.write(f"  ANTHROPIC_API_URL={server.anthropic_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,220 @@
+# reviews/metrics.py
+"""
+In-process counters and histograms, rendered in the Prometheus text
+format by the /metrics view (web process) and by run_review_worker
+--metrics-port (worker process). Each process reports its own numbers;
+Prometheus sums them across targets.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; wide enough for multi-minute LLM calls
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300
+)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with _lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with _lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}{text} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        with _lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self):
+        """{labels: (sum, count)} for every observed label set."""
+        with _lock:
+            return {labels: (series[-2], series[-1]) for labels, series in self._values.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = sorted((labels, list(series)) for labels, series in self._values.items())
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = (("le", _number(bound)),)
+                lines.append(
+                    f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {count}"
+                )
+            text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{text} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{text} {series[-1]}")
+        return lines
+
+
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "LLM API calls.", ("provider", "model", "outcome")
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "LLM API call latency including retries.",
+    ("provider", "model", "outcome"),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by the LLM API.", ("provider", "model", "direction")
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "Retried LLM API requests.", ("provider", "reason")
+)
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total",
+    "Hedged LLM requests sent to a second provider, and how many answered first.",
+    ("provider", "outcome"),
+)
+LLM_FAILOVERS = Counter(
+    "llm_failovers_total", "LLM calls retried on another provider.", ("from_provider", "to_provider")
+)
+GITHUB_ARCHIVES = Counter(
+    "github_archive_fetches_total",
+    "GitHub archives downloaded, revalidated from the disk cache (304) or evicted from it.",
+    ("outcome",),
+)
+HIGHLIGHT_CACHE = Counter(
+    "highlight_cache_total", "Syntax highlighting served from the render cache or rendered.", ("outcome",)
+)
+SUGGESTION_DIFFS = Counter(
+    "suggestion_diff_cache_total", "Suggestion diffs served from the memo cache or computed.", ("outcome",)
+)
+STAGE_SECONDS = Histogram(
+    "review_stage_duration_seconds", "Time spent per review pipeline stage.", ("stage",)
+)
+REVIEWS_STORED = Counter("reviews_stored_total", "Stored file reviews.", ("outcome",))
+
+
+@contextmanager
+def timer(stage: str, timings=None):
+    """
+    Time a pipeline stage into STAGE_SECONDS; with a `timings` dict the
+    elapsed milliseconds are also added to timings[stage].
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0) + elapsed * 1000, 1)
+
+
+def _cache_lines():
+    from .review_cache import stats
+
+    lines = [
+        "# HELP review_cache_events_total Review cache lookups, stores and evictions.",
+        "# TYPE review_cache_events_total counter",
+    ]
+    for event, value in sorted(stats().items()):
+        lines.append(f'review_cache_events_total{{event="{event}"}} {value}')
+    return lines
+
+
+def _router_lines():
+    from .router import health_snapshot
+
+    snapshot = health_snapshot()
+    lines = []
+    for name, key, doc in (
+        ("llm_provider_error_rate", "error_rate", "Error share of recent calls per provider."),
+        ("llm_provider_latency_p50_seconds", "p50", "Median latency of recent calls."),
+        ("llm_provider_cooling_down", "cooling_down", "1 while a provider is skipped."),
+    ):
+        lines += [f"# HELP {name} {doc}", f"# TYPE {name} gauge"]
+        for provider, health in sorted(snapshot.items()):
+            if health[key] is not None:
+                lines.append(f'{name}{{provider="{provider}"}} {_number(health[key])}')
+    return lines
+
+
+def render() -> str:
+    """All metrics of this process in the Prometheus text exposition format."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    lines.extend(_cache_lines())
+    lines.extend(_router_lines())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, host: str = "127.0.0.1"):
+    """
+    Serve render() over HTTP from a daemon thread (for the worker process).
+    Only local scrapers can reach it unless another `host` is given.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_review_file_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='repo_url',
+            field=models.URLField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('expanding', 'Extracting files'), ('running', 'Reviewing files'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='done', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ReviewJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=255)),
+                ('code', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('review', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job', to='reviews.review')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='reviews.submission')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
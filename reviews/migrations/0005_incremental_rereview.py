@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_review_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='reused_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reviews.review'),
+        ),
+        migrations.AddField(
+            model_name='reviewjob',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='deleted_files',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='previous_submission',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reviews.submission'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='repo_key',
+            field=models.CharField(blank=True, db_index=True, max_length=300),
+        ),
+    ]
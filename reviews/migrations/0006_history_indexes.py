@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_incremental_rereview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['-created_at', '-id'], name='submission_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='submission_user_history_idx'),
+        ),
+    ]
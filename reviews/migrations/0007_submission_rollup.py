@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionRollup',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='reviews.submission')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('reused_count', models.PositiveIntegerField(default=0)),
+                ('scored_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('issue_count', models.PositiveIntegerField(default=0)),
+                ('severity_counts', models.JSONField(blank=True, default=dict)),
+                ('type_counts', models.JSONField(blank=True, default=dict)),
+                ('score_histogram', models.JSONField(blank=True, default=dict)),
+                ('failed_files', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
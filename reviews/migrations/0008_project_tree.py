@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_submission_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreeNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('parent', models.CharField(blank=True, max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('is_dir', models.BooleanField(default=False)),
+                ('reused', models.BooleanField(default=False)),
+                ('file_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('issue_count', models.PositiveIntegerField(default=0)),
+                ('scored_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('review', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.review')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tree_nodes', to='reviews.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['submission', 'parent', '-is_dir', 'name'], name='treenode_listing_idx'), models.Index(fields=['submission', 'path'], name='treenode_path_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_project_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Issue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('line', models.PositiveIntegerField(blank=True, null=True)),
+                ('severity', models.CharField(max_length=20)),
+                ('type', models.CharField(max_length=50)),
+                ('message', models.TextField(blank=True)),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issue_rows', to='reviews.review')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issue_rows', to='reviews.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['severity', 'type', '-created_at'], name='issue_sev_type_idx'), models.Index(fields=['type', '-created_at'], name='issue_type_idx'), models.Index(fields=['-created_at', '-id'], name='issue_recent_idx'), models.Index(fields=['submission', 'severity', 'type'], name='issue_submission_idx'), models.Index(fields=['file_path', 'line'], name='issue_file_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Suggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('line_start', models.PositiveIntegerField(blank=True, null=True)),
+                ('line_end', models.PositiveIntegerField(blank=True, null=True)),
+                ('description', models.TextField(blank=True)),
+                ('patch', models.TextField(blank=True)),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestion_rows', to='reviews.review')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestion_rows', to='reviews.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['file_path', 'line_start'], name='suggestion_file_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import OperationalError, migrations
+
+# Frozen copies of the index layout and document builder in
+# reviews/search.py; migrations must not import app code that may change
+# later.
+FTS_TABLE = "reviews_review_fts"
+FTS_COLUMNS = ("file_path", "summary", "issues", "suggestions")
+DOCUMENT_FIELDS = ("file_path", "summary", "issues", "suggestions")
+
+
+def _entries(value):
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict)]
+
+
+def document(review):
+    return (
+        review.file_path or "",
+        review.summary or "",
+        "\n".join(str(item.get("message") or "") for item in _entries(review.issues)),
+        "\n".join(
+            str(item.get("description") or "") for item in _entries(review.suggestions)
+        ),
+    )
+
+
+def create_index(schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return False
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(FTS_COLUMNS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        return False
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON reviews_review "
+        f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    )
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    if not create_index(schema_editor):
+        return
+    Review = apps.get_model("reviews", "Review")
+    rows = Review.objects.only(*DOCUMENT_FIELDS).iterator(chunk_size=500)
+    sql = (
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+        f"VALUES (%s, %s, %s, %s, %s)"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(sql, ((review.id, *document(review)) for review in rows))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0009_issue_tables"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_review_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='input_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='llm_calls',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='llm_latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='output_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
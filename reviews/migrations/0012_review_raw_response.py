@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:23
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH = 500
+
+
+# Frozen copies of the raw response encoding in reviews/raw_store.py;
+# migrations must not import app code that may change later.
+def encode(value):
+    raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, 6), len(raw)
+
+
+def decode(data):
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8"))
+
+
+def move_raw_responses(apps, schema_editor):
+    Review = apps.get_model("reviews", "Review")
+    ReviewRawResponse = apps.get_model("reviews", "ReviewRawResponse")
+    rows = (
+        Review.objects.filter(raw_response__isnull=False)
+        .values_list("id", "raw_response")
+        .iterator(chunk_size=BATCH)
+    )
+    batch = []
+    for review_id, value in rows:
+        data, size = encode(value)
+        batch.append(ReviewRawResponse(review_id=review_id, data=data, size=size))
+        if len(batch) >= BATCH:
+            ReviewRawResponse.objects.bulk_create(batch)
+            batch = []
+    ReviewRawResponse.objects.bulk_create(batch)
+
+
+def restore_raw_responses(apps, schema_editor):
+    Review = apps.get_model("reviews", "Review")
+    ReviewRawResponse = apps.get_model("reviews", "ReviewRawResponse")
+    rows = ReviewRawResponse.objects.values_list("review_id", "data").iterator(
+        chunk_size=BATCH
+    )
+    batch = []
+    for review_id, data in rows:
+        batch.append(Review(id=review_id, raw_response=decode(data)))
+        if len(batch) >= BATCH:
+            Review.objects.bulk_update(batch, ["raw_response"])
+            batch = []
+    Review.objects.bulk_update(batch, ["raw_response"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_review_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewRawResponse',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='raw_row', serialize=False, to='reviews.review')),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(move_raw_responses, restore_raw_responses),
+        migrations.RemoveField(
+            model_name='review',
+            name='raw_response',
+        ),
+    ]
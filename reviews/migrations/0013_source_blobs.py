@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:28
+
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH = 500
+
+
+# Frozen copies of the blob helpers in reviews/blobs.py; migrations must
+# not import app code that may change later.
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode(text):
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decode(data):
+    return zlib.decompress(bytes(data)).decode("utf-8")
+
+
+def _flush(SourceBlob, ReviewJob, Review, new, jobs):
+    SourceBlob.objects.bulk_create(new.values(), ignore_conflicts=True)
+    ReviewJob.objects.bulk_update(jobs, ["source"])
+    Review.objects.bulk_update(
+        [Review(id=job.review_id, source_id=job.source_id) for job in jobs if job.review_id],
+        ["source"],
+    )
+
+
+def move_job_sources(apps, schema_editor):
+    SourceBlob = apps.get_model("reviews", "SourceBlob")
+    ReviewJob = apps.get_model("reviews", "ReviewJob")
+    Review = apps.get_model("reviews", "Review")
+    rows = ReviewJob.objects.values_list("id", "review_id", "code").iterator(
+        chunk_size=BATCH
+    )
+    new, jobs = {}, []
+    for job_id, review_id, code in rows:
+        key = digest(code)
+        if key not in new:
+            new[key] = SourceBlob(
+                digest=key, data=encode(code), size=len(code.encode("utf-8"))
+            )
+        jobs.append(ReviewJob(id=job_id, review_id=review_id, source_id=key))
+        if len(jobs) >= BATCH:
+            _flush(SourceBlob, ReviewJob, Review, new, jobs)
+            new, jobs = {}, []
+    _flush(SourceBlob, ReviewJob, Review, new, jobs)
+
+
+def restore_job_sources(apps, schema_editor):
+    SourceBlob = apps.get_model("reviews", "SourceBlob")
+    ReviewJob = apps.get_model("reviews", "ReviewJob")
+    rows = (
+        ReviewJob.objects.filter(source__isnull=False)
+        .values_list("id", "source_id")
+        .iterator(chunk_size=BATCH)
+    )
+    texts, batch = {}, []
+    for job_id, key in rows:
+        if key not in texts:
+            texts[key] = decode(SourceBlob.objects.get(digest=key).data)
+        batch.append(ReviewJob(id=job_id, code=texts[key]))
+        if len(batch) >= BATCH:
+            ReviewJob.objects.bulk_update(batch, ["code"])
+            batch, texts = [], {}
+    ReviewJob.objects.bulk_update(batch, ["code"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_review_raw_response'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='reviews.sourceblob'),
+        ),
+        migrations.AddField(
+            model_name='reviewjob',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='reviews.sourceblob'),
+        ),
+        migrations.RunPython(move_job_sources, restore_job_sources),
+        # A default lets the column be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='reviewjob',
+            name='code',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='reviewjob',
+            name='code',
+        ),
+    ]
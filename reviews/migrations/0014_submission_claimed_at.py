@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_source_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='expand_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
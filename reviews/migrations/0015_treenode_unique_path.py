@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:53
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_nodes(apps, schema_editor):
+    """Keep the first node of every (submission, path) so the constraint applies."""
+    TreeNode = apps.get_model("reviews", "TreeNode")
+    duplicated = (
+        TreeNode.objects.values("submission_id", "path")
+        .annotate(n=Count("id"), first=Min("id"))
+        .filter(n__gt=1)
+    )
+    for row in duplicated.iterator():
+        TreeNode.objects.filter(
+            submission_id=row["submission_id"], path=row["path"]
+        ).exclude(id=row["first"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_submission_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='treenode',
+            name='treenode_path_idx',
+        ),
+        migrations.RemoveField(
+            model_name='submissionrollup',
+            name='failed_files',
+        ),
+        migrations.RunPython(drop_duplicate_nodes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='treenode',
+            constraint=models.UniqueConstraint(fields=('submission', 'path'), name='treenode_unique_path'),
+        ),
+    ]
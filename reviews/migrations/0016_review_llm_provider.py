@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0015_treenode_unique_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='llm_provider',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
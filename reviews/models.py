@@ -4,6 +4,19 @@ from django.contrib.auth import get_user_model
 
 
 class Submission(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_EXPANDING = "expanding"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_EXPANDING, "Extracting files"),
+        (STATUS_RUNNING, "Reviewing files"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
     title = models.CharField(max_length=255)
     language = models.CharField(max_length=50, default="python")
     code = models.TextField()  # overall code / description
@@ -13,15 +26,59 @@ class Submission(models.Model):
         get_user_model(), null=True, blank=True, on_delete=models.SET_NULL
     )
 
+    # Background processing of ZIP / GitHub projects (see reviews/jobs.py)
+    repo_url = models.URLField(blank=True)
+    # "<repo base url>@<branch>", used to find the previous run of the same repo
+    repo_key = models.CharField(max_length=300, blank=True, db_index=True)
+    previous_submission = models.ForeignKey(
+        "self", null=True, blank=True, related_name="+", on_delete=models.SET_NULL
+    )
+    deleted_files = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_DONE, db_index=True
+    )
+    error = models.TextField(blank=True)
+    # Set when a worker claims the submission for extraction
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    expand_attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the history page, newest first
+            models.Index(fields=["-created_at", "-id"], name="submission_history_idx"),
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="submission_user_history_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} [{self.language}]"
 
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+
+class SourceBlob(models.Model):
+    """
+    One file's text, zlib-compressed and keyed by the sha256 of its content,
+    so identical files are stored once however often they are submitted
+    (see reviews/blobs.py).
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)  # uncompressed bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
 
 class Review(models.Model):
     submission = models.ForeignKey(
         Submission, related_name="reviews", on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Provider and model that answered (after any failover or hedge)
+    llm_provider = models.CharField(max_length=20, blank=True)
     llm_model = models.CharField(max_length=100, blank=True)
 
     # NEW: for ZIP projects, which file is this review about
@@ -34,11 +91,266 @@ class Review(models.Model):
     suggestions = models.JSONField(null=True, blank=True)
     tests_suggestions = models.TextField(blank=True)
     quality_score = models.FloatField(null=True, blank=True)
-    raw_response = models.JSONField(null=True, blank=True)
     processed = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True)
 
+    # sha256 of the normalized file content (project files only)
+    content_hash = models.CharField(max_length=64, blank=True)
+    # The reviewed file itself
+    source = models.ForeignKey(
+        SourceBlob, null=True, blank=True, related_name="+", on_delete=models.PROTECT
+    )
+    # Set when an unchanged file was carried over from an earlier run
+    reused_from = models.ForeignKey(
+        "self", null=True, blank=True, related_name="+", on_delete=models.SET_NULL
+    )
+
+    # What the LLM calls behind this review cost (see pipeline.usage_fields)
+    input_tokens = models.PositiveIntegerField(null=True, blank=True)
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
+    llm_latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    llm_calls = models.PositiveSmallIntegerField(default=0)
+    # {"prompt_build": ms, "llm": ms, "parse": ms, ...}
+    stage_timings = models.JSONField(default=dict, blank=True)
+
     def __str__(self):
         if self.file_path:
             return f"Review for {self.file_path}"
         return f"Review {self.id} for {self.submission.title}"
+
+    @property
+    def raw_response(self):
+        """
+        Raw LLM output ({"raw": text, ...}). Kept compressed in
+        ReviewRawResponse and only loaded when read (see raw_store).
+        """
+        if "_raw_response" not in self.__dict__:
+            from .raw_store import load
+
+            self._raw_response = load(self) if self.pk else None
+        return self._raw_response
+
+    @raw_response.setter
+    def raw_response(self, value):
+        # Written by raw_store.store() from derived.record_reviews()
+        self._raw_response = value
+        self._raw_pending = True
+
+
+class ReviewRawResponse(models.Model):
+    """zlib-compressed JSON of Review.raw_response, outside the reviews table."""
+
+    review = models.OneToOneField(
+        Review, primary_key=True, related_name="raw_row", on_delete=models.CASCADE
+    )
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)  # uncompressed bytes
+
+
+class ReviewJob(models.Model):
+    """One file of a project submission waiting for (or done with) its LLM review."""
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    submission = models.ForeignKey(
+        Submission, related_name="jobs", on_delete=models.CASCADE
+    )
+    file_path = models.CharField(max_length=255)
+    source = models.ForeignKey(
+        SourceBlob, null=True, blank=True, related_name="+", on_delete=models.PROTECT
+    )
+    content_hash = models.CharField(max_length=64, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    review = models.OneToOneField(
+        Review, null=True, blank=True, related_name="job", on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"Job {self.file_path} [{self.status}]"
+
+    @property
+    def code(self) -> str:
+        """The file's text, read through the blob cache."""
+        from .blobs import read
+
+        return read(self.source_id) if self.source_id else ""
+
+
+class ReviewCacheEntry(models.Model):
+    """
+    Parsed LLM review for a given piece of code, keyed by a content hash
+    that also covers language, prompt version, provider and model.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    provider = models.CharField(max_length=20)
+    llm_model = models.CharField(max_length=100)
+    result = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Cached review {self.key[:12]} ({self.provider}/{self.llm_model})"
+
+
+class SubmissionRollup(models.Model):
+    """
+    Per-submission totals kept up to date as reviews are written (see
+    reviews/rollups.py), so project pages never aggregate the Review rows.
+    """
+
+    submission = models.OneToOneField(
+        Submission, primary_key=True, related_name="rollup", on_delete=models.CASCADE
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    reused_count = models.PositiveIntegerField(default=0)
+    scored_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    issue_count = models.PositiveIntegerField(default=0)
+    # {"high": 3, "low": 10, ...}
+    severity_counts = models.JSONField(default=dict, blank=True)
+    # {"bug": 2, "style": 7, ...}
+    type_counts = models.JSONField(default=dict, blank=True)
+    # {"0": n, ..., "10": n}: quality scores rounded to whole points
+    score_histogram = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def avg_score(self):
+        return self.score_sum / self.scored_count if self.scored_count else None
+
+    def histogram_rows(self):
+        """[(score, count)] for every score bucket, low to high."""
+        return [(b, self.score_histogram.get(str(b), 0)) for b in range(11)]
+
+
+class TreeNode(models.Model):
+    """
+    One file or directory of a project's file tree. Directory rows carry
+    totals over every file below them, maintained with the rollups, so the
+    tree can be browsed one level at a time without scanning reviews.
+    """
+
+    submission = models.ForeignKey(
+        Submission, related_name="tree_nodes", on_delete=models.CASCADE
+    )
+    path = models.CharField(max_length=255)
+    # Path of the containing directory, "" at the top level
+    parent = models.CharField(max_length=255, blank=True)
+    name = models.CharField(max_length=255)
+    is_dir = models.BooleanField(default=False)
+    review = models.ForeignKey(
+        Review, null=True, blank=True, related_name="+", on_delete=models.CASCADE
+    )
+    reused = models.BooleanField(default=False)
+    file_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    issue_count = models.PositiveIntegerField(default=0)
+    scored_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["submission", "parent", "-is_dir", "name"],
+                name="treenode_listing_idx",
+            ),
+        ]
+        constraints = [
+            # One node per path; also serves lookups by path
+            models.UniqueConstraint(
+                fields=["submission", "path"], name="treenode_unique_path"
+            ),
+        ]
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def avg_score(self):
+        return self.score_sum / self.scored_count if self.scored_count else None
+
+
+class Issue(models.Model):
+    """
+    One entry of Review.issues, extracted when the review is stored (see
+    reviews/findings.py) so issues can be queried without parsing JSON.
+    """
+
+    review = models.ForeignKey(
+        Review, related_name="issue_rows", on_delete=models.CASCADE
+    )
+    # Copied from the review so filters never need a join
+    submission = models.ForeignKey(
+        Submission, related_name="issue_rows", on_delete=models.CASCADE
+    )
+    file_path = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+    position = models.PositiveIntegerField(default=0)
+    line = models.PositiveIntegerField(null=True, blank=True)
+    severity = models.CharField(max_length=20)
+    type = models.CharField(max_length=50)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["severity", "type", "-created_at"], name="issue_sev_type_idx"
+            ),
+            models.Index(fields=["type", "-created_at"], name="issue_type_idx"),
+            models.Index(fields=["-created_at", "-id"], name="issue_recent_idx"),
+            models.Index(
+                fields=["submission", "severity", "type"], name="issue_submission_idx"
+            ),
+            models.Index(fields=["file_path", "line"], name="issue_file_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.severity} {self.type} in {self.file_path or 'code'}:{self.line}"
+
+
+class Suggestion(models.Model):
+    """One entry of Review.suggestions, extracted alongside the issues."""
+
+    review = models.ForeignKey(
+        Review, related_name="suggestion_rows", on_delete=models.CASCADE
+    )
+    submission = models.ForeignKey(
+        Submission, related_name="suggestion_rows", on_delete=models.CASCADE
+    )
+    file_path = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+    position = models.PositiveIntegerField(default=0)
+    line_start = models.PositiveIntegerField(null=True, blank=True)
+    line_end = models.PositiveIntegerField(null=True, blank=True)
+    description = models.TextField(blank=True)
+    patch = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["file_path", "line_start"], name="suggestion_file_idx"),
+        ]
+
+    def __str__(self):
+        return f"Suggestion for {self.file_path or 'code'}:{self.line_start}"
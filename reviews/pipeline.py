@@ -0,0 +1,486 @@
+# reviews/pipeline.py
+import asyncio
+import json
+import math
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .chunking import language_for_path, split_code
+
+from .llm_async import acall_llm
+from .llm_client import call_llm
+from .metrics import timer
+from .prompts import (
+    BATCH_PROMPT_VERSION,
+    PROMPT_VERSION,
+    build_batch_review_prompt,
+    build_review_prompt,
+)
+from .review_cache import CACHED_FIELDS, cache_key
+from .router import configured_providers, file_deadline
+
+
+def parse_llm_output(raw: str):
+    """
+    Parse the model output as JSON. Falls back to the first {...} block,
+    and finally to {"raw": raw} when nothing parses.
+    """
+    try:
+        return json.loads(raw)
+    except Exception:
+        m = re.search(r"\{.*\}", raw, re.S)
+        if m:
+            try:
+                return json.loads(m.group(0))
+            except Exception:
+                return {"raw": raw}
+        return {"raw": raw}
+
+
+def _quality_score(value):
+    """The model's score as a float ("8" included); None if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    return score if math.isfinite(score) else None
+
+
+def review_fields(parsed) -> dict:
+    """Map a parsed model response onto the Review model fields."""
+    if not isinstance(parsed, dict):
+        parsed = {}
+    return {
+        "summary": parsed.get("summary", ""),
+        "issues": parsed.get("issues", []),
+        "suggestions": parsed.get("suggestions", []),
+        "tests_suggestions": parsed.get("tests_suggestions", ""),
+        "quality_score": _quality_score(parsed.get("quality_score")),
+    }
+
+
+def usage_fields(responses, share: int = 1) -> dict:
+    """
+    Review fields describing the LLM calls behind one review: model, token
+    counts and latency summed over the calls. `share` splits one batched
+    call evenly between the files it reviewed.
+    """
+    responses = [r for r in responses if r is not None]
+    if not responses:
+        return {}
+
+    def total(name):
+        values = [getattr(r, name) for r in responses if getattr(r, name) is not None]
+        return sum(values) // share if values else None
+
+    providers = {r.provider for r in responses}
+    return {
+        # Empty when the chunks of one file were answered by different providers
+        "llm_provider": providers.pop() if len(providers) == 1 else "",
+        "llm_model": responses[0].model[:100],
+        "input_tokens": total("input_tokens"),
+        "output_tokens": total("output_tokens"),
+        "llm_latency_ms": round(sum(r.latency for r in responses) * 1000),
+        "llm_calls": len(responses),
+    }
+
+
+def build_file_code(base_code: str, file_path: str, file_code: str) -> str:
+    """Prefix a project file with the submission's pasted code / notes."""
+    combined_code = (base_code or "").strip()
+    if combined_code:
+        combined_code += "\n\n"
+    combined_code += f"# FILE: {file_path}\n{file_code}"
+    if len(combined_code) > settings.MAX_CODE_CHARS:
+        combined_code = combined_code[: settings.MAX_CODE_CHARS]
+    return combined_code
+
+
+def file_code_offset(base_code: str) -> int:
+    """
+    Lines build_file_code() puts before the file (notes, blank line and
+    the "# FILE:" header). The LLM numbers lines from the start of that
+    text, so its line numbers are this much past the file's own.
+    """
+    notes = (base_code or "").strip()
+    return len(notes.splitlines()) + 2 if notes else 1
+
+
+def failed_review_fields(submission, file_path: str, error) -> dict:
+    """Review kwargs for a file whose LLM call failed."""
+    return {
+        "submission": submission,
+        "file_path": file_path,
+        "summary": "Error calling LLM for this file.",
+        "processing_error": str(error),
+        "processed": False,
+        "raw_response": {"raw": str(error)},
+    }
+
+
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+
+
+def _get_chunk_pool():
+    """Shared pool for chunk reviews; separate from the worker's file pool."""
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            _chunk_pool = ThreadPoolExecutor(
+                max_workers=settings.REVIEW_CHUNK_THREADS,
+                thread_name_prefix="review-chunk",
+            )
+        return _chunk_pool
+
+
+def chunk_budget(notes: str = "") -> int:
+    """Characters of code per chunk so that notes + header + chunk fit a prompt."""
+    room = settings.MAX_CODE_CHARS - len((notes or "").strip()) - 300
+    return max(1000, min(settings.REVIEW_CHUNK_CHARS, room))
+
+
+def _shift_line_numbers(value, offset: int):
+    """
+    Remap "12", 12 or "12-15" from prompt-relative to file line numbers.
+    Lines before the file (notes, headers) map to line 1.
+    """
+    if isinstance(value, bool) or offset == 0:
+        return value
+    if isinstance(value, int):
+        return max(1, value + offset)
+    if isinstance(value, str):
+        return re.sub(r"\d+", lambda m: str(max(1, int(m.group(0)) + offset)), value)
+    return value
+
+
+def _shift_items(items, key: str, offset: int):
+    if not isinstance(items, list):
+        return items
+    return [
+        {**item, key: _shift_line_numbers(item.get(key), offset)}
+        if isinstance(item, dict)
+        else item
+        for item in items
+    ]
+
+
+def shift_review_lines(issues, suggestions, offset: int):
+    """(issues, suggestions) with their "line" / "lines" moved by `offset`."""
+    return _shift_items(issues, "line", offset), _shift_items(suggestions, "lines", offset)
+
+
+def merge_chunk_reviews(chunks, parsed_results, header_lines: int = 0) -> dict:
+    """
+    Merge per-chunk reviews into one set of Review fields. Issue and
+    suggestion line numbers are shifted to the original file, dropping the
+    `header_lines` each chunk prompt starts with (see file_code_offset);
+    the quality score is the chunk-size-weighted mean of the chunks that
+    have one. `parsed_results` holds a parsed dict per chunk, or None if
+    it failed.
+    """
+    summaries, issues, suggestions, tests = [], [], [], []
+    weighted, weight = 0.0, 0
+    for chunk, parsed in zip(chunks, parsed_results):
+        if parsed is None:
+            continue
+        fields = review_fields(parsed)
+        label = f"Lines {chunk.start_line}-{chunk.end_line}"
+        if fields["summary"]:
+            summaries.append(f"{label}: {fields['summary']}")
+        chunk_issues, chunk_suggestions = shift_review_lines(
+            fields["issues"], fields["suggestions"], chunk.start_line - 1 - header_lines
+        )
+        issues.extend(chunk_issues or [])
+        suggestions.extend(chunk_suggestions or [])
+        if fields["tests_suggestions"]:
+            tests.append(f"{label}: {fields['tests_suggestions']}")
+        try:
+            score = float(fields["quality_score"])
+        except (TypeError, ValueError):
+            continue
+        weighted += score * len(chunk.text)
+        weight += len(chunk.text)
+
+    return {
+        "summary": "\n\n".join(summaries),
+        "issues": issues,
+        "suggestions": suggestions,
+        "tests_suggestions": "\n\n".join(tests),
+        "quality_score": round(weighted / weight, 1) if weight else None,
+    }
+
+
+def _chunk_prompts(code, language, notes, file_path, timings):
+    """Split `code` for review_chunked; returns (chunks, prompts)."""
+    split_language = language_for_path(file_path, language)
+    with timer("chunk", timings):
+        chunks = split_code(code, split_language, chunk_budget(notes))
+    prompts = []
+    for chunk in chunks:
+        label = f"{file_path or 'code'} (lines {chunk.start_line}-{chunk.end_line})"
+        prompts.append(
+            build_review_prompt(build_file_code(notes, label, chunk.text), language)
+        )
+    return chunks, prompts
+
+
+def _chunked_fields(chunks, results, notes, timings) -> dict:
+    """Merge per-chunk LLM responses (or the exceptions they raised)."""
+    responses, errors = [], []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, BaseException):
+            errors.append(f"lines {chunk.start_line}-{chunk.end_line}: {result}")
+            responses.append(None)
+        else:
+            responses.append(result)
+
+    if len(errors) == len(chunks):
+        raise RuntimeError("All chunks failed. " + "; ".join(errors))
+
+    with timer("parse", timings):
+        parsed_results = []
+        for response in responses:
+            if response is None:
+                parsed_results.append(None)
+                continue
+            parsed = parse_llm_output(response.text)
+            parsed_results.append(parsed if isinstance(parsed, dict) else {})
+        merged = merge_chunk_reviews(
+            chunks, parsed_results, header_lines=file_code_offset(notes)
+        )
+
+    raw_chunks = [
+        {"lines": f"{c.start_line}-{c.end_line}", "raw": r.text if r else None}
+        for c, r in zip(chunks, responses)
+    ]
+    return {
+        **merged,
+        **usage_fields(responses),
+        "raw_response": {"raw": json.dumps(raw_chunks), "chunks": len(chunks)},
+        "processed": True,
+        "processing_error": "\n".join(errors),
+        "stage_timings": timings,
+    }
+
+
+def review_chunked(
+    code: str, language: str, notes: str = "", file_path: str = "", deadline=None
+) -> dict:
+    """
+    Review a file too large for one prompt: split it on structural
+    boundaries, review the chunks in parallel and merge the results.
+    All chunks share one `deadline` (see router.file_deadline).
+    Returns Review fields (without submission/file_path); raises when
+    every chunk failed.
+    """
+    deadline = deadline or file_deadline()
+    timings = {}
+    chunks, prompts = _chunk_prompts(code, language, notes, file_path, timings)
+    results = []
+    with timer("llm", timings):
+        futures = [
+            _get_chunk_pool().submit(call_llm, prompt, deadline=deadline)
+            for prompt in prompts
+        ]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return _chunked_fields(chunks, results, notes, timings)
+
+
+async def areview_chunked(
+    code: str, language: str, notes: str = "", file_path: str = "", deadline=None
+) -> dict:
+    """review_chunked on the async client; chunks are awaited concurrently."""
+    deadline = deadline or file_deadline()
+    timings = {}
+    chunks, prompts = _chunk_prompts(code, language, notes, file_path, timings)
+    with timer("llm", timings):
+        results = await asyncio.gather(
+            *(acall_llm(prompt, deadline=deadline) for prompt in prompts),
+            return_exceptions=True,
+        )
+    return _chunked_fields(chunks, results, notes, timings)
+
+
+def _single_fields(response, timings) -> dict:
+    with timer("parse", timings):
+        fields = review_fields(parse_llm_output(response.text))
+    return {
+        **fields,
+        **usage_fields([response]),
+        "raw_response": {"raw": response.text},
+        "processed": True,
+        "stage_timings": timings,
+    }
+
+
+def _review_single(code: str, language: str, deadline=None) -> dict:
+    """One prompt, one LLM call; Review fields with usage and stage timings."""
+    timings = {}
+    with timer("prompt_build", timings):
+        prompt = build_review_prompt(code, language)
+    with timer("llm", timings):
+        response = call_llm(prompt, deadline=deadline)
+    return _single_fields(response, timings)
+
+
+async def _areview_single(code: str, language: str, deadline=None) -> dict:
+    timings = {}
+    with timer("prompt_build", timings):
+        prompt = build_review_prompt(code, language)
+    with timer("llm", timings):
+        response = await acall_llm(prompt, deadline=deadline)
+    return _single_fields(response, timings)
+
+
+def review_code(code: str, language: str) -> dict:
+    """
+    Review pasted / single-file code synchronously. Returns Review fields
+    (without submission); LLM errors propagate to the caller.
+    """
+    if len(code) > settings.MAX_CODE_CHARS:
+        return review_chunked(code, language)
+    return _review_single(code, language)
+
+
+async def areview_code(code: str, language: str) -> dict:
+    """review_code for async views; no thread is held while the LLM answers."""
+    if len(code) > settings.MAX_CODE_CHARS:
+        return await areview_chunked(code, language)
+    return await _areview_single(code, language)
+
+
+def review_file(submission, file_path: str, file_code: str) -> dict:
+    """
+    Run one file of a project submission through the LLM. Files larger
+    than one prompt are chunked (see review_chunked).
+    Returns kwargs for Review.objects.create(); LLM failures are returned
+    as an unprocessed review instead of raising. Does not touch the
+    database, so it is safe to call from worker threads. The LLM calls of
+    one file get LLM_FILE_DEADLINE_SECONDS in total.
+    """
+    deadline = file_deadline()
+    try:
+        if len(file_code) > chunk_budget(submission.code):
+            fields = review_chunked(
+                file_code, submission.language, notes=submission.code,
+                file_path=file_path, deadline=deadline,
+            )
+        else:
+            combined_code = build_file_code(submission.code, file_path, file_code)
+            fields = _review_single(combined_code, submission.language, deadline)
+            fields["issues"], fields["suggestions"] = shift_review_lines(
+                fields["issues"],
+                fields["suggestions"],
+                -file_code_offset(submission.code),
+            )
+    except Exception as e:
+        return failed_review_fields(submission, file_path, e)
+
+    return {"submission": submission, "file_path": file_path, **fields}
+
+
+def is_batchable(file_code: str) -> bool:
+    """Small files are packed several to a prompt (see review_batch)."""
+    return (
+        settings.REVIEW_BATCH_ENABLED
+        and len(file_code) <= settings.REVIEW_BATCH_FILE_MAX_CHARS
+    )
+
+
+def file_cache_key(submission, file_code: str, provider=None) -> str:
+    """
+    Review-cache key for one project file as answered by `provider`
+    (LLM_PROVIDER by default) and its configured model. The file path is
+    left out on purpose so identical files (vendored copies, duplicates
+    inside one ZIP) share a single LLM call. Batched files use the batch
+    prompt version, since they are reviewed with a different prompt.
+    """
+    version = BATCH_PROMPT_VERSION if is_batchable(file_code) else PROMPT_VERSION
+    return cache_key(
+        f"{submission.code}\0{file_code}",
+        submission.language,
+        provider=provider,
+        prompt_version=version,
+    )
+
+
+def file_cache_keys(submission, file_code: str) -> list:
+    """
+    file_cache_key() for every configured provider, preferred first: an
+    answer any of them gave may be reused, since the router could have
+    sent the file to any of them.
+    """
+    return [
+        file_cache_key(submission, file_code, provider)
+        for provider in configured_providers()
+    ]
+
+
+def cached_review_fields(submission, file_path: str, cached: dict) -> dict:
+    """Review kwargs cloned from a cached (or sibling) review."""
+    return {
+        "submission": submission,
+        "file_path": file_path,
+        **{name: cached.get(name) for name in CACHED_FIELDS},
+        "processed": True,
+    }
+
+
+def split_batch_output(raw: str, file_paths) -> dict:
+    """
+    Split a batched response into {file_path: parsed review}. Paths the
+    model left out, or answered with something that is not a review
+    object, are missing from the result.
+    """
+    parsed = parse_llm_output(raw)
+    if not isinstance(parsed, dict):
+        return {}
+    results = {}
+    for file_path in file_paths:
+        entry = parsed.get(file_path)
+        if isinstance(entry, dict) and ("summary" in entry or "issues" in entry):
+            results[file_path] = entry
+    return results
+
+
+def review_batch(submission, files, deadline=None) -> dict:
+    """
+    Review several small files of one submission with a single LLM call.
+    `files` is a list of (file_path, code). Returns {file_path: Review kwargs}
+    for every file that could be split out of the answer; callers fall back
+    to review_file() for the rest. LLM errors propagate to the caller. The
+    call gets the same LLM_FILE_DEADLINE_SECONDS as a single file.
+    """
+    deadline = deadline or file_deadline()
+    timings = {}
+    with timer("prompt_build", timings):
+        prompt = build_batch_review_prompt(
+            files, submission.language, notes=submission.code
+        )
+    with timer("llm", timings):
+        response = call_llm(prompt, deadline=deadline)
+    with timer("parse", timings):
+        entries = split_batch_output(response.text, [p for p, _ in files])
+    usage = usage_fields([response], share=max(1, len(entries)))
+    results = {}
+    for file_path, entry in entries.items():
+        results[file_path] = {
+            "submission": submission,
+            "file_path": file_path,
+            **review_fields(entry),
+            **usage,
+            "raw_response": {"raw": json.dumps(entry), "batched": True},
+            "processed": True,
+            "stage_timings": dict(timings),
+        }
+    return results
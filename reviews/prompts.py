@@ -1,18 +1,45 @@
 # reviews/prompts.py
-def build_review_prompt(code: str, language: str) -> str:
-    schema = '''{
+
+# Bump whenever the wording or schema below changes; cached reviews
+# (reviews/review_cache.py) from older prompt versions are then ignored.
+PROMPT_VERSION = "1"
+BATCH_PROMPT_VERSION = "batch-1"
+
+REVIEW_SCHEMA = '''{
   "summary": "<short summary>",
   "issues": [{"line": null, "severity": "low|medium|high", "message": "<text>", "type": "bug|style|security|performance|other"}],
   "suggestions": [{"description": "<text>", "patch": "<code or diff>", "lines": "<start-end or null>"}],
   "tests_suggestions": "<text>",
   "quality_score": 0
 }'''
+
+
+def build_review_prompt(code: str, language: str) -> str:
     return f"""You are an expert senior {language} engineer and code reviewer.
 Return ONLY valid JSON that exactly matches this schema (no extra text, no explanation). If you cannot parse, return an empty JSON with 'raw' field.
 Schema:
-{schema}
+{REVIEW_SCHEMA}
 
 Now review the following CODE and output JSON exactly:
 
 CODE:
 \"\"\"{code}\"\"\""""
+
+
+def build_batch_review_prompt(files, language: str, notes: str = "") -> str:
+    """
+    One prompt for several small files. `files` is a list of
+    (file_path, code); the model must answer with a JSON object keyed by
+    those exact paths, each value following REVIEW_SCHEMA.
+    """
+    parts = []
+    for file_path, code in files:
+        parts.append(f'FILE: {file_path}\n"""{code}"""')
+    files_block = "\n\n".join(parts)
+    notes_block = f'PROJECT NOTES:\n"""{notes.strip()}"""\n\n' if notes.strip() else ""
+    return f"""You are an expert senior {language} engineer and code reviewer.
+Review each FILE below independently.
+Return ONLY a valid JSON object (no extra text, no explanation) whose keys are the exact file paths given after "FILE:" and whose values each match this schema:
+{REVIEW_SCHEMA}
+
+{notes_block}{files_block}"""
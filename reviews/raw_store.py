@@ -0,0 +1,90 @@
+# reviews/raw_store.py
+"""
+Compressed storage of raw LLM responses.
+
+Review.raw_response (the {"raw": text, ...} dict built by the pipeline)
+lives zlib-compressed in ReviewRawResponse, one row per review, so the
+reviews table stays small and no listing query reads it. Assigning
+review.raw_response marks it pending and store() writes pending values
+from derived.record_reviews(). Reading the property loads and inflates
+the row on first access; only the review detail endpoint does that.
+"""
+import json
+import zlib
+
+from .models import ReviewRawResponse
+
+COMPRESS_LEVEL = 6
+
+
+def encode(value) -> tuple[bytes, int]:
+    """(compressed bytes, uncompressed size) of a JSON-serializable value."""
+    raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, COMPRESS_LEVEL), len(raw)
+
+
+def decode(data):
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8"))
+
+
+def load(review):
+    """The stored raw response of a saved review, or None."""
+    data = (
+        ReviewRawResponse.objects.filter(review_id=review.pk)
+        .values_list("data", flat=True)
+        .first()
+    )
+    return decode(data) if data is not None else None
+
+
+def load_many(review_ids) -> dict:
+    """{review id: raw response} for the given reviews, in one query."""
+    return {
+        review_id: decode(data)
+        for review_id, data in ReviewRawResponse.objects.filter(
+            review_id__in=list(review_ids)
+        ).values_list("review_id", "data")
+    }
+
+
+def size(review_id) -> int | None:
+    """Uncompressed size of a review's raw response, without reading it."""
+    return (
+        ReviewRawResponse.objects.filter(review_id=review_id)
+        .values_list("size", flat=True)
+        .first()
+    )
+
+
+def store(reviews):
+    """Write the raw responses assigned to newly saved reviews."""
+    rows = []
+    for review in reviews:
+        if not review.__dict__.pop("_raw_pending", False):
+            continue
+        if review.raw_response is None:
+            continue
+        data, length = encode(review.raw_response)
+        rows.append(ReviewRawResponse(review_id=review.pk, data=data, size=length))
+    ReviewRawResponse.objects.bulk_create(rows)
+
+
+def copy(pairs):
+    """
+    Give each new review the raw response of an earlier one; `pairs` is a
+    list of (review, source review id). The compressed bytes are copied
+    as they are.
+    """
+    pairs = list(pairs)
+    sources = {
+        review_id: (data, length)
+        for review_id, data, length in ReviewRawResponse.objects.filter(
+            review_id__in={source_id for _, source_id in pairs}
+        ).values_list("review_id", "data", "size")
+    }
+    rows = []
+    for review, source_id in pairs:
+        if source_id in sources:
+            data, length = sources[source_id]
+            rows.append(ReviewRawResponse(review_id=review.pk, data=data, size=length))
+    ReviewRawResponse.objects.bulk_create(rows)
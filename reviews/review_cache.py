@@ -0,0 +1,136 @@
+# reviews/review_cache.py
+"""
+Content-addressed cache of parsed LLM reviews.
+
+The key hashes the normalized code together with the language, the
+prompt version, provider and model, so a cached review is only reused
+when the LLM would have been asked exactly the same question. Entries
+expire after REVIEW_CACHE_TTL_SECONDS and the table is trimmed to the
+REVIEW_CACHE_MAX_ENTRIES most recently used rows.
+"""
+import hashlib
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .llm_client import default_model
+from .models import ReviewCacheEntry
+from .prompts import PROMPT_VERSION
+
+# Review fields copied into / out of the cache
+CACHED_FIELDS = (
+    "summary",
+    "issues",
+    "suggestions",
+    "tests_suggestions",
+    "quality_score",
+    "raw_response",
+)
+
+# Trim the table every N stores instead of on every write
+PRUNE_EVERY = 200
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats() -> dict:
+    """In-process hit/miss counters since startup."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def normalize_code(code: str) -> str:
+    """Ignore line-ending and trailing-whitespace differences."""
+    code = (code or "").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in code.split("\n")).strip()
+
+
+def content_hash(code: str) -> str:
+    """sha256 of the normalized code, used to spot unchanged files between runs."""
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+def cache_key(
+    code: str, language: str, provider=None, model=None, prompt_version=PROMPT_VERSION
+) -> str:
+    provider = provider or settings.LLM_PROVIDER
+    model = model or default_model(provider)
+    h = hashlib.sha256()
+    for part in (prompt_version, provider, model, language, normalize_code(code)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def lookup(keys):
+    """
+    Return the cached Review fields for `keys` (one key or a list, the
+    preferred first), or None on a miss.
+    """
+    if not settings.REVIEW_CACHE_ENABLED:
+        return None
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    entries = {e.key: e for e in ReviewCacheEntry.objects.filter(key__in=keys)}
+    entry = next((entries[key] for key in keys if key in entries), None)
+    if entry is None:
+        _count("misses")
+        return None
+    ttl = timedelta(seconds=settings.REVIEW_CACHE_TTL_SECONDS)
+    if entry.created_at < timezone.now() - ttl:
+        entry.delete()
+        _count("evictions")
+        _count("misses")
+        return None
+    ReviewCacheEntry.objects.filter(pk=entry.pk).update(
+        hits=F("hits") + 1, last_used_at=timezone.now()
+    )
+    _count("hits")
+    return entry.result
+
+
+def store(key: str, fields: dict):
+    """
+    Cache the fields of a successfully processed review. The entry is
+    labelled with the provider and model that answered (llm_provider,
+    llm_model), so `key` must be built for that same provider.
+    """
+    if not settings.REVIEW_CACHE_ENABLED or not fields.get("processed"):
+        return
+    ReviewCacheEntry.objects.update_or_create(
+        key=key,
+        defaults={
+            "provider": fields.get("llm_provider", ""),
+            "llm_model": fields.get("llm_model", ""),
+            "result": {name: fields.get(name) for name in CACHED_FIELDS},
+            "created_at": timezone.now(),
+            "last_used_at": timezone.now(),
+        },
+    )
+    _count("stores")
+    if stats()["stores"] % PRUNE_EVERY == 0:
+        prune()
+
+
+def prune() -> int:
+    """Drop expired entries, then the least recently used beyond the size cap."""
+    cutoff = timezone.now() - timedelta(seconds=settings.REVIEW_CACHE_TTL_SECONDS)
+    removed, _ = ReviewCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    overflow = ReviewCacheEntry.objects.count() - settings.REVIEW_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = ReviewCacheEntry.objects.order_by("last_used_at").values_list(
+            "pk", flat=True
+        )[:overflow]
+        n, _ = ReviewCacheEntry.objects.filter(pk__in=list(oldest)).delete()
+        removed += n
+    _count("evictions", removed)
+    return removed
@@ -0,0 +1,236 @@
+# reviews/rollups.py
+"""
+Incrementally maintained per-submission totals.
+
+Every place that stores Review rows calls record() with the new rows, in
+the same transaction, so SubmissionRollup and the submission's TreeNode
+rows (one per file and directory, directories carrying totals over their
+subtree) always match the reviews. rebuild() recomputes both from scratch;
+`python manage.py rebuild_rollups --missing` runs it for submissions
+stored before rollups existed. Pages never build rollups themselves.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .findings import normalize_label
+from .models import Review, SubmissionRollup, TreeNode
+
+# Tree name for the review of a pasted / single uploaded file
+ROOT_FILE_NAME = "Full code"
+# Failed files listed on the project page
+FAILED_FILES_SHOWN = 200
+
+# Review columns the rollup needs; anything else stays in the database
+ROLLUP_FIELDS = (
+    "submission_id",
+    "file_path",
+    "issues",
+    "quality_score",
+    "processed",
+    "reused_from_id",
+)
+
+COUNT_FIELDS = (
+    "review_count",
+    "failed_count",
+    "reused_count",
+    "scored_count",
+    "issue_count",
+)
+
+
+def _score_bucket(score) -> str:
+    return str(min(10, max(0, int(round(score)))))
+
+
+def _issue_label(issue, key) -> str:
+    return normalize_label(issue.get(key) if isinstance(issue, dict) else None)
+
+
+def _tally(reviews):
+    """Totals for an iterable of Review instances (or objects with their fields)."""
+    totals = {
+        "review_count": 0,
+        "failed_count": 0,
+        "reused_count": 0,
+        "scored_count": 0,
+        "score_sum": 0.0,
+        "issue_count": 0,
+        "severity_counts": Counter(),
+        "type_counts": Counter(),
+        "score_histogram": Counter(),
+    }
+    for review in reviews:
+        totals["review_count"] += 1
+        if review.reused_from_id:
+            totals["reused_count"] += 1
+        if not review.processed:
+            totals["failed_count"] += 1
+        if review.quality_score is not None:
+            totals["scored_count"] += 1
+            totals["score_sum"] += review.quality_score
+            totals["score_histogram"][_score_bucket(review.quality_score)] += 1
+        issues = review.issues if isinstance(review.issues, list) else []
+        totals["issue_count"] += len(issues)
+        for issue in issues:
+            totals["severity_counts"][_issue_label(issue, "severity")] += 1
+            totals["type_counts"][_issue_label(issue, "type")] += 1
+    return totals
+
+
+def _merge(rollup, totals):
+    for name in COUNT_FIELDS:
+        setattr(rollup, name, getattr(rollup, name) + totals[name])
+    rollup.score_sum += totals["score_sum"]
+    for name in ("severity_counts", "type_counts", "score_histogram"):
+        merged = Counter(getattr(rollup, name) or {})
+        merged.update(totals[name])
+        setattr(rollup, name, dict(merged))
+
+
+def _split_path(file_path):
+    """(parent, name) of a review's file path."""
+    path = (file_path or "").strip("/") or ROOT_FILE_NAME
+    parent, _, name = path.rpartition("/")
+    return parent, name
+
+
+def _review_counts(review):
+    issues = review.issues if isinstance(review.issues, list) else []
+    scored = review.quality_score is not None
+    return {
+        "file_count": 1,
+        "failed_count": 0 if review.processed else 1,
+        "issue_count": len(issues),
+        "scored_count": 1 if scored else 0,
+        "score_sum": review.quality_score if scored else 0.0,
+    }
+
+
+def _record_tree(submission_id, reviews):
+    """Add file nodes for `reviews` and fold their counts into every ancestor."""
+    paths = {}
+    for review in reviews:
+        parent, name = _split_path(review.file_path)
+        paths.setdefault(f"{parent}/{name}" if parent else name, review)
+    # A path is reviewed again when a requeued job also finishes (or a ZIP
+    # lists a member twice); the tree keeps the first review of it
+    taken = set(
+        TreeNode.objects.filter(
+            submission_id=submission_id, path__in=list(paths)
+        ).values_list("path", flat=True)
+    )
+
+    files = []
+    dir_totals = {}  # path -> Counter
+    for path, review in paths.items():
+        if path in taken:
+            continue
+        parent, name = _split_path(review.file_path)
+        counts = _review_counts(review)
+        files.append(
+            TreeNode(
+                submission_id=submission_id,
+                path=path,
+                parent=parent,
+                name=name,
+                review_id=review.id,
+                reused=bool(review.reused_from_id),
+                **counts,
+            )
+        )
+        while parent:
+            dir_totals.setdefault(parent, Counter()).update(counts)
+            parent = parent.rpartition("/")[0]
+    TreeNode.objects.bulk_create(files)
+    if not dir_totals:
+        return
+
+    existing = dict(
+        TreeNode.objects.filter(
+            submission_id=submission_id, path__in=list(dir_totals)
+        ).values_list("path", "id")
+    )
+    new_dirs = []
+    for path, counts in dir_totals.items():
+        if path in existing:
+            TreeNode.objects.filter(pk=existing[path]).update(
+                **{name: F(name) + value for name, value in counts.items()}
+            )
+        else:
+            parent, _, name = path.rpartition("/")
+            new_dirs.append(
+                TreeNode(
+                    submission_id=submission_id,
+                    path=path,
+                    parent=parent,
+                    name=name,
+                    is_dir=True,
+                    **counts,
+                )
+            )
+    TreeNode.objects.bulk_create(new_dirs)
+
+
+def record(reviews):
+    """Add freshly stored reviews to their submissions' rollups and trees."""
+    by_submission = {}
+    for review in reviews:
+        by_submission.setdefault(review.submission_id, []).append(review)
+    if not by_submission:
+        return
+    with transaction.atomic():
+        for submission_id, rows in by_submission.items():
+            rollup, _ = SubmissionRollup.objects.select_for_update().get_or_create(
+                submission_id=submission_id
+            )
+            _merge(rollup, _tally(rows))
+            rollup.save()
+            _record_tree(submission_id, rows)
+
+
+def rebuild(submission, chunk_size=500):
+    """Recompute a submission's rollup and tree from its Review rows."""
+    rows = (
+        Review.objects.filter(submission=submission)
+        .only(*ROLLUP_FIELDS)
+        .order_by("id")
+        .iterator(chunk_size=chunk_size)
+    )
+    with transaction.atomic():
+        SubmissionRollup.objects.filter(submission=submission).delete()
+        TreeNode.objects.filter(submission=submission).delete()
+        rollup = SubmissionRollup.objects.create(submission=submission)
+        chunk = []
+        for review in rows:
+            chunk.append(review)
+            if len(chunk) >= chunk_size:
+                record(chunk)
+                chunk = []
+        record(chunk)
+    rollup.refresh_from_db()
+    return rollup
+
+
+def get_rollup(submission):
+    """
+    The submission's rollup. Until the first review is stored (or for
+    submissions older than rollups, until rebuild_rollups has run) an
+    empty, unsaved one.
+    """
+    try:
+        return submission.rollup
+    except SubmissionRollup.DoesNotExist:
+        return SubmissionRollup(submission=submission)
+
+
+def failed_files(submission, limit=FAILED_FILES_SHOWN):
+    """Paths of the submission's failed reviews, at most `limit` of them."""
+    paths = (
+        Review.objects.filter(submission=submission, processed=False)
+        .order_by("file_path")
+        .values_list("file_path", flat=True)[:limit]
+    )
+    return [path or ROOT_FILE_NAME for path in paths]
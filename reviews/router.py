@@ -0,0 +1,322 @@
+# reviews/router.py
+"""
+Routing of LLM calls across providers.
+
+Each provider keeps a window of its recent calls (latency, ok/error).
+route() tries the healthiest usable provider first and fails over to the
+next one when a call errors. A provider whose recent error rate is above
+LLM_HEALTH_MAX_ERROR_RATE sits out LLM_HEALTH_COOLDOWN seconds. When a
+call runs past the LLM_HEDGE_PERCENTILE latency of its provider, a hedged
+copy goes to the next provider: the first answer wins and the other call
+is cancelled. Everything is bounded by one per-file deadline
+(LLM_FILE_DEADLINE_SECONDS) rather than a flat request timeout. aroute()
+does the same for the async client (reviews/llm_async.py).
+
+With the sync client, cancelling stops a call at its next retry or
+backoff. A request already on the wire cannot be interrupted with
+`requests`; its result is dropped and its read timeout never runs past the
+deadline. Async calls are cancelled outright.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .llm_client import Cancelled, DeadlineExceeded, LLMResponse, call_llm
+from .metrics import LLM_FAILOVERS, LLM_HEDGES
+
+API_KEY_SETTINGS = {"openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class ProviderHealth:
+    """Sliding window of one provider's recent call outcomes."""
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=max(1, window))  # (ok, latency seconds)
+        self._lock = threading.Lock()
+        self.cooldown_until = 0.0
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            self._samples.append((ok, latency))
+            if (
+                not ok
+                and len(self._samples) >= settings.LLM_HEALTH_MIN_SAMPLES
+                and self._error_rate() > settings.LLM_HEALTH_MAX_ERROR_RATE
+            ):
+                self.cooldown_until = time.monotonic() + settings.LLM_HEALTH_COOLDOWN
+
+    def _error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for ok, _ in self._samples if not ok) / len(self._samples)
+
+    def _latencies(self):
+        return [latency for ok, latency in self._samples if ok]
+
+    @property
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def score(self) -> float:
+        """
+        Expected seconds to an answer: median latency divided by the success
+        rate. Infinite until enough calls were seen, so an unknown provider
+        never outranks a measured one.
+        """
+        with self._lock:
+            latencies = self._latencies()
+            if len(self._samples) < settings.LLM_HEALTH_MIN_SAMPLES or not latencies:
+                return float("inf")
+            return percentile(latencies, 50) / max(0.05, 1 - self._error_rate())
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a call deserves a hedge; None to never hedge."""
+        if settings.LLM_HEDGE_PERCENTILE <= 0:
+            return None
+        with self._lock:
+            latencies = self._latencies()
+            if len(latencies) < settings.LLM_HEALTH_MIN_SAMPLES:
+                return None
+            slow = percentile(latencies, settings.LLM_HEDGE_PERCENTILE)
+        return max(settings.LLM_HEDGE_MIN_DELAY, slow)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = self._latencies()
+            return {
+                "calls": len(self._samples),
+                "error_rate": round(self._error_rate(), 3),
+                "p50": round(percentile(latencies, 50), 3) if latencies else None,
+                "cooling_down": int(self.cooling_down),
+            }
+
+
+_health = {}
+_health_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_health(provider: str) -> ProviderHealth:
+    with _health_lock:
+        health = _health.get(provider)
+        if health is None:
+            health = _health[provider] = ProviderHealth(settings.LLM_HEALTH_WINDOW)
+        return health
+
+
+def reset():
+    """Forget all health data (tests, settings changes)."""
+    with _health_lock:
+        _health.clear()
+
+
+def health_snapshot() -> dict:
+    """{provider: recent calls, error rate, median latency, cooldown flag}."""
+    with _health_lock:
+        items = list(_health.items())
+    return {provider: health.snapshot() for provider, health in items}
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.LLM_ROUTER_THREADS, thread_name_prefix="llm-route"
+            )
+        return _pool
+
+
+def configured_providers():
+    """LLM_PROVIDER first, then the other LLM_PROVIDERS that have an API key."""
+    order = [settings.LLM_PROVIDER]
+    order += [p for p in settings.LLM_PROVIDERS if p not in order]
+    usable = [p for p in order if getattr(settings, API_KEY_SETTINGS.get(p, ""), "")]
+    # Nothing configured: let the preferred provider raise its own error
+    return usable or order[:1]
+
+
+def ranked_providers():
+    """Usable providers, best first; cooling-down ones only if all are."""
+    providers = configured_providers()
+    ready = [p for p in providers if not get_health(p).cooling_down] or providers
+    # sorted() is stable, so unmeasured providers keep the configured order
+    return sorted(ready, key=lambda p: get_health(p).score())
+
+
+def file_deadline() -> float:
+    """time.monotonic() deadline for the LLM calls of one file."""
+    return time.monotonic() + settings.LLM_FILE_DEADLINE_SECONDS
+
+
+def _attempt(provider, prompt, deadline, cancel, kwargs) -> LLMResponse:
+    started = time.monotonic()
+    try:
+        response = call_llm(prompt, provider, deadline=deadline, cancel=cancel, **kwargs)
+    except Cancelled:
+        raise
+    except Exception:
+        get_health(provider).record(False, time.monotonic() - started)
+        raise
+    get_health(provider).record(True, response.latency)
+    return response
+
+
+def route(prompt: str, deadline=None, **kwargs) -> LLMResponse:
+    """
+    Answer `prompt` from the best provider, failing over and hedging as
+    described in the module docstring. Raises DeadlineExceeded when the
+    deadline passes first, or RuntimeError when every provider failed.
+    """
+    if deadline is None:
+        deadline = file_deadline()
+    untried = ranked_providers()
+    if len(untried) == 1:
+        return _attempt(untried[0], prompt, deadline, None, kwargs)
+
+    pool = _get_pool()
+    running = {}  # future -> (provider, cancel event)
+    errors = []
+    hedge_at = hedged = None
+
+    def start(provider):
+        cancel = threading.Event()
+        future = pool.submit(_attempt, provider, prompt, deadline, cancel, kwargs)
+        running[future] = (provider, cancel)
+
+    try:
+        while True:
+            if not running:
+                if not untried:
+                    break
+                provider = untried.pop(0)
+                if errors:
+                    LLM_FAILOVERS.inc(errors[-1][0], provider)
+                start(provider)
+                delay = get_health(provider).hedge_delay()
+                hedge_at = time.monotonic() + delay if delay is not None else None
+
+            now = time.monotonic()
+            if now >= deadline:
+                raise DeadlineExceeded("LLM call ran past the file deadline")
+            wake = deadline
+            if hedge_at is not None and untried:
+                wake = min(wake, hedge_at)
+            done, _ = wait(list(running), timeout=wake - now, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if hedge_at is not None and untried and time.monotonic() >= hedge_at:
+                    hedged = untried.pop(0)
+                    hedge_at = None
+                    LLM_HEDGES.inc(hedged, "sent")
+                    start(hedged)
+                continue
+            for future in done:
+                provider, _ = running.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append((provider, e))
+                    continue
+                if provider == hedged:
+                    LLM_HEDGES.inc(provider, "won")
+                return response
+    finally:
+        for _, cancel in running.values():
+            cancel.set()
+
+    raise RuntimeError(
+        "All LLM providers failed. " + "; ".join(f"{p}: {e}" for p, e in errors)
+    )
+
+
+async def _aattempt(provider, prompt, deadline, kwargs) -> LLMResponse:
+    from .llm_async import acall_llm
+
+    started = time.monotonic()
+    try:
+        response = await acall_llm(prompt, provider, deadline=deadline, **kwargs)
+    except Exception:
+        get_health(provider).record(False, time.monotonic() - started)
+        raise
+    get_health(provider).record(True, response.latency)
+    return response
+
+
+async def aroute(prompt: str, deadline=None, **kwargs) -> LLMResponse:
+    """route() for coroutines; the losing call of a hedge is cancelled outright."""
+    if deadline is None:
+        deadline = file_deadline()
+    untried = ranked_providers()
+    if len(untried) == 1:
+        return await _aattempt(untried[0], prompt, deadline, kwargs)
+
+    running = {}  # task -> provider
+    errors = []
+    hedge_at = hedged = None
+
+    def start(provider):
+        task = asyncio.ensure_future(_aattempt(provider, prompt, deadline, kwargs))
+        running[task] = provider
+
+    try:
+        while True:
+            if not running:
+                if not untried:
+                    break
+                provider = untried.pop(0)
+                if errors:
+                    LLM_FAILOVERS.inc(errors[-1][0], provider)
+                start(provider)
+                delay = get_health(provider).hedge_delay()
+                hedge_at = time.monotonic() + delay if delay is not None else None
+
+            now = time.monotonic()
+            if now >= deadline:
+                raise DeadlineExceeded("LLM call ran past the file deadline")
+            wake = deadline
+            if hedge_at is not None and untried:
+                wake = min(wake, hedge_at)
+            done, _ = await asyncio.wait(
+                list(running), timeout=wake - now, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                if hedge_at is not None and untried and time.monotonic() >= hedge_at:
+                    hedged = untried.pop(0)
+                    hedge_at = None
+                    LLM_HEDGES.inc(hedged, "sent")
+                    start(hedged)
+                continue
+            for task in done:
+                provider = running.pop(task)
+                try:
+                    response = task.result()
+                except Exception as e:
+                    errors.append((provider, e))
+                    continue
+                if provider == hedged:
+                    LLM_HEDGES.inc(provider, "won")
+                return response
+    finally:
+        for task in running:
+            task.cancel()
+        # Let the losers unwind, so their calls are counted as cancelled
+        await asyncio.gather(*running, return_exceptions=True)
+
+    raise RuntimeError(
+        "All LLM providers failed. " + "; ".join(f"{p}: {e}" for p, e in errors)
+    )
@@ -0,0 +1,190 @@
+# reviews/search.py
+"""
+Full-text search over reviews.
+
+On SQLite the reviews are indexed in an FTS5 table (created by migration
+0010) holding the file path, summary, issue messages and suggestion
+descriptions of each review, keyed by review id. index() adds new reviews
+from derived.record_reviews() in the writing transaction and a trigger
+drops rows of deleted reviews; results are ranked with bm25. Other
+databases, or SQLite builds without FTS5, fall back to case-insensitive
+LIKE matching on the same fields, newest first.
+"""
+import re
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .findings import json_entries
+from .models import Issue, Review, Suggestion
+
+FTS_TABLE = "reviews_review_fts"
+FTS_COLUMNS = ("file_path", "summary", "issues", "suggestions")
+# bm25 weight per column: a hit in the file name counts most
+FTS_WEIGHTS = (5.0, 2.0, 1.0, 1.0)
+
+# Review columns needed to build a search document
+DOCUMENT_FIELDS = ("file_path", "summary", "issues", "suggestions")
+
+# Snippet highlight markers, swapped for <mark> after escaping
+_HL_START, _HL_END = "\x02", "\x03"
+
+# Whether the FTS table exists, per database name
+_fts_ready = {}
+
+
+def document(review):
+    """Column values indexed for `review`, in FTS_COLUMNS order."""
+    issues = json_entries(review.issues)
+    suggestions = json_entries(review.suggestions)
+    return (
+        review.file_path or "",
+        review.summary or "",
+        "\n".join(str(item.get("message") or "") for item in issues),
+        "\n".join(str(item.get("description") or "") for item in suggestions),
+    )
+
+
+def create_index(schema_editor):
+    """Create the FTS table and its delete trigger; False if FTS5 is unavailable."""
+    if schema_editor.connection.vendor != "sqlite":
+        return False
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(FTS_COLUMNS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        return False
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON reviews_review "
+        f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    )
+    _fts_ready.pop(schema_editor.connection.settings_dict["NAME"], None)
+    return True
+
+
+def drop_index(schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_ready.pop(schema_editor.connection.settings_dict["NAME"], None)
+
+
+def fts_available() -> bool:
+    if connection.vendor != "sqlite":
+        return False
+    name = connection.settings_dict["NAME"]
+    if name not in _fts_ready:
+        _fts_ready[name] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready[name]
+
+
+def index(reviews):
+    """Add (or refresh) the search rows of stored reviews."""
+    if not fts_available():
+        return
+    rows = [(review.id, *document(review)) for review in reviews]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def rebuild(reviews=None, chunk_size=500):
+    """Re-index every review (or the given queryset); returns the number indexed."""
+    if not fts_available():
+        return 0
+    if reviews is None:
+        reviews = Review.objects.all()
+    count, chunk = 0, []
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        for review in reviews.only(*DOCUMENT_FIELDS).iterator(chunk_size=chunk_size):
+            chunk.append(review)
+            if len(chunk) >= chunk_size:
+                index(chunk)
+                count += len(chunk)
+                chunk = []
+        index(chunk)
+    return count + len(chunk)
+
+
+def query_terms(query: str):
+    """Whitespace-separated search terms, at most 10."""
+    return [term for term in query.split() if re.search(r"\w", term)][:10]
+
+
+def _match_expression(terms) -> str:
+    # Each term becomes a quoted phrase, so "views.py" matches the tokens
+    # "views py" and user input can never be parsed as FTS5 syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _highlight(snippet: str):
+    return mark_safe(
+        escape(snippet).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+    )
+
+
+def _fts_search(terms, offset, limit):
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s",
+            [_HL_START, _HL_END, _match_expression(terms), limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def _fallback_search(terms, offset, limit):
+    reviews = Review.objects.all()
+    for term in terms:
+        reviews = reviews.filter(
+            Q(file_path__icontains=term)
+            | Q(summary__icontains=term)
+            | Q(id__in=Issue.objects.filter(message__icontains=term).values("review_id"))
+            | Q(
+                id__in=Suggestion.objects.filter(
+                    description__icontains=term
+                ).values("review_id")
+            )
+        )
+    rows = reviews.order_by("-created_at", "-id").values_list("id", "summary")
+    return [(pk, summary[:200]) for pk, summary in rows[offset : offset + limit]]
+
+
+def search(query: str, offset=0, limit=20):
+    """
+    Reviews matching every term of `query`, best match first, each with a
+    `snippet` attribute. Returns (reviews, has_more).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+    run = _fts_search if fts_available() else _fallback_search
+    hits = run(terms, offset, limit + 1)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    reviews = Review.objects.select_related("submission").only(
+        "id", "file_path", "created_at", "quality_score",
+        "submission__id", "submission__title",
+    ).in_bulk([pk for pk, _ in hits])
+    results = []
+    for pk, snippet in hits:
+        review = reviews.get(pk)
+        if review is not None:
+            review.snippet = _highlight(snippet or "")
+            results.append(review)
+    return results, has_more
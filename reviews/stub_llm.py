@@ -0,0 +1,244 @@
+# reviews/stub_llm.py
+"""
+Offline stand-in for the LLM APIs, for benchmarks and tests.
+
+StubLLMServer answers POSTs in the OpenAI chat-completions format, or in
+the Anthropic messages format when the path contains "messages", both
+plain and streamed (server-sent events), with token usage. Batch prompts
+(see prompts.build_batch_review_prompt) get one review per FILE. Latency,
+error rate and response size are configurable; point OPENAI_API_URL /
+ANTHROPIC_API_URL at it (python manage.py run_stub_llm).
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BATCH_FILE_RE = re.compile(r"^FILE: (.+)$", re.M)
+
+SEVERITIES = ("low", "medium", "high")
+ISSUE_TYPES = ("bug", "style", "security", "performance", "other")
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0  # seconds per response
+    jitter: float = 0.0  # extra uniform random seconds
+    error_rate: float = 0.0  # share of requests answered with error_status
+    error_status: int = 500
+    retry_after: str = "0"  # Retry-After header sent with 429 errors
+    issues: int = 2  # issues (and suggestions) per review
+    summary_chars: int = 80
+    seed: int | None = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StubLLM/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._send_json(200, dict(self.server.counts))
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        server.count("requests")
+
+        if server.should_fail():
+            server.count("errors")
+            headers = (
+                {"Retry-After": server.config.retry_after}
+                if server.config.error_status == 429
+                else {}
+            )
+            self._send_json(
+                server.config.error_status,
+                {"error": {"type": "stub_error", "message": "injected failure"}},
+                headers,
+            )
+            return
+
+        messages = body.get("messages") or [{}]
+        prompt = str(messages[-1].get("content", ""))
+        content = json.dumps(server.answer(prompt))
+        usage = (max(1, len(prompt) // 4), max(1, len(content) // 4))
+        model = body.get("model") or "stub"
+        anthropic = "messages" in self.path
+
+        delay = server.delay()
+        if body.get("stream"):
+            self._stream(anthropic, model, content, usage, delay, body)
+            return
+        time.sleep(delay)
+        if anthropic:
+            payload = {
+                "id": "msg_stub",
+                "type": "message",
+                "model": model,
+                "content": [{"type": "text", "text": content}],
+                "usage": {"input_tokens": usage[0], "output_tokens": usage[1]},
+            }
+        else:
+            payload = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1]},
+            }
+        self._send_json(200, payload)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _event(self, payload, event=None):
+        if event:
+            self.wfile.write(f"event: {event}\n".encode())
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def _stream(self, anthropic, model, content, usage, delay, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = [content[i : i + 40] for i in range(0, len(content), 40)] or [""]
+        pause = delay / len(pieces)
+
+        if anthropic:
+            message = {"id": "msg_stub", "model": model, "usage": {"input_tokens": usage[0]}}
+            self._event({"type": "message_start", "message": message}, "message_start")
+        for piece in pieces:
+            time.sleep(pause)
+            if anthropic:
+                delta = {"type": "text_delta", "text": piece}
+                self._event(
+                    {"type": "content_block_delta", "index": 0, "delta": delta},
+                    "content_block_delta",
+                )
+            else:
+                self._event({"choices": [{"index": 0, "delta": {"content": piece}}]})
+        if anthropic:
+            self._event(
+                {"type": "message_delta", "usage": {"output_tokens": usage[1]}},
+                "message_delta",
+            )
+            self._event({"type": "message_stop"}, "message_stop")
+        else:
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._event(
+                    {
+                        "choices": [],
+                        "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1]},
+                    }
+                )
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), _Handler)
+        self.config = config or StubConfig()
+        self.counts = {"requests": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_url(self) -> str:
+        return f"{self.base_url}/v1/chat/completions"
+
+    @property
+    def anthropic_url(self) -> str:
+        return f"{self.base_url}/v1/messages"
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up (deadlines, dropped hedged requests) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.config.error_rate
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.config.latency + self._random.uniform(0, self.config.jitter)
+
+    def review(self) -> dict:
+        cfg = self.config
+        with self._lock:
+            rnd = self._random
+            issues = [
+                {
+                    "line": rnd.randint(1, 200),
+                    "severity": rnd.choice(SEVERITIES),
+                    "message": f"Stub finding {i + 1}",
+                    "type": rnd.choice(ISSUE_TYPES),
+                }
+                for i in range(cfg.issues)
+            ]
+            score = rnd.randint(3, 9)
+        summary = "Stub review of the submitted code. " * (cfg.summary_chars // 35 + 1)
+        suggestions = [
+            {"description": f"Stub suggestion {i + 1}", "patch": "pass", "lines": f"{i + 1}-{i + 1}"}
+            for i in range(cfg.issues)
+        ]
+        return {
+            "summary": summary[: cfg.summary_chars].strip(),
+            "issues": issues,
+            "suggestions": suggestions,
+            "tests_suggestions": "Add a unit test for the main code path.",
+            "quality_score": score,
+        }
+
+    def answer(self, prompt: str) -> dict:
+        """A review, or one review per file path for batch prompts."""
+        paths = _BATCH_FILE_RE.findall(prompt)
+        if paths:
+            return {path.strip(): self.review() for path in paths}
+        return self.review()
+
+    def start(self):
+        """Serve from a daemon thread; returns self."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, daemon=True, name="stub-llm"
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
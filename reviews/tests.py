@@ -1,3 +1,1541 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.request import urlopen
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    archive_cache,
+    blobs,
+    diffs,
+    highlight,
+    jobs,
+    llm_client,
+    metrics,
+    router,
+    rollups,
+    search,
+    views,
+)
+from .chunking import Chunk, split_code
+from .derived import record_reviews
+from .ingest import _stream_to_tempfile, download_github_repo_zip, iter_zip_files
+from .llm_async import acall_llm, aclose_clients
+from .llm_client import Cancelled, DeadlineExceeded
+from .metrics import HIGHLIGHT_CACHE, LLM_HEDGES, LLM_REQUESTS, SUGGESTION_DIFFS
+from .models import (
+    Issue,
+    Review,
+    ReviewCacheEntry,
+    ReviewJob,
+    ReviewRawResponse,
+    SourceBlob,
+    Submission,
+    SubmissionRollup,
+    TreeNode,
+)
+from .pipeline import (
+    merge_chunk_reviews,
+    parse_llm_output,
+    review_batch,
+    review_chunked,
+    split_batch_output,
+)
+from .stub_llm import StubConfig, StubLLMServer
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for path, code in files.items():
+            archive.writestr(path, code)
+    buffer.seek(0)
+    buffer.name = "project.zip"
+    return buffer
+
+
+class ParsingTests(TestCase):
+    def test_parse_llm_output_extracts_json_from_chatter(self):
+        parsed = parse_llm_output('Sure! {"summary": "ok", "quality_score": 7} Done.')
+        self.assertEqual(parsed["summary"], "ok")
+
+    def test_parse_llm_output_keeps_unparseable_text(self):
+        self.assertEqual(parse_llm_output("no json here"), {"raw": "no json here"})
+
+    def test_lexer_follows_the_file_extension_then_the_language(self):
+        self.assertEqual(highlight.lexer_for("python", "app/main.js").name, "JavaScript")
+        self.assertEqual(highlight.lexer_for("python", "notes.txt").name, "Text only")
+        self.assertEqual(highlight.lexer_for("cpp", "").name, "C++")
+        self.assertEqual(highlight.lexer_for("cobol-ish", "Makefile.unknown").name, "Text only")
+
+    def test_split_code_cuts_python_on_top_level_definitions(self):
+        code = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(50))
+        chunks = split_code(code, "python", 200)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(c.text for c in chunks), code)
+        for chunk in chunks:
+            self.assertTrue(chunk.text.startswith("def "))
+
+
+class DiffTests(TestCase):
+    source = "".join(f"line {i}\n" for i in range(1, 3001))
+
+    def test_replacement_code_goes_into_the_line_range(self):
+        diff = diffs.build_diff(self.source, {"patch": "line two\nline 2b", "lines": "2-2"})
+        self.assertTrue(diff["applied"])
+        self.assertEqual((diff["added"], diff["removed"]), (2, 1))
+        self.assertIn("-line 2\n+line two\n+line 2b", diff["unified"])
+        change = [r for r in diff["hunks"][0]["rows"] if r["kind"] == "change"][0]
+        self.assertIn((True, "two"), change["new"])
+
+    def test_unified_patch_is_placed_by_content(self):
+        patch = "@@ -10,3 +10,3 @@\n line 2000\n-line 2001\n+line 2001 fixed\n line 2002\n"
+        diff = diffs.build_diff(self.source, {"patch": patch})
+        self.assertTrue(diff["applied"])
+        self.assertEqual(diff["hunks"][0]["header"], "@@ -1998,7 +1998,7 @@")
+
+    def test_unplaceable_patch_is_reported(self):
+        diff = diffs.build_diff(self.source, {"patch": "-missing\n+line\n"})
+        self.assertFalse(diff["applied"])
+        self.assertEqual(diffs.build_diff(self.source, {"patch": "x"})["applied"], False)
+
+
+class SourceBlobTests(TestCase):
+    def test_cache_only_holds_committed_blobs(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            key = blobs.put("rolled back")
+            self.assertEqual(blobs.read(key), "rolled back")
+            raise RuntimeError
+        self.assertIsNone(blobs._cache.get(key))
+        with self.assertRaises(SourceBlob.DoesNotExist):
+            blobs.read(key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            key = blobs.put("kept")
+        self.assertEqual(blobs._cache.get(key), "kept")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(blobs.prune(), 1)
+        self.assertIsNone(blobs._cache.get(key))
+
+
+class StubLLMTestCase(TestCase):
+    """Runs the pipeline against the in-process stub LLM."""
+
+    stub_config = StubConfig()
+    # Settings a test case changes on top of the ones below
+    extra_settings = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubLLMServer(config=cls.stub_config).start()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            **{
+                "LLM_PROVIDER": "openai",
+                "LLM_PROVIDERS": ["openai"],
+                "OPENAI_API_URL": cls.stub.openai_url,
+                "OPENAI_API_KEY": "stub",
+                "REVIEW_CACHE_ENABLED": False,
+                "LLM_MAX_RETRIES": 0,
+                "MEDIA_ROOT": cls.media_root,
+                **cls.extra_settings,
+            }
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.stop()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def submit_zip(self, files, code=""):
+        response = self.client.post(
+            reverse("reviews:index"),
+            {"title": "project", "language": "python", "code": code, "upload": make_zip(files)},
+        )
+        self.assertEqual(response.status_code, 302)
+        submission = Submission.objects.latest("id")
+        while jobs.drain(max_workers=4):
+            pass
+        submission.refresh_from_db()
+        return submission
+
+
+class PipelineTests(StubLLMTestCase):
+    def test_zip_upload_is_reviewed_end_to_end(self):
+        submission = self.submit_zip(
+            {
+                "app/models.py": "class A:\n    pass\n",
+                "app/views.py": "def index():\n    return 1\n",
+                "README.md": "# demo\n",
+            }
+        )
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        self.assertEqual(submission.reviews.filter(processed=True).count(), 3)
+        self.assertEqual(submission.rollup.review_count, 3)
+        self.assertEqual(Issue.objects.filter(submission=submission).count(), 6)
+
+        app = TreeNode.objects.get(submission=submission, path="app", is_dir=True)
+        self.assertEqual(app.file_count, 2)
+        tree = self.client.get(
+            reverse("reviews:project_tree", args=[submission.id]), {"path": "app"}
+        ).json()
+        self.assertEqual([n["name"] for n in tree["nodes"]], ["models.py", "views.py"])
+
+        results, _ = search.search("views.py")
+        self.assertEqual([r.file_path for r in results], ["app/views.py"])
+
+    def test_string_scores_are_stored_as_numbers(self):
+        review = self.stub.review
+        scores = iter(["8", "n/a", 7])
+
+        def string_score():
+            return {**review(), "quality_score": next(scores)}
+
+        with mock.patch.object(self.stub, "review", side_effect=string_score):
+            submission = self.submit_zip(
+                {"a.py": "a = 1\n", "b.py": "b = 1\n", "c.py": "c = 1\n"}
+            )
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        self.assertEqual(
+            sorted(submission.reviews.values_list("quality_score", flat=True), key=str),
+            [7.0, 8.0, None],
+        )
+        rollup = SubmissionRollup.objects.get(submission=submission)
+        self.assertEqual((rollup.scored_count, rollup.score_sum), (2, 15.0))
+
+    def test_pasted_code_stores_token_usage(self):
+        response = self.client.post(
+            reverse("reviews:index"),
+            {"title": "snippet", "language": "python", "code": "print('hi')\n"},
+        )
+        self.assertEqual(response.status_code, 302)
+        review = Review.objects.latest("id")
+        self.assertTrue(review.processed)
+        self.assertEqual(review.llm_calls, 1)
+        self.assertGreater(review.output_tokens, 0)
+        self.assertIn("llm", review.stage_timings)
+
+    def test_raw_response_is_compressed_and_loaded_on_demand(self):
+        self.client.post(
+            reverse("reviews:index"),
+            {"title": "snippet", "language": "python", "code": "print('hi')\n"},
+        )
+        review = Review.objects.latest("id")
+        row = ReviewRawResponse.objects.get(review=review)
+        self.assertLess(len(row.data), row.size)
+
+        page = self.client.get(reverse("reviews:detail", args=[review.id])).content.decode()
+        self.assertIn(reverse("reviews:review_raw", args=[review.id]), page)
+        self.assertNotIn("Stub finding", page.split("Raw response")[1])
+        raw = self.client.get(reverse("reviews:review_raw", args=[review.id]))
+        self.assertIn('"quality_score"', raw.content.decode())
+
+    def test_identical_sources_are_stored_once(self):
+        files = {"a.py": "x = 1\n", "b.py": "x = 1\n", "c.py": "y = 2\n"}
+        first = self.submit_zip(files)
+        second = self.submit_zip(files)
+        self.assertEqual(SourceBlob.objects.count(), 2)
+        review = second.reviews.get(file_path="a.py")
+        self.assertEqual(review.source_id, first.reviews.get(file_path="b.py").source_id)
+
+        url = reverse("reviews:source_blob", args=[review.source_id])
+        response = self.client.get(url)
+        self.assertEqual(response.content.decode(), "x = 1")
+        self.assertIn("immutable", response["Cache-Control"])
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_detail_page_is_highlighted_on_the_server_once(self):
+        submission = self.submit_zip({"app/main.js": "function f() { return 1; }"})
+        review = submission.reviews.get()
+        url = reverse("reviews:detail", args=[review.id])
+        page = self.client.get(url).content.decode()
+        self.assertIn('<div class="highlight">', page)
+        hits = HIGHLIGHT_CACHE.value("hit")
+        misses = HIGHLIGHT_CACHE.value("miss")
+        self.client.get(url)
+        self.assertEqual(HIGHLIGHT_CACHE.value("miss"), misses)
+        self.assertGreater(HIGHLIGHT_CACHE.value("hit"), hits)
+
+        source = self.client.get(reverse("reviews:review_source", args=[review.id]))
+        self.assertIn('<span class="linenos">', source.content.decode())
+        self.assertIn('<span class="kd">function</span>', source.content.decode())
+
+    def test_suggestion_diff_is_served_lazily_and_memoized(self):
+        submission = self.submit_zip({"main.py": "x = 1\ny = 2"})
+        review = submission.reviews.get()
+        url = reverse("reviews:review_diff", args=[review.id, 0])
+        page = self.client.get(reverse("reviews:detail", args=[review.id])).content.decode()
+        self.assertIn(url, page)
+
+        misses = SUGGESTION_DIFFS.value("miss")
+        page = self.client.get(url).content.decode()
+        self.assertIn('class="diff-change"', page)
+        self.client.get(url)
+        self.assertEqual(SUGGESTION_DIFFS.value("miss"), misses + 1)
+        unified = self.client.get(url, {"format": "unified"}).content.decode()
+        self.assertIn("-x = 1\n+pass\n y = 2", unified)
+        missing = reverse("reviews:review_diff", args=[review.id, 99])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_line_range_suggestion_is_applied_to_the_project_file(self):
+        def answer(prompt):
+            # Number lines the way the model sees them: from the start of CODE
+            code = prompt.split('CODE:\n"""', 1)[1]
+            line = code.splitlines().index("y = 2") + 1
+            review = self.stub.review()
+            review["issues"] = [{"line": line, "severity": "low", "message": "m", "type": "bug"}]
+            review["suggestions"] = [
+                {"description": "d", "patch": "y = 3", "lines": f"{line}-{line}"}
+            ]
+            return review
+
+        with mock.patch.object(self.stub, "answer", side_effect=answer):
+            submission = self.submit_zip(
+                {"main.py": "x = 1\ny = 2\nz = 3"}, code="Project notes\nsecond line"
+            )
+        review = submission.reviews.get()
+        self.assertEqual(review.issues[0]["line"], 2)
+        self.assertEqual(review.suggestions[0]["lines"], "2-2")
+        url = reverse("reviews:review_diff", args=[review.id, 0])
+        unified = self.client.get(url, {"format": "unified"}).content.decode()
+        self.assertIn(" x = 1\n-y = 2\n+y = 3\n z = 3", unified)
+
+    def test_reviews_are_exported_as_ndjson_and_csv(self):
+        submission = self.submit_zip({"a.py": "x = 1", "b.py": "y = 2", "c.py": "z = 3"})
+        url = reverse("reviews:export_reviews")
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(url, {"submission": submission.id})
+            self.assertTrue(response.streaming)
+            body = b"".join(response.streaming_content)
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r["file_path"] for r in rows], ["a.py", "b.py", "c.py"])
+        self.assertNotIn("raw_response", rows[0])
+        self.assertEqual(len(rows[0]["issues"]), 2)
+
+        response = self.client.get(
+            url,
+            {"since": "2000-01-01", "format": "csv", "columns": "id,file_path,raw_response"},
+        )
+        table = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(table[0], ["id", "file_path", "raw_response"])
+        self.assertEqual(len(table), 4)
+        self.assertIn("quality_score", json.loads(table[1][2])["raw"])
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+        bad_column = self.client.get(url, {"submission": 1, "columns": "nope"})
+        self.assertEqual(bad_column.status_code, 400)
+
+        out = io.StringIO()
+        call_command(
+            "export_reviews", submission=submission.id, columns="file_path,code", stdout=out
+        )
+        first = json.loads(out.getvalue().splitlines()[0])
+        self.assertEqual(first, {"file_path": "a.py", "code": "x = 1"})
+
+    def test_pages_and_metrics_render(self):
+        self.submit_zip({"main.py": "x = 1\n"})
+        for name in ("history", "issues", "search", "metrics"):
+            self.assertEqual(self.client.get(reverse(f"reviews:{name}")).status_code, 200)
+        body = self.client.get(reverse("reviews:metrics")).content.decode()
+        self.assertIn('llm_requests_total{provider="openai"', body)
+
+
+class ReviewCacheTests(StubLLMTestCase):
+    extra_settings = {"REVIEW_CACHE_ENABLED": True}
+    files = {"a.py": "x = 1\n"}
+
+    def llm_calls_for(self, files):
+        before = self.stub.counts["requests"]
+        submission = self.submit_zip(files)
+        self.assertTrue(submission.reviews.get().processed)
+        return self.stub.counts["requests"] - before
+
+    def test_repeated_file_is_answered_from_the_cache(self):
+        self.assertEqual(self.llm_calls_for(self.files), 1)
+        self.assertEqual(self.llm_calls_for(self.files), 0)
+        entry = ReviewCacheEntry.objects.get()
+        self.assertEqual(entry.hits, 1)
+        self.assertEqual((entry.provider, entry.llm_model), ("openai", "gpt-4o-mini"))
+
+    def test_prompt_version_or_model_change_misses(self):
+        self.assertEqual(self.llm_calls_for(self.files), 1)
+        with mock.patch("reviews.pipeline.BATCH_PROMPT_VERSION", "batch-test"):
+            self.assertEqual(self.llm_calls_for(self.files), 1)
+        with override_settings(OPENAI_DEFAULT_MODEL="gpt-test"):
+            self.assertEqual(self.llm_calls_for(self.files), 1)
+            self.assertEqual(self.llm_calls_for(self.files), 0)
+        self.assertEqual(ReviewCacheEntry.objects.count(), 3)
+
+    def test_expired_entries_miss_and_are_replaced(self):
+        self.assertEqual(self.llm_calls_for(self.files), 1)
+        expired = timezone.now() - timedelta(seconds=settings.REVIEW_CACHE_TTL_SECONDS + 1)
+        ReviewCacheEntry.objects.update(created_at=expired)
+        self.assertEqual(self.llm_calls_for(self.files), 1)
+        self.assertGreater(ReviewCacheEntry.objects.get().created_at, expired)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.submission = Submission.objects.create(title="old", code="")
+        for path in ("pkg/a.py", "pkg/b.py", "c.py"):
+            Review.objects.create(
+                submission=self.submission,
+                file_path=path,
+                processed=path != "c.py",
+                quality_score=6,
+                issues=[{"severity": "low", "type": "style"}],
+            )
+
+    def test_pages_do_not_build_missing_rollups(self):
+        page = self.client.get(reverse("reviews:project_detail", args=[self.submission.id]))
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(page.context["rollup"].review_count, 0)
+        tree = self.client.get(reverse("reviews:project_tree", args=[self.submission.id]))
+        self.assertEqual(tree.json()["nodes"], [])
+        self.assertFalse(SubmissionRollup.objects.exists())
+
+        out = io.StringIO()
+        call_command("rebuild_rollups", missing=True, stdout=out)
+        call_command("rebuild_rollups", missing=True, stdout=out)
+        self.assertEqual(
+            out.getvalue().splitlines(), ["Rebuilt 1 rollup(s).", "Rebuilt 0 rollup(s)."]
+        )
+        rollup = SubmissionRollup.objects.get()
+        self.assertEqual((rollup.review_count, rollup.failed_count), (3, 1))
+        self.assertEqual(rollups.failed_files(self.submission), ["c.py"])
+        tree = self.client.get(reverse("reviews:project_tree", args=[self.submission.id]))
+        self.assertEqual([n["name"] for n in tree.json()["nodes"]], ["pkg", "c.py"])
+
+    def test_a_path_reviewed_twice_keeps_one_tree_node(self):
+        rollups.rebuild(self.submission)
+        again = Review.objects.create(
+            submission=self.submission, file_path="pkg/a.py", processed=True
+        )
+        record_reviews([again])
+        self.assertEqual(
+            TreeNode.objects.filter(submission=self.submission, path="pkg/a.py").count(), 1
+        )
+        self.assertEqual(TreeNode.objects.get(path="pkg").file_count, 2)
+        self.assertEqual(SubmissionRollup.objects.get().review_count, 4)
+
+
+class JobQueueTests(StubLLMTestCase):
+    def upload(self, files):
+        self.client.post(
+            reverse("reviews:index"),
+            {"title": "project", "language": "python", "code": "", "upload": make_zip(files)},
+        )
+        return Submission.objects.latest("id")
+
+    def status(self, submission):
+        url = reverse("reviews:project_status", args=[submission.id])
+        return self.client.get(url).json()
+
+    def test_submissions_and_jobs_are_claimed_once(self):
+        submission = self.upload({"a.py": "x = 1\n", "b.py": "y = 2\n"})
+        self.assertEqual(self.status(submission)["status"], Submission.STATUS_QUEUED)
+        upload = submission.uploaded_file.path
+
+        claimed = jobs.claim_submission()
+        self.assertEqual(claimed.id, submission.id)
+        self.assertIsNone(jobs.claim_submission())
+        self.assertEqual(self.status(submission)["status"], Submission.STATUS_EXPANDING)
+
+        self.assertEqual(jobs.expand_submission(claimed), 2)
+        self.assertFalse(os.path.exists(upload))
+        submission.refresh_from_db()
+        self.assertFalse(submission.uploaded_file)
+        status = self.status(submission)
+        self.assertEqual(status["status"], Submission.STATUS_RUNNING)
+        self.assertEqual(
+            status["jobs"], {"total": 2, "pending": 2, "running": 0, "done": 0, "failed": 0}
+        )
+
+        first, second = jobs.claim_job(), jobs.claim_job()
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNone(jobs.claim_job())
+        jobs.run_job(first)
+        jobs.run_job(second)
+        status = self.status(submission)
+        self.assertTrue(status["finished"])
+        self.assertEqual((status["jobs"]["done"], status["reviews"]), (2, 2))
+
+    def test_drain_can_be_limited_to_one_submission(self):
+        mine = self.upload({"a.py": "x = 1\n"})
+        other = self.upload({"b.py": "y = 2\n"})
+        while jobs.drain(max_workers=2, submission_id=mine.id):
+            pass
+        self.assertEqual(self.status(mine)["status"], Submission.STATUS_DONE)
+        self.assertEqual(self.status(other)["status"], Submission.STATUS_QUEUED)
+
+    def test_stale_jobs_and_submissions_are_requeued(self):
+        submission = self.upload({"a.py": "x = 1\n", "b.py": "y = 2\n"})
+        jobs.expand_submission(jobs.claim_submission())
+        stale = timezone.now() - timedelta(seconds=settings.REVIEW_JOB_STALE_SECONDS + 1)
+        retry, exhausted = jobs.claim_job(), jobs.claim_job()
+        ReviewJob.objects.filter(id=retry.id).update(started_at=stale)
+        ReviewJob.objects.filter(id=exhausted.id).update(
+            started_at=stale, attempts=settings.REVIEW_JOB_MAX_ATTEMPTS
+        )
+
+        # A worker died while extracting this one
+        dead = self.upload({"c.py": "z = 3\n"})
+        jobs.claim_submission()
+        Submission.objects.filter(id=dead.id).update(claimed_at=stale)
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 2)
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(retry.status, ReviewJob.STATUS_PENDING)
+        self.assertEqual(exhausted.status, ReviewJob.STATUS_FAILED)
+        self.assertEqual(dead.status, Submission.STATUS_QUEUED)
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+
+        while jobs.drain(max_workers=2):
+            pass
+        submission.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        self.assertEqual(submission.reviews.count(), 1)
+        self.assertEqual(dead.status, Submission.STATUS_DONE)
+        self.assertEqual(dead.expand_attempts, 2)
+
+        Submission.objects.filter(id=dead.id).update(
+            status=Submission.STATUS_EXPANDING,
+            claimed_at=stale,
+            expand_attempts=settings.REVIEW_JOB_MAX_ATTEMPTS,
+        )
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+        dead.refresh_from_db()
+        self.assertEqual(dead.status, Submission.STATUS_FAILED)
+
+    def test_extraction_commits_in_batches_and_resumes_after_a_dead_worker(self):
+        files = {f"f{i}.py": f"x = {i}\n" for i in range(5)}
+        submission = self.upload(files)
+        iter_zip_files = jobs.iter_zip_files
+
+        def dies_after_three(*args, **kwargs):
+            for n, item in enumerate(iter_zip_files(*args, **kwargs)):
+                if n == 3:
+                    raise KeyboardInterrupt  # the worker process is killed
+                yield item
+
+        with mock.patch.object(jobs, "EXPAND_BATCH", 2), mock.patch.object(
+            jobs, "iter_zip_files", dies_after_three
+        ), self.assertRaises(KeyboardInterrupt):
+            jobs.expand_submission(jobs.claim_submission())
+        # The first batch was committed; the half-built second one was not
+        self.assertEqual(ReviewJob.objects.filter(submission=submission).count(), 2)
+
+        stale = timezone.now() - timedelta(seconds=settings.REVIEW_JOB_STALE_SECONDS + 1)
+        Submission.objects.filter(id=submission.id).update(claimed_at=stale)
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        while jobs.drain(max_workers=2):
+            pass
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        self.assertEqual(
+            sorted(submission.jobs.values_list("file_path", flat=True)), sorted(files)
+        )
+        self.assertEqual(submission.reviews.count(), 5)
+
+    def test_failed_extraction_fails_the_jobs_it_committed(self):
+        submission = self.upload({f"f{i}.py": f"x = {i}\n" for i in range(3)})
+        iter_zip_files = jobs.iter_zip_files
+
+        def broken_after_two(*args, **kwargs):
+            for n, item in enumerate(iter_zip_files(*args, **kwargs)):
+                if n == 2:
+                    raise ValueError("Corrupt archive.")
+                yield item
+
+        with mock.patch.object(jobs, "EXPAND_BATCH", 2), mock.patch.object(
+            jobs, "iter_zip_files", broken_after_two
+        ):
+            self.assertEqual(jobs.expand_submission(jobs.claim_submission()), 0)
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, Submission.STATUS_FAILED)
+        self.assertEqual(
+            list(submission.jobs.values_list("status", flat=True)),
+            [ReviewJob.STATUS_FAILED] * 2,
+        )
+        self.assertIsNone(jobs.claim_job())
+
+
+class ZipLimitTests(StubLLMTestCase):
+    """The ZIP-bomb and size guards of reviews/ingest.py."""
+
+    def upload(self, archive):
+        archive.name = "project.zip"
+        self.client.post(
+            reverse("reviews:index"),
+            {"title": "project", "language": "python", "code": "", "upload": archive},
+        )
+        submission = Submission.objects.latest("id")
+        while jobs.drain(max_workers=2):
+            pass
+        submission.refresh_from_db()
+        return submission
+
+    def test_highly_compressed_members_are_skipped(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("bomb.py", "a" * 1_000_000)
+            archive.writestr("ok.py", "x = 1\n")
+        self.assertEqual(
+            [path for path, _ in iter_zip_files(buffer.getvalue(), per_file_limit=10**6)],
+            ["ok.py"],
+        )
+        buffer.seek(0)
+        submission = self.upload(buffer)
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        self.assertEqual(list(submission.jobs.values_list("file_path", flat=True)), ["ok.py"])
+
+    def test_oversized_project_is_rejected_without_partial_rows(self):
+        files = {f"f{i}.txt": os.urandom(125 * 1024).hex() for i in range(5)}
+        with override_settings(ZIP_MAX_UNCOMPRESSED_MB=1), mock.patch.object(
+            jobs, "EXPAND_BATCH", 1
+        ):
+            with self.assertRaisesMessage(ValueError, "too large once unpacked"):
+                next(iter_zip_files(make_zip(files), per_file_limit=10**6))
+            submission = self.upload(make_zip(files))
+        self.assertEqual(submission.status, Submission.STATUS_FAILED)
+        self.assertIn("too large once unpacked", submission.error)
+        self.assertFalse(submission.uploaded_file)
+        self.assertFalse(ReviewJob.objects.filter(submission=submission).exists())
+        self.assertFalse(SourceBlob.objects.exists())
+
+    def test_download_is_cut_off_at_the_size_cap(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir, ignore_errors=True)
+        read = []
+
+        class Response:
+            def __init__(self, headers):
+                self.headers = headers
+
+            def iter_content(self, chunk_size):
+                for _ in range(100):
+                    read.append(chunk_size)
+                    yield b"x" * chunk_size
+
+        max_bytes = 3 * 1024 * 1024
+        with override_settings(DOWNLOAD_SPOOL_MB=1), mock.patch.object(
+            tempfile, "tempdir", spool_dir
+        ):
+            with self.assertRaisesMessage(ValueError, "too large"):
+                _stream_to_tempfile(Response({}), max_bytes)
+            # Stopped at the first chunk past the cap, after spilling to disk
+            self.assertEqual(sum(read), max_bytes + read[0])
+            read.clear()
+            declared = {"Content-Length": str(max_bytes + 1)}
+            with self.assertRaisesMessage(ValueError, "too large"):
+                _stream_to_tempfile(Response(declared), max_bytes)
+            self.assertEqual(read, [])
+        self.assertEqual(os.listdir(spool_dir), [])
+
+
+class BatchReviewTests(StubLLMTestCase):
+    files = {"a.py": "a = 1\n", "b.py": "b = 1\n", "c.py": "c = 1\n"}
+
+    def answer_batches_with(self, batch_answer):
+        """Answer batch prompts with batch_answer(review); other prompts as usual."""
+        answer = self.stub.answer
+
+        def patched(prompt):
+            if re.search(r"^FILE: ", prompt, re.M):
+                return batch_answer(self.stub.review())
+            return answer(prompt)
+
+        return mock.patch.object(self.stub, "answer", side_effect=patched)
+
+    def llm_calls_for(self, files):
+        before = self.stub.counts["requests"]
+        submission = self.submit_zip(files)
+        self.assertEqual(submission.reviews.filter(processed=True).count(), len(files))
+        return submission, self.stub.counts["requests"] - before
+
+    def test_malformed_batch_output_is_split_per_file(self):
+        raw = (
+            "Here are the reviews:\n```json\n"
+            + json.dumps(
+                {
+                    "a.py": {"summary": "fine", "issues": []},
+                    "b.py": "Looks good to me.",
+                    "c.py": {"notes": "no review fields"},
+                    "extra.py": {"summary": "not asked for"},
+                }
+            )
+            + "\n```"
+        )
+        files = ["a.py", "b.py", "c.py", "d.py"]
+        self.assertEqual(list(split_batch_output(raw, files)), ["a.py"])
+        self.assertEqual(split_batch_output("I cannot review these files.", files), {})
+        self.assertEqual(split_batch_output('[{"summary": "a list"}]', files), {})
+
+    def test_one_call_reviews_the_whole_batch(self):
+        submission, calls = self.llm_calls_for(self.files)
+        self.assertEqual(calls, 1)
+        for review in submission.reviews.all():
+            self.assertTrue(review.raw_response["batched"])
+
+    def test_batch_call_is_bounded_by_the_file_deadline(self):
+        submission = Submission.objects.create(title="t", language="python", code="")
+        before = self.stub.counts["requests"]
+        with self.assertRaises(DeadlineExceeded):
+            review_batch(submission, list(self.files.items()), deadline=time.monotonic())
+        with override_settings(LLM_FILE_DEADLINE_SECONDS=0):
+            with self.assertRaises(DeadlineExceeded):
+                review_batch(submission, list(self.files.items()))
+        self.assertEqual(self.stub.counts["requests"], before)
+
+    def test_files_left_out_of_the_batch_answer_are_reviewed_alone(self):
+        with self.answer_batches_with(lambda review: {"a.py": review, "b.py": "ok"}):
+            submission, calls = self.llm_calls_for(self.files)
+        self.assertEqual(calls, 3)
+        batched = {
+            r.file_path: bool(r.raw_response.get("batched")) for r in submission.reviews.all()
+        }
+        self.assertEqual(batched, {"a.py": True, "b.py": False, "c.py": False})
+        self.assertIn("Stub review", submission.reviews.get(file_path="b.py").summary)
+
+    def test_unparseable_batch_answer_falls_back_to_one_call_per_file(self):
+        with self.answer_batches_with(lambda review: "Sorry, I can't help with that."):
+            submission, calls = self.llm_calls_for(self.files)
+        self.assertEqual(calls, 4)
+        self.assertFalse(
+            any(r.raw_response.get("batched") for r in submission.reviews.all())
+        )
+
+
+class ChunkedReviewTests(StubLLMTestCase):
+    extra_settings = {"REVIEW_CHUNK_CHARS": 1000}
+
+    def test_chunk_reviews_are_merged_onto_file_lines(self):
+        chunks = [
+            Chunk(1, 10, "a" * 100),
+            Chunk(11, 20, "b" * 100),
+            Chunk(21, 30, "c" * 300),
+            Chunk(31, 40, "d" * 100),
+        ]
+        parsed = [
+            {
+                "summary": "first",
+                "issues": [{"line": 3}, "A free-text issue", {"line": "2-4"}],
+                "suggestions": [{"lines": "1-2", "patch": "pass"}, "Rename things"],
+                "quality_score": 4,
+            },
+            {"issues": [{"line": True}, {"message": "no line"}], "quality_score": "n/a"},
+            {
+                "summary": "third",
+                "issues": [{"line": 3}, {"line": "L2 to L5"}],
+                "suggestions": [{"lines": 7}],
+                "quality_score": "8",
+            },
+            None,  # the LLM call for this chunk failed
+        ]
+        merged = merge_chunk_reviews(chunks, parsed)
+        self.assertEqual(
+            [i["line"] if isinstance(i, dict) else i for i in merged["issues"]],
+            [3, "A free-text issue", "2-4", True, None, 23, "L22 to L25"],
+        )
+        self.assertEqual(
+            [s["lines"] if isinstance(s, dict) else s for s in merged["suggestions"]],
+            ["1-2", "Rename things", 27],
+        )
+        self.assertEqual(merged["summary"], "Lines 1-10: first\n\nLines 21-30: third")
+        # Weighted by chunk size over the chunks with a numeric score
+        self.assertEqual(merged["quality_score"], 7.0)
+
+    def test_large_file_is_reviewed_in_chunks(self):
+        code = "".join(f"def f{i}():\n    return {i}\n\n\n" for i in range(80))
+        review = {
+            "summary": "chunk",
+            "issues": [{"line": 2, "severity": "low", "message": "m", "type": "bug"}],
+            "suggestions": [{"description": "d", "patch": "pass", "lines": "2-3"}],
+            "quality_score": 6,
+        }
+
+        def answer(prompt):
+            if "(lines 1-" in prompt:
+                return "This chunk could not be reviewed."
+            return review
+
+        with mock.patch.object(self.stub, "answer", side_effect=answer):
+            fields = review_chunked(code, "python", file_path="big.py")
+        raw_chunks = json.loads(fields["raw_response"]["raw"])
+        starts = [int(chunk["lines"].split("-")[0]) for chunk in raw_chunks]
+        self.assertGreater(len(starts), 2)
+        self.assertEqual(starts[0], 1)
+        self.assertTrue(fields["processed"])
+        self.assertEqual(fields["llm_calls"], len(starts))
+        # Prompt line 2 is the first chunk line, after the "# FILE:" header
+        self.assertEqual([i["line"] for i in fields["issues"]], starts[1:])
+        self.assertEqual(
+            [s["lines"] for s in fields["suggestions"]],
+            [f"{s}-{s + 1}" for s in starts[1:]],
+        )
+        self.assertEqual(fields["quality_score"], 6.0)
+
+
+def sse_events(body: str):
+    """[(event, data)] of a server-sent event stream; comments are skipped."""
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.splitlines() if not line.startswith(":")
+        )
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class StreamViewTests(StubLLMTestCase):
+    form = {"title": "snippet", "language": "python", "code": "print('hi')\n"}
+
+    def stream(self, data):
+        response = self.client.post(reverse("reviews:review_stream"), data)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return sse_events(b"".join(response.streaming_content).decode())
+
+    def test_deltas_then_done_with_the_stored_review(self):
+        events = self.stream(self.form)
+        names = [name for name, _ in events]
+        self.assertEqual(names[-1], "done")
+        self.assertEqual(set(names[:-1]), {"delta"})
+        raw = "".join(data["text"] for name, data in events if name == "delta")
+        self.assertIn('"quality_score"', raw)
+
+        review = Review.objects.get()
+        self.assertEqual(events[-1][1]["url"], reverse("reviews:detail", args=[review.id]))
+        self.assertTrue(review.processed)
+        self.assertEqual(review.raw_response["raw"], raw)
+        self.assertEqual(review.summary, json.loads(raw)["summary"])
+        self.assertEqual(review.submission.rollup.review_count, 1)
+
+    def test_llm_failure_ends_the_stream_with_an_error(self):
+        with mock.patch("reviews.views.stream_llm", side_effect=RuntimeError("boom")):
+            events = self.stream(self.form)
+        self.assertEqual(events, [("error", {"message": "LLM request failed: boom"})])
+        self.assertFalse(Review.objects.exists())
+
+    def test_other_submissions_fall_back_to_the_form_post(self):
+        url = reverse("reviews:review_stream")
+        for data in (
+            {**self.form, "code": "   "},
+            {**self.form, "upload": make_zip({"a.py": "x = 1"})},
+            {**self.form, "repo_url": "https://github.com/acme/app"},
+        ):
+            response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"error": "Use the regular form submit."})
+        with override_settings(MAX_CODE_CHARS=5):
+            self.assertEqual(self.client.post(url, self.form).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertFalse(Submission.objects.exists())
+
+    async def test_async_stream_sends_the_same_events(self):
+        request = AsyncRequestFactory().post(reverse("reviews:review_stream"), self.form)
+        request.user = AnonymousUser()
+        response = await views.review_stream_async(request)
+        body = "".join([chunk.decode() async for chunk in response.streaming_content])
+        await aclose_clients()
+        events = sse_events(body)
+        self.assertEqual(events[-1][0], "done")
+        self.assertGreater(len(events), 1)
+        review = await Review.objects.select_related("submission").aget()
+        self.assertEqual(review.submission.title, "snippet")
+
+
+@override_settings(HISTORY_PAGE_SIZE=3)
+class HistoryTests(TestCase):
+    def setUp(self):
+        # Pairs of submissions share a timestamp, so the id breaks the tie
+        base = timezone.now() - timedelta(days=1)
+        for i in range(8):
+            submission = Submission.objects.create(title=f"s{i}", code="")
+            Submission.objects.filter(id=submission.id).update(
+                created_at=base + timedelta(minutes=i // 2)
+            )
+            for score in range(i % 3):
+                Review.objects.create(
+                    submission=submission, processed=score == 0, quality_score=score + 5
+                )
+        self.expected = list(
+            Submission.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+    def page(self, cursor=None):
+        params = {"before": cursor} if cursor else {}
+        with CaptureQueriesContext(connection) as queries:
+            context = self.client.get(reverse("reviews:history"), params).context
+        return context["subs"], context["next_cursor"], len(queries)
+
+    def test_pages_follow_the_keyset_without_gaps_or_repeats(self):
+        seen, cursor, query_counts = [], None, set()
+        while True:
+            subs, cursor, queries = self.page(cursor)
+            seen.extend(s.id for s in subs)
+            query_counts.add(queries)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(query_counts), 1)
+
+    def test_next_cursor_is_stable_when_newer_rows_arrive(self):
+        _, cursor, _ = self.page()
+        second, next_cursor, _ = self.page(cursor)
+        Submission.objects.create(title="newer", code="")
+        again, same_cursor, _ = self.page(cursor)
+        self.assertEqual([s.id for s in again], [s.id for s in second])
+        self.assertEqual([s.id for s in again], self.expected[3:6])
+        self.assertEqual(same_cursor, next_cursor)
+        # A malformed cursor shows the first page
+        self.assertEqual(self.page("not a cursor")[0][0].title, "newer")
+
+    def test_rows_carry_review_counts_and_scores(self):
+        subs = {s.title: s for s in self.page()[0] + self.page(self.page()[1])[0]}
+        self.assertEqual((subs["s5"].review_count, subs["s5"].failed_count), (2, 1))
+        self.assertEqual(subs["s5"].avg_score, 5.5)
+        self.assertEqual((subs["s3"].review_count, subs["s3"].avg_score), (0, None))
+
+
+class IssueApiTests(TestCase):
+    def setUp(self):
+        self.repo = Submission.objects.create(
+            title="repo", code="", repo_key="https://github.com/acme/app@main"
+        )
+        self.paste = Submission.objects.create(title="paste", code="")
+        self.reviews = [
+            self.add_review(
+                self.repo,
+                "app/auth.py",
+                [
+                    {"line": "12-14", "severity": "HIGH", "type": "Security", "message": "a"},
+                    {"line": 3, "severity": "low", "type": "style", "message": "b"},
+                    "A free-text issue is skipped",
+                ],
+            ),
+            self.add_review(
+                self.repo, "docs/readme.md", [{"severity": "low", "type": "style"}]
+            ),
+            self.add_review(
+                self.paste, "", [{"line": "L7", "severity": "high", "type": "bug"}]
+            ),
+        ]
+        record_reviews(self.reviews)
+
+    def add_review(self, submission, file_path, issues):
+        return Review.objects.create(
+            submission=submission, file_path=file_path, issues=issues, processed=True
+        )
+
+    def api(self, **params):
+        response = self.client.get(reverse("reviews:issue_api"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def rows(self, **params):
+        return sorted(
+            (i["file_path"], i["severity"], i["type"], i["line"])
+            for i in self.api(**params)["issues"]
+        )
+
+    def test_issues_are_filtered(self):
+        self.assertEqual(len(self.api()["issues"]), 4)
+        self.assertEqual(
+            self.rows(severity="High"),
+            [("", "high", "bug", 7), ("app/auth.py", "high", "security", 12)],
+        )
+        self.assertEqual(
+            self.rows(type="style", file="app/"), [("app/auth.py", "low", "style", 3)]
+        )
+        self.assertEqual(len(self.api(submission=self.paste.id)["issues"]), 1)
+        self.assertEqual(len(self.api(repo="https://github.com/ACME/app/")["issues"]), 3)
+        self.assertEqual(self.api(repo="https://github.com/acme/other")["issues"], [])
+
+        Issue.objects.filter(review=self.reviews[0]).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        self.assertEqual(len(self.api(since=7)["issues"]), 2)
+
+    def test_counts_are_grouped(self):
+        self.assertEqual(
+            self.api(group="severity")["counts"],
+            [{"severity": "high", "count": 2}, {"severity": "low", "count": 2}],
+        )
+        self.assertEqual(
+            self.api(group="type", severity="low")["counts"], [{"type": "style", "count": 2}]
+        )
+        response = self.client.get(reverse("reviews:issue_api"), {"group": "message"})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(ISSUES_PAGE_SIZE=3)
+    def test_pages_follow_the_cursor(self):
+        first = self.api()
+        second = self.api(before=first["next"])
+        self.assertIsNone(second["next"])
+        ids = [i["id"] for i in first["issues"] + second["issues"]]
+        self.assertEqual(sorted(ids), sorted(Issue.objects.values_list("id", flat=True)))
+
+    def test_backfill_extracts_stored_reviews_once(self):
+        Issue.objects.all().delete()
+        out = io.StringIO()
+        call_command("backfill_findings", submissions=[self.repo.id], stdout=out)
+        self.assertIn("2 review(s)", out.getvalue())
+        self.assertEqual(Issue.objects.count(), 3)
+        call_command("backfill_findings", stdout=io.StringIO())
+        call_command("backfill_findings", stdout=io.StringIO())
+        self.assertEqual(Issue.objects.count(), 4)
+        issue = Issue.objects.get(review=self.reviews[0], position=0)
+        self.assertEqual((issue.line, issue.severity, issue.type), (12, "high", "security"))
+
+
+class AsyncViewTests(StubLLMTestCase):
+    async def test_async_submit_and_status(self):
+        factory = AsyncRequestFactory()
+        request = factory.post(
+            reverse("reviews:index"),
+            {"title": "snippet", "language": "python", "code": "print('hi')\n"},
+        )
+        request.user = AnonymousUser()
+        response = await views.index_async(request)
+        await aclose_clients()
+        self.assertEqual(response.status_code, 302)
+
+        review = await Review.objects.alatest("id")
+        self.assertTrue(review.processed)
+        self.assertEqual(review.llm_calls, 1)
+        status = await views.project_status_async(factory.get("/"), review.submission_id)
+        self.assertEqual(json.loads(status.content)["reviews"], 1)
+
+
+class FailingLLMTests(StubLLMTestCase):
+    stub_config = StubConfig(error_rate=1.0)
+
+    def test_llm_errors_become_failed_reviews(self):
+        submission = self.submit_zip({"a.py": "x = 1\n", "b.py": "y = 2\n"})
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        self.assertEqual(submission.reviews.filter(processed=False).count(), 2)
+        self.assertEqual(submission.rollup.failed_count, 2)
+        self.assertEqual(rollups.failed_files(submission), ["a.py", "b.py"])
+        page = self.client.get(reverse("reviews:project_detail", args=[submission.id]))
+        self.assertContains(page, "Files that could not be reviewed (2)")
+
+
+
+class ConcurrentWriteTests(SimpleTestCase):
+    """Two threads running read-then-write transactions on one SQLite file."""
+
+    alias = "concurrent_writes"
+    # Resolved in setUpClass, once the alias below exists
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # A throwaway file database next to the test database
+        cls.directory = tempfile.mkdtemp()
+        connections.settings[cls.alias] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(cls.directory, "db.sqlite3"),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.alias].close()
+        del connections[cls.alias]
+        del connections.settings[cls.alias]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("CREATE TABLE counter (id INTEGER PRIMARY KEY, n INTEGER)")
+            cursor.execute("INSERT INTO counter VALUES (1, 0)")
+
+    def increment(self, times, errors):
+        connection = connections[self.alias]
+        try:
+            for _ in range(times):
+                with transaction.atomic(using=self.alias), connection.cursor() as cursor:
+                    cursor.execute("SELECT n FROM counter WHERE id = 1")
+                    (n,) = cursor.fetchone()
+                    time.sleep(0.001)
+                    cursor.execute("UPDATE counter SET n = %s WHERE id = 1", [n + 1])
+        except OperationalError as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_read_then_write_transactions_wait_for_each_other(self):
+        self.assertEqual(
+            connections[self.alias].settings_dict["OPTIONS"]["transaction_mode"], "IMMEDIATE"
+        )
+        errors = []
+        threads = [
+            threading.Thread(target=self.increment, args=(50, errors)) for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("SELECT n FROM counter WHERE id = 1")
+            self.assertEqual(cursor.fetchone(), (100,))
+
+
+class RouterTests(TestCase):
+    """A slow or failing OpenAI stub next to a fast Anthropic stub."""
+
+    def start_providers(self, openai_config):
+        openai = StubLLMServer(config=openai_config).start()
+        anthropic = StubLLMServer().start()
+        self.addCleanup(openai.stop)
+        self.addCleanup(anthropic.stop)
+        routing = override_settings(
+            LLM_PROVIDER="openai",
+            LLM_PROVIDERS=["openai", "anthropic"],
+            OPENAI_API_URL=openai.openai_url,
+            OPENAI_API_KEY="stub",
+            ANTHROPIC_API_URL=anthropic.anthropic_url,
+            ANTHROPIC_API_KEY="stub",
+            LLM_MAX_RETRIES=0,
+            LLM_HEALTH_MIN_SAMPLES=1,
+            LLM_HEDGE_MIN_DELAY=0.05,
+        )
+        routing.enable()
+        self.addCleanup(routing.disable)
+        router.reset()
+        self.addCleanup(router.reset)
+        return openai, anthropic
+
+    def test_percentile_is_nearest_rank(self):
+        self.assertEqual(router.percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(router.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(router.percentile(range(1, 101), 99), 99)
+        self.assertEqual(router.percentile([7], 99), 7)
+
+    def test_failing_provider_fails_over(self):
+        self.start_providers(StubConfig(error_rate=1.0))
+        response = router.route("review this")
+        self.assertEqual(response.provider, "anthropic")
+        self.assertEqual(router.health_snapshot()["openai"]["error_rate"], 1.0)
+        # openai is now cooling down, so the next call goes straight to anthropic
+        self.assertEqual(router.ranked_providers(), ["anthropic"])
+
+    def test_slow_call_is_hedged_to_the_other_provider(self):
+        self.start_providers(StubConfig(latency=2.0))
+        router.get_health("openai").record(True, 0.01)
+        won = LLM_HEDGES.value("anthropic", "won")
+        started = time.monotonic()
+        response = router.route("review this")
+        self.assertEqual(response.provider, "anthropic")
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(LLM_HEDGES.value("anthropic", "won"), won + 1)
+
+    def test_deadline_bounds_the_call(self):
+        self.start_providers(StubConfig(latency=2.0))
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            router.route("review this", deadline=time.monotonic() + 0.2)
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_failover_answer_is_cached_under_the_answering_provider(self):
+        openai, anthropic = self.start_providers(StubConfig(error_rate=1.0))
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        caching = override_settings(REVIEW_CACHE_ENABLED=True, MEDIA_ROOT=media_root)
+        caching.enable()
+        self.addCleanup(caching.disable)
+
+        def review_zip():
+            response = self.client.post(
+                reverse("reviews:index"),
+                {
+                    "title": "project",
+                    "language": "python",
+                    "code": "",
+                    "upload": make_zip({"a.py": "x = 1\n"}),
+                },
+            )
+            self.assertEqual(response.status_code, 302)
+            while jobs.drain(max_workers=2):
+                pass
+            return Submission.objects.latest("id").reviews.get()
+
+        review = review_zip()
+        self.assertTrue(review.processed)
+        self.assertEqual(review.llm_provider, "anthropic")
+        entry = ReviewCacheEntry.objects.get()
+        self.assertEqual(
+            (entry.provider, entry.llm_model), ("anthropic", settings.ANTHROPIC_DEFAULT_MODEL)
+        )
+        # The same file again is answered from the fallback's entry
+        calls = openai.counts["requests"] + anthropic.counts["requests"]
+        self.assertTrue(review_zip().processed)
+        self.assertEqual(openai.counts["requests"] + anthropic.counts["requests"], calls)
+        self.assertEqual(ReviewCacheEntry.objects.get().hits, 1)
+
+    async def test_async_hedge_cancels_the_slow_call(self):
+        self.start_providers(StubConfig(latency=2.0))
+        router.get_health("openai").record(True, 0.01)
+        cancelled = LLM_REQUESTS.value("openai", "gpt-4o-mini", "cancelled")
+        started = time.monotonic()
+        response = await router.aroute("review this")
+        await aclose_clients()
+        self.assertEqual(response.provider, "anthropic")
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(
+            LLM_REQUESTS.value("openai", "gpt-4o-mini", "cancelled"), cancelled + 1
+        )
+
+    async def test_async_deadline_is_counted_as_a_timeout(self):
+        self.start_providers(StubConfig(latency=2.0))
+        before = {
+            outcome: LLM_REQUESTS.value("openai", "gpt-4o-mini", outcome)
+            for outcome in ("timeout", "cancelled")
+        }
+        with self.assertRaises(DeadlineExceeded):
+            await acall_llm("review this", "openai", deadline=time.monotonic() + 0.2)
+        await aclose_clients()
+        self.assertEqual(
+            LLM_REQUESTS.value("openai", "gpt-4o-mini", "timeout"), before["timeout"] + 1
+        )
+        self.assertEqual(
+            LLM_REQUESTS.value("openai", "gpt-4o-mini", "cancelled"), before["cancelled"]
+        )
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping only moves monotonic() forward."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RetryTests(SimpleTestCase):
+    """llm_client._send against a stub answering every request with an error."""
+
+    def start(self, config, **overrides):
+        stub = StubLLMServer(config=config).start()
+        self.addCleanup(stub.stop)
+        retrying = override_settings(
+            OPENAI_API_URL=stub.openai_url,
+            OPENAI_API_KEY="stub",
+            LLM_MAX_RETRIES=2,
+            LLM_RETRY_BACKOFF=1.0,
+            LLM_RETRY_MAX_DELAY=30,
+            **overrides,
+        )
+        retrying.enable()
+        self.addCleanup(retrying.disable)
+        self.clock = FakeClock()
+        clock = mock.patch.object(llm_client, "time", self.clock)
+        clock.start()
+        self.addCleanup(clock.stop)
+        return stub
+
+    def assert_slots_released(self):
+        limiter = llm_client.get_limiter("openai")
+        taken = [limiter._slots.acquire(blocking=False) for _ in range(limiter.concurrency)]
+        for _ in range(sum(taken)):
+            limiter._slots.release()
+        self.assertTrue(all(taken))
+
+    def test_429_is_retried_after_the_retry_after_delay(self):
+        stub = self.start(StubConfig(error_rate=1.0, error_status=429, retry_after="7"))
+        with self.assertRaises(requests.HTTPError) as raised:
+            llm_client.call_openai_chat("review this")
+        self.assertEqual(raised.exception.response.status_code, 429)
+        self.assertEqual(stub.counts["requests"], 3)
+        self.assertEqual(self.clock.sleeps, [7.0, 7.0])
+        self.assert_slots_released()
+
+    def test_503_is_retried_with_capped_backoff(self):
+        stub = self.start(StubConfig(error_rate=1.0, error_status=503))
+        with mock.patch.object(llm_client.random, "uniform", side_effect=lambda a, b: b):
+            with self.assertRaises(requests.HTTPError):
+                llm_client.call_openai_chat("review this")
+        self.assertEqual(stub.counts["requests"], 3)
+        # Full jitter up to LLM_RETRY_BACKOFF * 2 ** attempt
+        self.assertEqual(self.clock.sleeps, [1.0, 2.0])
+        self.assert_slots_released()
+
+    def test_no_retry_is_started_past_the_deadline(self):
+        stub = self.start(StubConfig(error_rate=1.0, error_status=429, retry_after="5"))
+        with self.assertRaises(DeadlineExceeded):
+            llm_client.call_openai_chat("review this", deadline=self.clock.now + 3)
+        self.assertEqual(stub.counts["requests"], 1)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assert_slots_released()
+
+    def test_cancelled_call_stops_at_the_next_attempt(self):
+        stub = self.start(StubConfig(error_rate=1.0, error_status=503))
+        cancel = threading.Event()
+        # Another provider answers while this one is backing off
+        with mock.patch.object(cancel, "wait", side_effect=lambda delay: cancel.set()):
+            with self.assertRaises(Cancelled):
+                llm_client.call_openai_chat("review this", cancel=cancel)
+        self.assertEqual(stub.counts["requests"], 1)
+        self.assert_slots_released()
+
+
+class ProviderLimiterTests(SimpleTestCase):
+    def test_concurrent_calls_never_exceed_the_limit(self):
+        limiter = llm_client.ProviderLimiter(concurrency=3)
+        lock = threading.Lock()
+        in_flight, peak = [0], [0]
+
+        def call():
+            with limiter:
+                with lock:
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                time.sleep(0.02)
+                with lock:
+                    in_flight[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 3)
+
+    def test_requests_per_minute_delays_extra_calls(self):
+        clock = FakeClock()
+        limiter = llm_client.ProviderLimiter(concurrency=5, rpm=2)
+        with mock.patch.object(llm_client, "time", clock):
+            for _ in range(2):
+                with limiter:
+                    pass
+            self.assertEqual(clock.sleeps, [])
+            clock.now += 15
+            with limiter:
+                pass
+            # The window frees up 60 s after the first calls
+            self.assertEqual(clock.sleeps, [45.0])
+            for _ in range(2):
+                with limiter:
+                    pass
+            self.assertEqual(clock.sleeps, [45.0, 60.0])
+
+
+class MetricsServerTests(SimpleTestCase):
+    def test_worker_metrics_listen_on_localhost_by_default(self):
+        server = metrics.serve(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+        self.assertEqual(host, "127.0.0.1")
+        with urlopen(f"http://{host}:{port}/metrics") as response:
+            self.assertIn(b"llm_requests_total", response.read())
+
+
+class _GitHubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._archive(send_body=False)
+
+    def do_GET(self):
+        self._archive(send_body=True)
+
+    def _archive(self, send_body):
+        self.server.requests.append((self.command, self.path))
+        body = self.server.archives.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up on an archive over its size cap
+
+
+def start_github_stand_in(test):
+    """Serve archives from `server.archives` as GITHUB_URL for one test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GitHubHandler)
+    server.daemon_threads = True
+    server.archives, server.requests = {}, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    cache_dir = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+    host, port = server.server_address[:2]
+    stand_in = override_settings(
+        GITHUB_URL=f"http://{host}:{port}",
+        GITHUB_ARCHIVE_CACHE_DIR=cache_dir,
+        GITHUB_ARCHIVE_CACHE_MB=1,
+    )
+    stand_in.enable()
+    test.addCleanup(stand_in.disable)
+    return server
+
+
+def publish(server, repo, branch, files):
+    server.archives[f"/{repo}/archive/refs/heads/{branch}.zip"] = make_zip(
+        files
+    ).getvalue()
+
+
+class GitHubArchiveTests(TestCase):
+    """download_github_repo_zip against a local stand-in for github.com."""
+
+    def setUp(self):
+        self.server = start_github_stand_in(self)
+
+    def publish(self, repo, branch, files):
+        publish(self.server, repo, branch, files)
+
+    def download(self, url):
+        self.server.requests.clear()
+        with download_github_repo_zip(url) as archive:
+            files = dict(iter_zip_files(archive, per_file_limit=1000))
+        downloads = [path for method, path in self.server.requests if method == "GET"]
+        return files, downloads
+
+    def test_branches_are_probed_and_archives_revalidated(self):
+        self.publish("acme/app", "master", {"app.py": "x = 1"})
+        url = "https://github.com/acme/app/tree/dev"
+        files, downloads = self.download(url)
+        self.assertEqual(files, {"app.py": "x = 1"})
+        self.assertEqual(downloads, ["/acme/app/archive/refs/heads/master.zip"])
+        heads = {path for method, path in self.server.requests if method == "HEAD"}
+        self.assertEqual(len(heads), 3)
+
+        # Unchanged: answered from the disk cache after a 304
+        files, downloads = self.download(url)
+        self.assertEqual(files, {"app.py": "x = 1"})
+        self.assertEqual(downloads, [])
+
+        # Changed upstream: the new ETag misses and the archive is fetched again
+        self.publish("acme/app", "master", {"app.py": "x = 2"})
+        files, downloads = self.download(url)
+        self.assertEqual(files, {"app.py": "x = 2"})
+        self.assertEqual(len(downloads), 1)
+
+    def test_oversized_archive_is_not_downloaded_or_cached(self):
+        self.publish("acme/huge", "main", {"data.bin": os.urandom(2 * 1024 * 1024)})
+        with override_settings(MAX_FILE_UPLOAD_MB=1):
+            with self.assertRaisesMessage(ValueError, "too large"):
+                self.download("https://github.com/acme/huge")
+        self.assertIsNone(archive_cache.lookup("acme/huge", "main"))
+        self.assertEqual(os.listdir(settings.GITHUB_ARCHIVE_CACHE_DIR), [])
+
+    def test_least_recently_used_archives_are_evicted(self):
+        blob = os.urandom(400 * 1024)
+        for name in ("one", "two", "three"):
+            self.publish(f"acme/{name}", "main", {"data.bin": blob, "a.py": name})
+            self.download(f"https://github.com/acme/{name}")
+        self.assertIsNone(archive_cache.lookup("acme/one", "main"))
+        self.assertIsNotNone(archive_cache.lookup("acme/three", "main"))
+        with self.assertRaises(ValueError):
+            self.download("https://github.com/acme/missing")
+
+
+class IncrementalReviewTests(StubLLMTestCase):
+    url = "https://github.com/acme/app"
+
+    def setUp(self):
+        self.server = start_github_stand_in(self)
+
+    def submit_repo(self, files):
+        publish(self.server, "acme/app", "main", files)
+        response = self.client.post(
+            reverse("reviews:index"),
+            {"title": "app", "language": "python", "code": "", "repo_url": self.url},
+        )
+        self.assertEqual(response.status_code, 302)
+        while jobs.drain(max_workers=4):
+            pass
+        submission = Submission.objects.latest("id")
+        self.assertEqual(submission.status, Submission.STATUS_DONE)
+        return submission
+
+    def test_only_changed_and_failed_files_are_reviewed_again(self):
+        first = self.submit_repo(
+            {"a.py": "a = 1", "b.py": "b = 1", "c.py": "c = 1", "d.py": "d = 1"}
+        )
+        first.reviews.filter(file_path="c.py").update(
+            processed=False, processing_error="LLM timed out"
+        )
+        original = {r.file_path: r.id for r in first.reviews.all()}
+
+        before = self.stub.counts["requests"]
+        files = {"a.py": "a = 1", "b.py": "b = 2", "c.py": "c = 1", "e.py": "e = 1"}
+        second = self.submit_repo(files)
+        self.assertGreater(self.stub.counts["requests"], before)
+        self.assertEqual(second.previous_submission, first)
+        self.assertEqual(second.deleted_files, ["d.py"])
+        reviews = {r.file_path: r for r in second.reviews.all()}
+        self.assertEqual(sorted(reviews), ["a.py", "b.py", "c.py", "e.py"])
+        self.assertEqual(reviews["a.py"].reused_from_id, original["a.py"])
+        for path in ("b.py", "c.py", "e.py"):
+            self.assertIsNone(reviews[path].reused_from_id)
+            self.assertTrue(reviews[path].processed)
+        self.assertEqual(second.rollup.reused_count, 1)
+
+        # Carried-over reviews point at the review that was actually run
+        before = self.stub.counts["requests"]
+        third = self.submit_repo(files)
+        self.assertEqual(self.stub.counts["requests"], before)
+        self.assertEqual(third.deleted_files, [])
+        self.assertEqual(
+            third.reviews.get(file_path="a.py").reused_from_id, original["a.py"]
+        )
+        self.assertEqual(
+            third.reviews.get(file_path="b.py").reused_from_id, reviews["b.py"].id
+        )
@@ -1,11 +1,42 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = "reviews"
 
+# Under ASGI the async views await the LLM without holding a thread
+if settings.REVIEW_ASYNC_VIEWS:
+    index_view = views.index_async
+    stream_view = views.review_stream_async
+    status_view = views.project_status_async
+else:
+    index_view, stream_view, status_view = (
+        views.index, views.review_stream, views.project_status
+    )
+
 urlpatterns = [
-    path("", views.index, name="index"),
+    path("", index_view, name="index"),
+    path("review/stream/", stream_view, name="review_stream"),
     path("detail/<int:pk>/", views.detail, name="detail"),
+    path("detail/<int:pk>/raw/", views.review_raw, name="review_raw"),
+    path("detail/<int:pk>/source/", views.review_source, name="review_source"),
+    path("detail/<int:pk>/diff/<int:index>/", views.review_diff, name="review_diff"),
+    path("source/<str:digest>/", views.source_blob, name="source_blob"),
     path("project/<int:submission_id>/", views.project_detail, name="project_detail"),
+    path(
+        "project/<int:submission_id>/status/",
+        status_view,
+        name="project_status",
+    ),
+    path(
+        "project/<int:submission_id>/tree/",
+        views.project_tree,
+        name="project_tree",
+    ),
     path("history/", views.history, name="history"),
+    path("issues/", views.issue_list, name="issues"),
+    path("search/", views.search_reviews, name="search"),
+    path("metrics", views.metrics, name="metrics"),
+    path("api/issues/", views.issue_api, name="issue_api"),
+    path("api/reviews/export/", views.export_reviews, name="export_reviews"),
 ]
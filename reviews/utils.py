@@ -1,14 +1,141 @@
 from diff_match_patch import diff_match_patch
-from difflib import unified_diff
+
+# diff_match_patch operations, also used for line diffs below
+DELETE, EQUAL, INSERT = (
+    diff_match_patch.DIFF_DELETE,
+    diff_match_patch.DIFF_EQUAL,
+    diff_match_patch.DIFF_INSERT,
+)
+
 
 def create_diff(original: str, suggested: str) -> str:
     dmp = diff_match_patch()
     diffs = dmp.diff_main(original, suggested)
     dmp.diff_cleanupSemantic(diffs)
-    patch = dmp.patch_toText(dmp.patch_make(original, suggested))
+    # Build the patch from the diff above instead of diffing a second time
+    patch = dmp.patch_toText(dmp.patch_make(original, diffs))
     return patch
 
-def unified_diff_text(orig_text: str, new_text: str, filename="file"):
-    orig_lines = orig_text.splitlines()
-    new_lines = new_text.splitlines()
-    return "\n".join(unified_diff(orig_lines, new_lines, fromfile=filename, tofile=filename + ".suggested", lineterm=""))
+
+def line_diff(orig_lines, new_lines):
+    """
+    [(op, [lines])] turning orig_lines into new_lines, op being DELETE,
+    EQUAL or INSERT. Common leading and trailing lines are cut off first
+    and only the changed middle is diffed, one character per distinct
+    line, so a small edit in a long file costs little more than a scan.
+    """
+    size = min(len(orig_lines), len(new_lines))
+    start = 0
+    while start < size and orig_lines[start] == new_lines[start]:
+        start += 1
+    end = 0
+    while end < size - start and orig_lines[-1 - end] == new_lines[-1 - end]:
+        end += 1
+    orig_mid = orig_lines[start:len(orig_lines) - end]
+    new_mid = new_lines[start:len(new_lines) - end]
+
+    ops = []
+    if start:
+        ops.append((EQUAL, orig_lines[:start]))
+    if orig_mid and new_mid:
+        dmp = diff_match_patch()
+        text1 = "".join(line + "\n" for line in orig_mid)
+        text2 = "".join(line + "\n" for line in new_mid)
+        chars1, chars2, line_array = dmp.diff_linesToChars(text1, text2)
+        diffs = dmp.diff_main(chars1, chars2, False)
+        dmp.diff_charsToLines(diffs, line_array)
+        # Every line ends with "\n", so the last split item is always empty
+        ops.extend((op, text.split("\n")[:-1]) for op, text in diffs)
+    elif orig_mid:
+        ops.append((DELETE, orig_mid))
+    elif new_mid:
+        ops.append((INSERT, new_mid))
+    if end:
+        ops.append((EQUAL, orig_lines[len(orig_lines) - end:]))
+    return ops
+
+
+def refine_line(old: str, new: str, timeout: float = 0.1):
+    """
+    Character-level diff of one changed line, as two lists of
+    (changed, text) segments for the old and the new line.
+    """
+    dmp = diff_match_patch()
+    dmp.Diff_Timeout = timeout
+    diffs = dmp.diff_main(old, new)
+    dmp.diff_cleanupSemantic(diffs)
+    old_parts = [(op == DELETE, text) for op, text in diffs if op != INSERT]
+    new_parts = [(op == INSERT, text) for op, text in diffs if op != DELETE]
+    return old_parts, new_parts
+
+
+def diff_hunks(ops, context: int = 3):
+    """
+    Group line_diff() output into unified-diff hunks: a list of
+    {"old_start", "old_len", "new_start", "new_len", "lines"} where lines
+    are (op, old line number, new line number, text), numbers 1-based and
+    None on the side a line does not exist.
+    """
+    numbered = []
+    cursors = []  # lines passed on each side before numbered[i]
+    old_no = new_no = 0
+    for op, lines in ops:
+        for text in lines:
+            cursors.append((old_no, new_no))
+            if op != INSERT:
+                old_no += 1
+            if op != DELETE:
+                new_no += 1
+            numbered.append(
+                (op, old_no if op != INSERT else None, new_no if op != DELETE else None, text)
+            )
+
+    changed = [i for i, line in enumerate(numbered) if line[0] != EQUAL]
+    hunks = []
+    i = 0
+    while i < len(changed):
+        first = last = changed[i]
+        # Changes closer than 2 * context lines share a hunk
+        while i + 1 < len(changed) and changed[i + 1] - last <= 2 * context + 1:
+            i += 1
+            last = changed[i]
+        i += 1
+        begin = max(0, first - context)
+        lines = numbered[begin:last + context + 1]
+        old_len = sum(1 for line in lines if line[1] is not None)
+        new_len = sum(1 for line in lines if line[2] is not None)
+        old_before, new_before = cursors[begin]
+        hunks.append(
+            {
+                # An empty range is numbered after the line before it
+                "old_start": old_before + 1 if old_len else old_before,
+                "old_len": old_len,
+                "new_start": new_before + 1 if new_len else new_before,
+                "new_len": new_len,
+                "lines": lines,
+            }
+        )
+    return hunks
+
+
+def hunk_header(hunk) -> str:
+    return (
+        f"@@ -{hunk['old_start']},{hunk['old_len']} "
+        f"+{hunk['new_start']},{hunk['new_len']} @@"
+    )
+
+
+def format_unified(hunks, filename="file") -> str:
+    if not hunks:
+        return ""
+    out = [f"--- {filename}", f"+++ {filename}.suggested"]
+    prefix = {DELETE: "-", EQUAL: " ", INSERT: "+"}
+    for hunk in hunks:
+        out.append(hunk_header(hunk))
+        out.extend(prefix[op] + text for op, _, _, text in hunk["lines"])
+    return "\n".join(out)
+
+
+def unified_diff_text(orig_text: str, new_text: str, filename="file", context=3):
+    ops = line_diff(orig_text.splitlines(), new_text.splitlines())
+    return format_unified(diff_hunks(ops, context), filename)
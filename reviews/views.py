@@ -1,95 +1,58 @@
 # reviews/views.py
+import base64
 import json
-import re
 import imghdr
-import zipfile
-import io
+from urllib.parse import quote
+from datetime import datetime, timedelta
 
-import requests
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Avg, Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_POST
 
 from .forms import SubmissionForm
-from .models import Submission, Review
+from .models import Issue, Review, SourceBlob, Submission
+from .ingest import ALLOWED_CODE_EXT, parse_github_url
+from .jobs import asubmission_progress, submission_progress
+from . import blobs, diffs, export, highlight, raw_store, rollups, search
+from .derived import record_reviews
+from .pipeline import areview_code, parse_llm_output, review_code, review_fields
 from .prompts import build_review_prompt
-from .llm_client import call_llm
+from .llm_async import astream_llm
+from .llm_client import stream_llm
+from .metrics import render as render_metrics, timer
 
-ALLOWED_CODE_EXT = (".py", ".js", ".java", ".txt", ".md")
 
-
-def _iter_zip_bytes(zip_bytes: bytes, per_file_limit: int):
-    """
-    Yield (file_path, text) for each code file inside a ZIP archive given as bytes.
-    Only includes ALLOWED_CODE_EXT extensions.
-    """
-    zf = zipfile.ZipFile(io.BytesIO(zip_bytes))
-    for info in zf.infolist():
-        if info.is_dir():
-            continue
-        name = info.filename
-        if not any(name.lower().endswith(ext) for ext in ALLOWED_CODE_EXT):
-            continue
-        try:
-            file_bytes = zf.read(info)
-            text = file_bytes.decode("utf-8", errors="ignore")
-        except Exception:
-            continue
-        text = text.strip()
-        if not text:
-            continue
-        if len(text) > per_file_limit:
-            text = text[:per_file_limit]
-        yield name, text
-
-
-def _download_github_repo_zip(repo_url: str) -> bytes:
-    """
-    Given a GitHub repo URL, download its ZIP (main/master or specific branch).
-    Supports:
-      - https://github.com/user/repo
-      - https://github.com/user/repo/
-      - https://github.com/user/repo.git
-      - https://github.com/user/repo/tree/branch
-    """
-    url = repo_url.strip()
-    if not url.startswith("http"):
-        raise ValueError("Please enter a full GitHub URL starting with https://")
-    if "github.com" not in url:
-        raise ValueError("Only GitHub URLs from github.com are supported.")
-
-    # strip .git if present
-    if url.endswith(".git"):
-        url = url[:-4]
-
-    branch = "main"
-    if "/tree/" in url:
-        base, _, branch_part = url.partition("/tree/")
-        base_url = base
-        branch = branch_part.strip("/").split("/")[0] or "main"
-    else:
-        base_url = url
-
-    def build_zip_url(br: str) -> str:
-        return base_url.rstrip("/") + f"/archive/refs/heads/{br}.zip"
-
-    try_order = [branch, "main", "master"]
-    last_status = None
-
-    for br in try_order:
-        zip_url = build_zip_url(br)
-        resp = requests.get(zip_url, timeout=60)
-        last_status = resp.status_code
-        if resp.status_code == 200:
-            return resp.content
-
-    raise ValueError(
-        f"Could not download ZIP from GitHub. Last HTTP status: {last_status}."
+def _form_page(request, form):
+    return render(
+        request,
+        "reviews/index.html",
+        {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
     )
 
 
-def index(request):
+def _accept_submission(request):
+    """
+    Front half of the submit form, shared by index and index_async:
+    validates input, creates the Submission and queues ZIP / GitHub
+    projects for the worker. Returns an HttpResponse when the request is
+    handled, or (form, submission, code, language) for pasted / single-file
+    code that still needs its LLM review.
+    """
     form = SubmissionForm(request.POST or None, request.FILES or None)
 
     if request.method == "POST" and form.is_valid():
@@ -131,9 +94,10 @@ def index(request):
         )
 
         # ===================== CASE 1: GITHUB REPO URL =====================
+        # Download + per-file reviews happen in the background worker.
         if repo_url:
             try:
-                zip_bytes = _download_github_repo_zip(repo_url)
+                base_url, branch = parse_github_url(repo_url)
             except ValueError as e:
                 submission.delete()
                 messages.error(request, str(e))
@@ -143,92 +107,13 @@ def index(request):
                     {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
                 )
 
-            if len(zip_bytes) > settings.MAX_FILE_UPLOAD_MB * 1024 * 1024:
-                submission.delete()
-                messages.error(
-                    request,
-                    f"Downloaded repo ZIP is too large (max {settings.MAX_FILE_UPLOAD_MB} MB).",
-                )
-                return render(
-                    request,
-                    "reviews/index.html",
-                    {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
-                )
-
-            files = list(
-                _iter_zip_bytes(zip_bytes, per_file_limit=settings.MAX_CODE_CHARS)
-            )
-            if not files:
-                submission.delete()
-                messages.error(
-                    request,
-                    "No readable .py/.js/.java/.txt/.md files found in the GitHub repository.",
-                )
-                return render(
-                    request,
-                    "reviews/index.html",
-                    {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
-                )
-
-            created_reviews = []
-
-            for file_path, file_code in files:
-                combined_code = base_code.strip()
-                if combined_code:
-                    combined_code += "\n\n"
-                combined_code += f"# FILE: {file_path}\n{file_code}"
-
-                if len(combined_code) > settings.MAX_CODE_CHARS:
-                    combined_code = combined_code[: settings.MAX_CODE_CHARS]
-
-                prompt = build_review_prompt(combined_code, language)
-                try:
-                    raw = call_llm(prompt)
-                except Exception as e:
-                    Review.objects.create(
-                        submission=submission,
-                        file_path=file_path,
-                        summary="Error calling LLM for this file.",
-                        processing_error=str(e),
-                        processed=False,
-                        raw_response={"raw": str(e)},
-                    )
-                    continue
-
-                try:
-                    parsed = json.loads(raw)
-                except Exception:
-                    m = re.search(r"\{.*\}", raw, re.S)
-                    if m:
-                        try:
-                            parsed = json.loads(m.group(0))
-                        except Exception:
-                            parsed = {"raw": raw}
-                    else:
-                        parsed = {"raw": raw}
-
-                review = Review.objects.create(
-                    submission=submission,
-                    file_path=file_path,
-                    summary=parsed.get("summary", "") if isinstance(parsed, dict) else "",
-                    issues=parsed.get("issues", []) if isinstance(parsed, dict) else [],
-                    suggestions=parsed.get("suggestions", [])
-                    if isinstance(parsed, dict)
-                    else [],
-                    tests_suggestions=parsed.get("tests_suggestions", "")
-                    if isinstance(parsed, dict)
-                    else "",
-                    quality_score=parsed.get("quality_score", None)
-                    if isinstance(parsed, dict)
-                    else None,
-                    raw_response={"raw": raw},
-                    processed=True,
-                )
-                created_reviews.append(review)
-
+            submission.repo_url = repo_url
+            submission.repo_key = f"{base_url.lower()}@{branch}"
+            submission.status = Submission.STATUS_QUEUED
+            submission.save(update_fields=["repo_url", "repo_key", "status"])
             messages.info(
                 request,
-                f"Created {len(created_reviews)} file-level reviews from GitHub repo.",
+                "GitHub repo queued for review. File reviews will appear below as they complete.",
             )
             return redirect(
                 reverse(
@@ -264,79 +149,12 @@ def index(request):
                     {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
                 )
 
-            zip_bytes = upload.read()
-            files = list(
-                _iter_zip_bytes(zip_bytes, per_file_limit=settings.MAX_CODE_CHARS)
-            )
-            if not files:
-                submission.delete()
-                messages.error(
-                    request,
-                    "No readable .py/.js/.java/.txt/.md files found inside ZIP.",
-                )
-                return render(
-                    request,
-                    "reviews/index.html",
-                    {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
-                )
-
-            created_reviews = []
-            for file_path, file_code in files:
-                combined_code = base_code.strip()
-                if combined_code:
-                    combined_code += "\n\n"
-                combined_code += f"# FILE: {file_path}\n{file_code}"
-                if len(combined_code) > settings.MAX_CODE_CHARS:
-                    combined_code = combined_code[: settings.MAX_CODE_CHARS]
-
-                prompt = build_review_prompt(combined_code, language)
-                try:
-                    raw = call_llm(prompt)
-                except Exception as e:
-                    Review.objects.create(
-                        submission=submission,
-                        file_path=file_path,
-                        summary="Error calling LLM for this file.",
-                        processing_error=str(e),
-                        processed=False,
-                        raw_response={"raw": str(e)},
-                    )
-                    continue
-
-                try:
-                    parsed = json.loads(raw)
-                except Exception:
-                    m = re.search(r"\{.*\}", raw, re.S)
-                    if m:
-                        try:
-                            parsed = json.loads(m.group(0))
-                        except Exception:
-                            parsed = {"raw": raw}
-                    else:
-                        parsed = {"raw": raw}
-
-                review = Review.objects.create(
-                    submission=submission,
-                    file_path=file_path,
-                    summary=parsed.get("summary", "") if isinstance(parsed, dict) else "",
-                    issues=parsed.get("issues", []) if isinstance(parsed, dict) else [],
-                    suggestions=parsed.get("suggestions", [])
-                    if isinstance(parsed, dict)
-                    else [],
-                    tests_suggestions=parsed.get("tests_suggestions", "")
-                    if isinstance(parsed, dict)
-                    else "",
-                    quality_score=parsed.get("quality_score", None)
-                    if isinstance(parsed, dict)
-                    else None,
-                    raw_response={"raw": raw},
-                    processed=True,
-                )
-                created_reviews.append(review)
-
+            submission.uploaded_file.save(upload.name, upload, save=False)
+            submission.status = Submission.STATUS_QUEUED
+            submission.save(update_fields=["uploaded_file", "status"])
             messages.info(
                 request,
-                f"Created {len(created_reviews)} file-level reviews from ZIP project.",
+                "ZIP project queued for review. File reviews will appear below as they complete.",
             )
             return redirect(
                 reverse(
@@ -393,7 +211,7 @@ def index(request):
                     {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
                 )
 
-            if len(code) + len(file_content) > settings.MAX_CODE_CHARS:
+            if len(code) + len(file_content) > settings.REVIEW_MAX_FILE_CHARS:
                 submission.delete()
                 messages.error(
                     request,
@@ -418,109 +236,594 @@ def index(request):
                 {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
             )
 
-        prompt = build_review_prompt(code, language)
-        try:
-            raw = call_llm(prompt)
-        except Exception as e:
-            submission.delete()
-            messages.error(request, f"LLM request failed: {e}")
-            return render(
-                request,
-                "reviews/index.html",
-                {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
-            )
+        return form, submission, code, language
 
-        try:
-            parsed = json.loads(raw)
-        except Exception:
-            m = re.search(r"\{.*\}", raw, re.S)
-            if m:
-                try:
-                    parsed = json.loads(m.group(0))
-                except Exception:
-                    parsed = {"raw": raw}
-            else:
-                parsed = {"raw": raw}
+    # GET
+    return _form_page(request, form)
+
+
+def _review_failed(request, form, submission, error):
+    submission.delete()
+    messages.error(request, f"LLM request failed: {error}")
+    return _form_page(request, form)
+
+
+def _store_review(submission, code, fields):
+    with timer("db_write"), transaction.atomic():
+        review = Review.objects.create(
+            submission=submission, source_id=blobs.put(code), **fields
+        )
+        record_reviews([review])
+    return review
+
+
+def index(request):
+    accepted = _accept_submission(request)
+    if isinstance(accepted, HttpResponse):
+        return accepted
+    form, submission, code, language = accepted
+    try:
+        fields = review_code(code, language)
+    except Exception as e:
+        return _review_failed(request, form, submission, e)
+    review = _store_review(submission, code, fields)
+    return redirect(reverse("reviews:detail", kwargs={"pk": review.id}))
+
+
+async def index_async(request):
+    """
+    index for ASGI deployments (REVIEW_ASYNC_VIEWS): pasted code is reviewed
+    on the async LLM client, so no thread waits on the round trip. Form
+    handling and database writes run through sync_to_async.
+    """
+    accepted = await sync_to_async(_accept_submission)(request)
+    if isinstance(accepted, HttpResponse):
+        return accepted
+    form, submission, code, language = accepted
+    try:
+        fields = await areview_code(code, language)
+    except Exception as e:
+        return await sync_to_async(_review_failed)(request, form, submission, e)
+    review = await sync_to_async(_store_review)(submission, code, fields)
+    return redirect(reverse("reviews:detail", kwargs={"pk": review.id}))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
+
+def _stream_input(request):
+    """Validated (title, language, code, user) for review_stream, or a 400 response."""
+    form = SubmissionForm(request.POST or None, request.FILES or None)
+    if not form.is_valid():
+        return JsonResponse({"error": "Invalid form."}, status=400)
+    code = form.cleaned_data["code"] or ""
+    if (
+        request.FILES
+        or form.cleaned_data.get("repo_url")
+        or not code.strip()
+        or len(code) > settings.MAX_CODE_CHARS
+    ):
+        return JsonResponse({"error": "Use the regular form submit."}, status=400)
+
+    title = form.cleaned_data["title"] or "Untitled review"
+    language = form.cleaned_data["language"]
+    user = request.user if request.user.is_authenticated else None
+    return title, language, code, user
+
+
+def _store_streamed_review(title, language, code, user, raw, usage, timings):
+    with timer("parse", timings):
+        fields = review_fields(parse_llm_output(raw))
+    with timer("db_write"), transaction.atomic():
+        submission = Submission.objects.create(
+            title=title, language=language, code=code, user=user
+        )
         review = Review.objects.create(
             submission=submission,
-            summary=parsed.get("summary", "") if isinstance(parsed, dict) else "",
-            issues=parsed.get("issues", []) if isinstance(parsed, dict) else [],
-            suggestions=parsed.get("suggestions", [])
-            if isinstance(parsed, dict)
-            else [],
-            tests_suggestions=parsed.get("tests_suggestions", "")
-            if isinstance(parsed, dict)
-            else "",
-            quality_score=parsed.get("quality_score", None)
-            if isinstance(parsed, dict)
-            else None,
+            **fields,
+            source_id=blobs.put(code),
+            llm_provider=usage.get("provider", ""),
+            llm_model=usage.get("model", "")[:100],
+            input_tokens=usage.get("input_tokens"),
+            output_tokens=usage.get("output_tokens"),
+            llm_latency_ms=round(usage.get("latency", 0) * 1000),
+            llm_calls=1,
             raw_response={"raw": raw},
             processed=True,
+            stage_timings=timings,
         )
+        record_reviews([review])
+    return _sse("done", {"url": reverse("reviews:detail", kwargs={"pk": review.id})})
 
-        return redirect(reverse("reviews:detail", kwargs={"pk": review.id}))
 
-    # GET
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_POST
+def review_stream(request):
+    """
+    Pasted-code review streamed to the browser as server-sent events:
+    "delta" events carry model output as it arrives, then a "done" event
+    with the URL of the stored Review (or an "error" event). Anything the
+    stream cannot handle (uploads, repos, code needing chunking) gets a 400
+    and the page falls back to the normal form post.
+    """
+    accepted = _stream_input(request)
+    if isinstance(accepted, HttpResponse):
+        return accepted
+    title, language, code, user = accepted
+
+    def events():
+        # Flush headers right away so the browser sees the first byte
+        yield ": stream open\n\n"
+        parts, usage, timings = [], {}, {}
+        try:
+            with timer("llm", timings):
+                for text in stream_llm(build_review_prompt(code, language), usage=usage):
+                    parts.append(text)
+                    yield _sse("delta", {"text": text})
+        except Exception as e:
+            yield _sse("error", {"message": f"LLM request failed: {e}"})
+            return
+        yield _store_streamed_review(
+            title, language, code, user, "".join(parts), usage, timings
+        )
+
+    return _event_stream(events())
+
+
+async def review_stream_async(request):
+    """review_stream on the async LLM client, for ASGI deployments."""
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    accepted = await sync_to_async(_stream_input)(request)
+    if isinstance(accepted, HttpResponse):
+        return accepted
+    title, language, code, user = accepted
+
+    async def events():
+        yield ": stream open\n\n"
+        parts, usage, timings = [], {}, {}
+        try:
+            with timer("llm", timings):
+                async for text in astream_llm(
+                    build_review_prompt(code, language), usage=usage
+                ):
+                    parts.append(text)
+                    yield _sse("delta", {"text": text})
+        except Exception as e:
+            yield _sse("error", {"message": f"LLM request failed: {e}"})
+            return
+        yield await sync_to_async(_store_streamed_review)(
+            title, language, code, user, "".join(parts), usage, timings
+        )
+
+    return _event_stream(events())
+
+
+def detail(request, pk):
+    review = get_object_or_404(Review.objects.select_related("submission"), id=pk)
+    language = review.submission.language
+    # Highlighted on the server (and cached), not in the browser
+    for suggestion in review.suggestions or []:
+        if isinstance(suggestion, dict) and suggestion.get("patch"):
+            suggestion["patch_html"] = highlight.render(
+                str(suggestion["patch"]), language, review.file_path
+            )
+    # Source and raw response are fetched only if the user opens them
     return render(
         request,
-        "reviews/index.html",
-        {"form": form, "max_file_mb": settings.MAX_FILE_UPLOAD_MB},
+        "reviews/result.html",
+        {"review": review, "raw_size": raw_store.size(review.id)},
     )
 
 
-def detail(request, pk):
-    review = get_object_or_404(Review, id=pk)
+def review_raw(request, pk):
+    """
+    Raw LLM output of one review as (pretty-printed) text, or as a
+    highlighted HTML fragment with ?highlight=1.
+    """
+    review = get_object_or_404(Review.objects.only("id"), id=pk)
     raw_text = ""
     if review.raw_response:
         raw_text = review.raw_response.get("raw", "")
     pretty_raw = raw_text
+    is_json = False
     try:
         parsed = json.loads(raw_text) if isinstance(raw_text, str) else None
         if parsed:
             pretty_raw = json.dumps(parsed, indent=2)
+            is_json = True
     except Exception:
         pass
+    if request.GET.get("highlight"):
+        return HttpResponse(highlight.render(pretty_raw, "json" if is_json else "text"))
+    return HttpResponse(pretty_raw, content_type="text/plain; charset=utf-8")
+
+
+def review_source(request, pk):
+    """The reviewed source of one review as a highlighted HTML fragment."""
+    review = get_object_or_404(
+        Review.objects.select_related("submission").only(
+            "id", "file_path", "source_id", "submission__language"
+        ),
+        id=pk,
+    )
+    if not review.source_id:
+        raise Http404("No source stored for this review.")
+    html = highlight.render(
+        blobs.read(review.source_id),
+        review.submission.language,
+        review.file_path,
+        line_numbers=True,
+    )
+    return HttpResponse(html)
+
+
+def review_diff(request, pk, index):
+    """
+    One suggestion applied to the reviewed source, as a side-by-side HTML
+    fragment, or as a unified diff with ?format=unified.
+    """
+    review = get_object_or_404(
+        Review.objects.only("id", "file_path", "source_id", "suggestions"), id=pk
+    )
+    suggestions = review.suggestions if isinstance(review.suggestions, list) else []
+    if not review.source_id or not 0 <= index < len(suggestions):
+        raise Http404("No such suggestion diff.")
+    suggestion = suggestions[index]
+    if not isinstance(suggestion, dict):
+        raise Http404("No such suggestion diff.")
+    diff = diffs.suggestion_diff(review.source_id, suggestion, review.file_path)
+    if request.GET.get("format") == "unified":
+        return HttpResponse(diff["unified"], content_type="text/x-diff; charset=utf-8")
     return render(
         request,
-        "reviews/result.html",
-        {"review": review, "pretty_raw": pretty_raw},
+        "reviews/suggestion_diff.html",
+        {"diff": diff, "review": review, "index": index},
     )
-def project_detail(request, submission_id):
-    submission = get_object_or_404(Submission, id=submission_id)
-    reviews_qs = submission.reviews.all().order_by("file_path", "created_at")
-
-    # Build simple "tree-like" list: each item has depth based on folder nesting
-    tree_items = []
-    for r in reviews_qs:
-        # If file_path is empty (single file review), give a friendly name
-        raw_path = r.file_path or "Full code"
-        # normalize
-        path = raw_path.strip("/")
-        depth = path.count("/")  # how deep in folders
-        file_name = path.split("/")[-1]
-        tree_items.append({
-            "review": r,
-            "path": path,
-            "file_name": file_name,
-            "depth": depth,
-        })
 
-    # Sort by path to group similar folders together
-    tree_items.sort(key=lambda n: n["path"])
 
+@cache_control(public=True, max_age=365 * 24 * 3600, immutable=True)
+@etag(lambda request, digest: f'"{digest}"')
+def source_blob(request, digest):
+    """A stored source file as text; content-addressed, so cacheable forever."""
+    try:
+        text = blobs.read(digest)
+    except SourceBlob.DoesNotExist:
+        raise Http404("Unknown source.")
+    return HttpResponse(text, content_type="text/plain; charset=utf-8")
+
+
+def project_detail(request, submission_id):
+    submission = get_object_or_404(
+        Submission.objects.select_related("rollup").defer("code"), id=submission_id
+    )
+    rollup = rollups.get_rollup(submission)
+    failed = rollups.failed_files(submission) if rollup.failed_count else []
+    # The file list itself is loaded folder by folder from project_tree
     return render(
         request,
         "reviews/project_detail.html",
         {
             "submission": submission,
-            "reviews": reviews_qs,
-            "tree_items": tree_items,
+            "rollup": rollup,
+            "failed_files": failed,
         },
     )
 
 
+def _tree_node_json(node):
+    avg = node.avg_score
+    item = {
+        "name": node.name,
+        "path": node.path,
+        "type": "dir" if node.is_dir else "file",
+        "file_count": node.file_count,
+        "failed_count": node.failed_count,
+        "issue_count": node.issue_count,
+        "avg_score": round(avg, 2) if avg is not None else None,
+    }
+    if not node.is_dir:
+        item["reused"] = node.reused
+        item["url"] = (
+            reverse("reviews:detail", kwargs={"pk": node.review_id})
+            if node.review_id
+            else None
+        )
+    return item
+
+
+def project_tree(request, submission_id):
+    """
+    One folder of a project's file tree as JSON: sub-folders first, then
+    files, each with totals over everything below it. `path` selects the
+    folder ("" for the top level); `offset` pages through big folders.
+    """
+    submission = get_object_or_404(Submission.objects.only("id"), id=submission_id)
+
+    path = request.GET.get("path", "").strip("/")
+    try:
+        offset = max(0, int(request.GET.get("offset", 0)))
+    except ValueError:
+        offset = 0
+    page_size = settings.TREE_PAGE_SIZE
+
+    nodes = list(
+        submission.tree_nodes.filter(parent=path).order_by("-is_dir", "name", "id")[
+            offset : offset + page_size + 1
+        ]
+    )
+    has_more = len(nodes) > page_size
+    return JsonResponse(
+        {
+            "path": path,
+            "nodes": [_tree_node_json(n) for n in nodes[:page_size]],
+            "next_offset": offset + page_size if has_more else None,
+        }
+    )
+
+
+def project_status(request, submission_id):
+    """JSON progress of a queued project review; polled by project_detail."""
+    submission = get_object_or_404(Submission, id=submission_id)
+    return JsonResponse(submission_progress(submission))
+
+
+async def project_status_async(request, submission_id):
+    """project_status on the async ORM, for ASGI deployments."""
+    submission = await Submission.objects.filter(id=submission_id).afirst()
+    if submission is None:
+        raise Http404("No Submission matches the given query.")
+    return JsonResponse(await asubmission_progress(submission))
+
+
+def _encode_cursor(row) -> str:
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token: str):
+    """(created_at, id) from a keyset cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created, _, pk = raw.partition("|")
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
 
 def history(request):
-    subs = Submission.objects.order_by("-created_at")[:50]
-    return render(request, "reviews/history.html", {"subs": subs})
+    """
+    Submissions newest first, keyset-paginated on (created_at, id) so deep
+    pages cost the same as the first. Per-submission review counts and the
+    average score come from correlated subqueries in the same query.
+    """
+    page_size = settings.HISTORY_PAGE_SIZE
+    subs = Submission.objects.order_by("-created_at", "-id")
+
+    username = request.GET.get("user", "").strip()
+    if username:
+        subs = subs.filter(user__username=username)
+
+    cursor = _decode_cursor(request.GET.get("before", ""))
+    if cursor:
+        created_at, pk = cursor
+        subs = subs.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    per_sub = Review.objects.filter(submission=OuterRef("pk")).order_by().values(
+        "submission"
+    )
+    subs = subs.annotate(
+        review_count=Coalesce(
+            Subquery(per_sub.annotate(n=Count("id")).values("n")), 0
+        ),
+        failed_count=Coalesce(
+            Subquery(
+                per_sub.filter(processed=False).annotate(n=Count("id")).values("n")
+            ),
+            0,
+        ),
+        avg_score=Subquery(per_sub.annotate(a=Avg("quality_score")).values("a")),
+    ).only("id", "title", "created_at", "status")
+
+    rows = list(subs[: page_size + 1])
+    next_cursor = _encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return render(
+        request,
+        "reviews/history.html",
+        {
+            "subs": rows[:page_size],
+            "next_cursor": next_cursor,
+            "is_first_page": cursor is None,
+            "filter_user": username,
+        },
+    )
+
+
+ISSUE_FILTERS = ("severity", "type", "submission", "repo", "file", "since")
+ISSUE_GROUPS = ("severity", "type", "file_path")
+
+
+def _filtered_issues(params):
+    """
+    Issue queryset for the query-string filters: severity, type, submission
+    id, repo (GitHub URL, any branch), file (path prefix) and since (days).
+    """
+    issues = Issue.objects.all()
+    if params.get("severity"):
+        issues = issues.filter(severity=params["severity"].strip().lower())
+    if params.get("type"):
+        issues = issues.filter(type=params["type"].strip().lower())
+    if params.get("submission", "").isdigit():
+        issues = issues.filter(submission_id=int(params["submission"]))
+    if params.get("repo"):
+        repo_key = params["repo"].strip().lower().rstrip("/")
+        issues = issues.filter(
+            submission__in=Submission.objects.filter(
+                repo_key__startswith=f"{repo_key}@"
+            ).values("id")
+        )
+    if params.get("file"):
+        issues = issues.filter(file_path__startswith=params["file"].strip())
+    if params.get("since", "").isdigit():
+        since = timezone.now() - timedelta(days=int(params["since"]))
+        issues = issues.filter(created_at__gte=since)
+    return issues
+
+
+def _issue_page(params):
+    """One keyset page of matching issues, newest first, and the next cursor."""
+    issues = _filtered_issues(params).order_by("-created_at", "-id")
+    cursor = _decode_cursor(params.get("before", ""))
+    if cursor:
+        created_at, pk = cursor
+        issues = issues.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    page_size = settings.ISSUES_PAGE_SIZE
+    rows = list(
+        issues.only(
+            "id", "review_id", "submission_id", "file_path", "created_at",
+            "line", "severity", "type", "message",
+        )[: page_size + 1]
+    )
+    next_cursor = _encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def _issue_counts(params, group):
+    return list(
+        _filtered_issues(params)
+        .values(group)
+        .annotate(count=Count("id"))
+        .order_by("-count", group)
+    )
+
+
+def issue_list(request):
+    """Filterable list of extracted issues, e.g. ?severity=high&type=security&since=7."""
+    group = request.GET.get("group", "type")
+    if group not in ISSUE_GROUPS:
+        group = "type"
+    issues, next_cursor = _issue_page(request.GET)
+    filters = {name: request.GET.get(name, "") for name in ISSUE_FILTERS}
+    query = "&".join(
+        f"{name}={quote(value)}" for name, value in filters.items() if value
+    )
+    return render(
+        request,
+        "reviews/issues.html",
+        {
+            "issues": issues,
+            "next_cursor": next_cursor,
+            "filters": filters,
+            "filter_query": query,
+            "group": group,
+            "counts": _issue_counts(request.GET, group),
+        },
+    )
+
+
+def issue_api(request):
+    """
+    JSON version of issue_list. With ?group=severity|type|file_path the
+    response holds per-group counts for the filters instead of issues.
+    """
+    group = request.GET.get("group")
+    if group:
+        if group not in ISSUE_GROUPS:
+            return JsonResponse(
+                {"error": f"group must be one of {', '.join(ISSUE_GROUPS)}"},
+                status=400,
+            )
+        return JsonResponse({"group": group, "counts": _issue_counts(request.GET, group)})
+
+    issues, next_cursor = _issue_page(request.GET)
+    return JsonResponse(
+        {
+            "issues": [
+                {
+                    "id": issue.id,
+                    "review_url": reverse("reviews:detail", kwargs={"pk": issue.review_id}),
+                    "submission": issue.submission_id,
+                    "file_path": issue.file_path,
+                    "line": issue.line,
+                    "severity": issue.severity,
+                    "type": issue.type,
+                    "message": issue.message,
+                    "created_at": issue.created_at.isoformat(),
+                }
+                for issue in issues
+            ],
+            "next": next_cursor,
+        }
+    )
+
+
+def export_reviews(request):
+    """
+    Stream the reviews of ?submission=<id> and/or those created between
+    ?since= and ?until= (ISO dates or datetimes) as ?format=ndjson|csv.
+    ?columns=a,b,c picks columns; raw_response and code are opt-in.
+    """
+    params = request.GET
+    fmt = params.get("format", "ndjson")
+    submission = params.get("submission", "")
+    try:
+        if fmt not in export.FORMATS:
+            raise ValueError(f"format must be one of {', '.join(export.FORMATS)}")
+        if submission and not submission.isdigit():
+            raise ValueError("submission must be an id")
+        columns = export.parse_columns(params.get("columns"))
+        since = export.parse_moment(params.get("since"))
+        until = export.parse_moment(params.get("until"), end_of_day=True)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if not (submission or since or until):
+        return JsonResponse(
+            {"error": "Give a submission and/or a since/until time window."}, status=400
+        )
+
+    reviews = export.reviews_for_export(
+        int(submission) if submission else None, since, until
+    )
+    response = StreamingHttpResponse(
+        export.stream(reviews, columns, fmt), content_type=export.FORMATS[fmt]
+    )
+    name = f"submission-{submission}" if submission else "reviews"
+    response["Content-Disposition"] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+
+def search_reviews(request):
+    """Ranked full-text search over review summaries, issues, suggestions and paths."""
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+    page_size = settings.SEARCH_PAGE_SIZE
+    results, has_more = search.search(query, offset=(page - 1) * page_size, limit=page_size)
+    return render(
+        request,
+        "reviews/search.html",
+        {
+            "query": query,
+            "results": results,
+            "page": page,
+            "has_more": has_more,
+        },
+    )
+
+
+def metrics(request):
+    """Prometheus scrape endpoint for this web process."""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4")
@@ -0,0 +1,109 @@
+# reviews/writer.py
+"""
+Buffered persistence of finished file reviews.
+
+Every finished job used to cost its own Review INSERT, job UPDATE and
+status check, each in autocommit (one fsync apiece on SQLite). The
+ReviewWriter collects results and writes them with bulk_create in a
+single transaction per flush, every REVIEW_WRITE_BATCH results or
+REVIEW_WRITE_INTERVAL_SECONDS, whichever comes first.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import review_cache
+from .derived import record_reviews
+from .metrics import timer
+from .models import Review, ReviewJob, Submission
+
+
+def finish_submission_if_complete(submission_id):
+    open_jobs = ReviewJob.objects.filter(
+        submission_id=submission_id,
+        status__in=[ReviewJob.STATUS_PENDING, ReviewJob.STATUS_RUNNING],
+    )
+    if not open_jobs.exists():
+        Submission.objects.filter(
+            id=submission_id, status=Submission.STATUS_RUNNING
+        ).update(status=Submission.STATUS_DONE)
+
+
+class ReviewWriter:
+    """Collects (job, Review kwargs) pairs and writes them in batches."""
+
+    def __init__(self, batch_size=None, interval=None):
+        self.batch_size = batch_size or settings.REVIEW_WRITE_BATCH
+        self.interval = (
+            settings.REVIEW_WRITE_INTERVAL_SECONDS if interval is None else interval
+        )
+        self._pending = []  # (job, fields)
+        self._cache_entries = []  # (cache key, fields)
+        self._last_flush = time.monotonic()
+        self.written = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, job, fields, cache_key=None):
+        self._pending.append((job, fields))
+        if cache_key is not None:
+            self._cache_entries.append((cache_key, fields))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def seconds_until_flush(self):
+        """How long the caller may block before maybe_flush() is due."""
+        if not self._pending:
+            return None
+        return max(0.0, self.interval - (time.monotonic() - self._last_flush))
+
+    def maybe_flush(self):
+        if self._pending and self.seconds_until_flush() == 0:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far in one transaction."""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, []
+        cache_entries, self._cache_entries = self._cache_entries, []
+
+        now = timezone.now()
+        with timer("db_write"), transaction.atomic():
+            reviews = Review.objects.bulk_create(
+                [
+                    Review(
+                        **fields, content_hash=job.content_hash, source_id=job.source_id
+                    )
+                    for job, fields in pending
+                ]
+            )
+            record_reviews(reviews)
+            jobs = []
+            for (job, _), review in zip(pending, reviews):
+                job.review = review
+                job.status = (
+                    ReviewJob.STATUS_DONE if review.processed else ReviewJob.STATUS_FAILED
+                )
+                job.error = review.processing_error
+                job.finished_at = now
+                # Plain per-row UPDATEs: inside one transaction they are cheap,
+                # and bulk_update's CASE expressions cost more CPU than they save.
+                ReviewJob.objects.filter(pk=job.pk).update(
+                    review=review,
+                    status=job.status,
+                    error=job.error,
+                    finished_at=now,
+                )
+                jobs.append(job)
+            for key, fields in cache_entries:
+                review_cache.store(key, fields)
+            for submission_id in {job.submission_id for job in jobs}:
+                finish_submission_if_complete(submission_id)
+
+        self.written += len(reviews)
+        return reviews
@@ -7,7 +7,10 @@ document.addEventListener("DOMContentLoaded", function() {
       const target = btn.dataset.target;
       const el = document.getElementById(target);
       if (!el) return;
-      const text = el.innerText || el.textContent;
+      // Leave out the line numbers of highlighted code
+      const copy = el.cloneNode(true);
+      copy.querySelectorAll(".linenos").forEach(n => n.remove());
+      const text = copy.textContent;
       try {
         await navigator.clipboard.writeText(text);
         const old = btn.innerText;
@@ -19,6 +22,30 @@ document.addEventListener("DOMContentLoaded", function() {
     });
   });
 
+  /* ============ SOURCE / RAW RESPONSE (fetched when opened) ============ */
+  document.querySelectorAll("details[data-lazy-url]").forEach(details => {
+    details.addEventListener("toggle", () => {
+      if (!details.open || details.dataset.loaded) return;
+      details.dataset.loaded = "1";
+      const body = details.querySelector("[data-lazy-body]");
+      // data-lazy-html: the server sends highlighted HTML, not plain text
+      const asHtml = "lazyHtml" in details.dataset;
+      fetch(details.dataset.lazyUrl)
+        .then(resp => {
+          if (!resp.ok) throw new Error(resp.statusText);
+          return resp.text();
+        })
+        .then(text => {
+          if (asHtml) body.innerHTML = text;
+          else body.textContent = text;
+        })
+        .catch(() => {
+          body.textContent = "Could not load this section.";
+          delete details.dataset.loaded;
+        });
+    });
+  });
+
   /* ================= FORM SUBMIT SPINNER ================= */
   const form = document.getElementById("review-form");
   if (form) {
@@ -34,6 +61,72 @@ document.addEventListener("DOMContentLoaded", function() {
     });
   }
 
+  /* ================= STREAMED REVIEW (pasted code only) ================= */
+  if (form && form.dataset.streamUrl && window.fetch && window.TextDecoder) {
+    form.addEventListener("submit", function(event) {
+      const fileInput = form.querySelector("input[type=file]");
+      const repoInput = document.getElementById("id_repo_url");
+      if ((fileInput && fileInput.files.length) || (repoInput && repoInput.value.trim())) {
+        return; // uploads and repos use the normal post
+      }
+      const textarea = document.getElementById("id_code");
+      if (window.reviewEditor && textarea) {
+        textarea.value = window.reviewEditor.getValue();
+      }
+      event.preventDefault();
+
+      const panel = document.getElementById("stream-panel");
+      const output = document.getElementById("stream-output");
+      if (panel) panel.style.display = "block";
+      if (output) output.textContent = "";
+
+      function handleEvent(name, data) {
+        if (name === "delta" && output) {
+          output.textContent += data.text;
+        } else if (name === "done") {
+          window.location = data.url;
+        } else if (name === "error") {
+          if (output) output.textContent += "\n\n" + data.message;
+          const btn = document.getElementById("submit-btn");
+          const txt = document.getElementById("btn-text");
+          const spinner = document.getElementById("btn-spinner");
+          if (btn) btn.disabled = false;
+          if (spinner) spinner.style.display = "none";
+          if (txt) txt.innerText = "Review code";
+        }
+      }
+
+      fetch(form.dataset.streamUrl, { method: "POST", body: new FormData(form) })
+        .then(async resp => {
+          if (!resp.ok || !resp.body) {
+            form.submit(); // server asked for the regular flow
+            return;
+          }
+          const reader = resp.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = "";
+          while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf("\n\n")) !== -1) {
+              const frame = buffer.slice(0, sep);
+              buffer = buffer.slice(sep + 2);
+              let name = "message";
+              let data = "";
+              frame.split("\n").forEach(line => {
+                if (line.startsWith("event:")) name = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+              });
+              if (data) handleEvent(name, JSON.parse(data));
+            }
+          }
+        })
+        .catch(() => form.submit());
+    });
+  }
+
   /* ================= UPLOAD PREVIEW ================= */
   const uploadInput = document.querySelector("input[type=file]");
   const uploadInfo = document.getElementById("upload-info");
@@ -81,7 +174,7 @@ document.addEventListener("DOMContentLoaded", function() {
         // Hide textarea once editor is ready
         textarea.style.display = "none";
 
-        const monacoEditor = monaco.editor.create(editorContainer, {
+        const monacoEditor = window.reviewEditor = monaco.editor.create(editorContainer, {
           value: textarea.value || "",
           language: mapLanguage(langSelect ? langSelect.value : "python"),
           theme: "vs-dark",
@@ -111,102 +204,136 @@ document.addEventListener("DOMContentLoaded", function() {
     }
   }
 
-  /* ================= FILE TREE BUILDER ================= */
-
-  const treeContainer = document.getElementById("file-tree");
-  const rawList = document.getElementById("raw-file-list");
-
-  if (treeContainer && rawList) {
-    // Build a tree data structure from the <li> items
-    const root = { type: "folder", name: "(root)", children: {} };
-
-    const items = rawList.querySelectorAll("li[data-file-path]");
-    items.forEach(li => {
-      const path = li.dataset.filePath || "(root code)";
-      const url = li.dataset.reviewUrl;
-      const score = li.dataset.score || "";
-      const parts = path.split("/").filter(Boolean);
-
-      let current = root;
-      if (parts.length === 0) {
-        parts.push("(root code)");
-      }
-
-      parts.forEach((part, index) => {
-        if (!current.children[part]) {
-          current.children[part] = {
-            type: index === parts.length - 1 ? "file" : "folder",
-            name: part,
-            children: {},
-            url: null,
-            score: null
-          };
-        }
-        current = current.children[part];
-      });
-
-      if (current.type === "file") {
-        current.url = url;
-        current.score = score;
-      }
-    });
+  /* ================= PROJECT STATUS POLLING ================= */
+
+  const statusBox = document.getElementById("project-status");
+  if (statusBox && statusBox.dataset.statusUrl) {
+    const statusText = statusBox.querySelector(".status-text");
+    const progressText = statusBox.querySelector(".status-progress");
+    let lastReviews = null;
+
+    function pollStatus() {
+      fetch(statusBox.dataset.statusUrl, { headers: { "Accept": "application/json" } })
+        .then(resp => resp.json())
+        .then(data => {
+          if (statusText) statusText.textContent = data.status_display;
+          if (progressText && data.jobs.total) {
+            const finished = data.jobs.done + data.jobs.failed;
+            progressText.textContent = ` — ${finished} / ${data.jobs.total} files reviewed`;
+          }
+          // Reload when new reviews land or the submission is finished
+          if (data.finished || (lastReviews !== null && data.reviews !== lastReviews)) {
+            window.location.reload();
+            return;
+          }
+          lastReviews = data.reviews;
+          setTimeout(pollStatus, 3000);
+        })
+        .catch(() => setTimeout(pollStatus, 10000));
+    }
 
-    function renderNode(node, container) {
-      const ul = document.createElement("ul");
+    pollStatus();
+  }
 
-      Object.keys(node.children).sort().forEach(key => {
-        const child = node.children[key];
-        const li = document.createElement("li");
+  /* ================= FILE TREE (loaded folder by folder) ================= */
 
-        if (child.type === "folder") {
-          li.className = "tree-folder";
+  const treeContainer = document.getElementById("file-tree");
 
-          const header = document.createElement("div");
-          header.className = "tree-folder-header";
+  if (treeContainer && treeContainer.dataset.treeUrl) {
+    const treeUrl = treeContainer.dataset.treeUrl;
 
-          const toggle = document.createElement("span");
-          toggle.className = "tree-toggle";
-          toggle.textContent = "▸";
+    function badge(className, text) {
+      const span = document.createElement("span");
+      span.className = className;
+      span.textContent = text;
+      return span;
+    }
 
-          const nameSpan = document.createElement("span");
-          nameSpan.textContent = child.name;
+    function addStats(li, node) {
+      if (node.avg_score !== null) {
+        li.appendChild(badge("tree-file-score", node.avg_score));
+      }
+      if (node.issue_count) {
+        li.appendChild(badge("tree-meta", `${node.issue_count} issues`));
+      }
+      if (node.failed_count) {
+        li.appendChild(badge("tree-meta tree-failed", `${node.failed_count} failed`));
+      }
+    }
 
-          header.appendChild(toggle);
-          header.appendChild(nameSpan);
-          li.appendChild(header);
+    function renderFolder(node) {
+      const li = document.createElement("li");
+      li.className = "tree-folder";
+
+      const header = document.createElement("div");
+      header.className = "tree-folder-header";
+      header.appendChild(badge("tree-toggle", "▸"));
+      header.appendChild(badge("tree-name", node.name));
+      header.appendChild(badge("tree-meta", `${node.file_count} files`));
+      addStats(header, node);
+      li.appendChild(header);
+
+      const children = document.createElement("div");
+      children.className = "tree-children";
+      li.appendChild(children);
+
+      let loaded = false;
+      header.addEventListener("click", () => {
+        li.classList.toggle("open");
+        if (!loaded) {
+          loaded = true;
+          loadLevel(node.path, children, 0);
+        }
+      });
+      return li;
+    }
 
-          const childrenContainer = document.createElement("div");
-          childrenContainer.className = "tree-children";
-          renderNode(child, childrenContainer);
-          li.appendChild(childrenContainer);
+    function renderFile(node) {
+      const li = document.createElement("li");
+      li.className = "tree-file";
+      const link = document.createElement("a");
+      link.href = node.url || "#";
+      link.textContent = node.name;
+      li.appendChild(link);
+      addStats(li, node);
+      if (node.reused) {
+        li.appendChild(badge("tree-meta", "unchanged, reused"));
+      }
+      return li;
+    }
 
-          // toggle open/close
-          header.addEventListener("click", () => {
-            li.classList.toggle("open");
+    function loadLevel(path, container, offset, list) {
+      const url = `${treeUrl}?path=${encodeURIComponent(path)}&offset=${offset}`;
+      return fetch(url, { headers: { "Accept": "application/json" } })
+        .then(resp => resp.json())
+        .then(data => {
+          if (!list) {
+            list = document.createElement("ul");
+            container.appendChild(list);
+          }
+          data.nodes.forEach(node => {
+            list.appendChild(node.type === "dir" ? renderFolder(node) : renderFile(node));
           });
-        } else {
-          li.className = "tree-file";
-          const link = document.createElement("a");
-          link.href = child.url || "#";
-          link.textContent = child.name;
-          li.appendChild(link);
-
-          if (child.score) {
-            const badge = document.createElement("span");
-            badge.className = "tree-file-score";
-            badge.textContent = child.score;
-            li.appendChild(badge);
+          if (data.next_offset !== null) {
+            const more = document.createElement("li");
+            const btn = document.createElement("button");
+            btn.type = "button";
+            btn.className = "btn-link tree-more";
+            btn.textContent = "Show more…";
+            btn.addEventListener("click", () => {
+              more.remove();
+              loadLevel(path, container, data.next_offset, list);
+            });
+            more.appendChild(btn);
+            list.appendChild(more);
           }
-        }
-
-        ul.appendChild(li);
-      });
-
-      container.appendChild(ul);
+        })
+        .catch(() => {
+          container.appendChild(badge("muted", "Could not load files."));
+        });
     }
 
-    // Render the tree into the container
-    renderNode(root, treeContainer);
+    loadLevel("", treeContainer, 0);
   }
 
 });